@@ -5,19 +5,120 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status  
 from django.http import JsonResponse
+from django.utils import timezone
 import requests
 import os
 from datetime import datetime, timedelta
 from weather_service import weather_service
+from plants.spatial import location_index
+from satellite_data.models import SatelliteDataPoint, WeatherData
 
 # Constantes para mensajes de error
 WEATHER_SERVICE_UNAVAILABLE = "Servicio meteorológico no disponible"
 
+# Ventana de la serie NDVI almacenada que se sirve en lugar de la API de NASA
+STORED_SATELLITE_DAYS = 30
+
+
+def _snap_location(lat, lon):
+    """Ubicación monitoreada dentro de la tolerancia (índice en memoria, sin consultar la BD)"""
+    return location_index.snap(float(lat), float(lon))
+
+
+# Campos diarios comunes a los datos almacenados (WeatherData) y a OpenWeatherMap
+WEATHER_FIELDS = (
+    'date', 'temperature_min', 'temperature_max', 'temperature_avg', 'humidity',
+    'precipitation', 'wind_speed', 'wind_direction', 'pressure', 'data_source',
+)
+
+# OpenWeatherMap devuelve el viento en m/s; WeatherData lo guarda en km/h
+MS_TO_KMH = 3.6
+
+
+def _weather_from_model(weather):
+    return {field: getattr(weather, field) for field in WEATHER_FIELDS}
+
+
+def _weather_from_openweathermap(item):
+    """Medición de OpenWeatherMap (actual o de pronóstico) con los campos de WeatherData"""
+    main = item.get('main', {})
+    wind = item.get('wind', {})
+    rain = item.get('rain', {})
+    moment = datetime.fromtimestamp(item['dt'], tz=timezone.get_current_timezone()) if 'dt' in item else timezone.now()
+    return {
+        'date': moment.date(),
+        'temperature_min': main.get('temp_min'),
+        'temperature_max': main.get('temp_max'),
+        'temperature_avg': main.get('temp'),
+        'humidity': main.get('humidity'),
+        'precipitation': rain.get('1h', rain.get('3h', 0)),
+        'wind_speed': round(wind['speed'] * MS_TO_KMH, 2) if wind.get('speed') is not None else None,
+        'wind_direction': wind.get('deg'),
+        'pressure': main.get('pressure'),
+        'data_source': 'openweathermap',
+    }
+
+
+def _daily_forecast_from_openweathermap(forecast, days):
+    """Agrega las mediciones cada 3 horas del pronóstico en registros diarios"""
+    by_day = {}
+    for item in forecast.get('list', []):
+        record = _weather_from_openweathermap(item)
+        by_day.setdefault(record['date'], []).append(record)
+
+    def values(records, field):
+        return [record[field] for record in records if record[field] is not None]
+
+    def mean(items):
+        return round(sum(items) / len(items), 2) if items else None
+
+    daily = []
+    for day in sorted(by_day)[:days]:
+        records = by_day[day]
+        daily.append({
+            'date': day,
+            'temperature_min': min(values(records, 'temperature_min'), default=None),
+            'temperature_max': max(values(records, 'temperature_max'), default=None),
+            'temperature_avg': mean(values(records, 'temperature_avg')),
+            'humidity': mean(values(records, 'humidity')),
+            'precipitation': round(sum(values(records, 'precipitation')), 2),
+            'wind_speed': mean(values(records, 'wind_speed')),
+            'wind_direction': mean(values(records, 'wind_direction')),
+            'pressure': mean(values(records, 'pressure')),
+            'data_source': 'openweathermap',
+        })
+    return daily
+
+
+def _stored_ndvi_series(location_id, days=STORED_SATELLITE_DAYS):
+    """Serie NDVI almacenada de una ubicación para los últimos días"""
+    since = timezone.now() - timedelta(days=days)
+    return list(
+        SatelliteDataPoint.objects.filter(
+            collection__location_id=location_id,
+            collection__data_type='ndvi',
+            timestamp__gte=since
+        ).order_by('timestamp').values('timestamp', 'value', 'quality_flag')
+    )
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 # Obtiene datos meteorológicos actuales para una ubicación
-def get_weather_data( lat, lon):
+def get_weather_data(request, lat, lon):
     try:
+        # Servir los datos del día si el punto corresponde a una ubicación monitoreada
+        matched_location = _snap_location(lat, lon)
+        if matched_location:
+            stored = WeatherData.objects.filter(
+                location_id=matched_location['id'], date=timezone.localdate()
+            ).first()
+            if stored:
+                return Response({
+                    'source': 'database',
+                    'matched_location': matched_location,
+                    'weather': _weather_from_model(stored)
+                })
+        
         if not weather_service:
             return Response(
                 {"error": WEATHER_SERVICE_UNAVAILABLE}, 
@@ -32,7 +133,11 @@ def get_weather_data( lat, lon):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        return Response(weather_data)
+        return Response({
+            'source': 'openweathermap',
+            'matched_location': matched_location,
+            'weather': _weather_from_openweathermap(weather_data)
+        })
         
     except ValueError as e:
         return Response(
@@ -57,6 +162,24 @@ def get_weather_forecast(request, lat, lon):
     try:
         days = int(request.GET.get('days', 5))
         
+        # Servir el pronóstico almacenado si cubre todos los días solicitados
+        matched_location = _snap_location(lat, lon)
+        if matched_location:
+            today = timezone.localdate()
+            stored = list(
+                WeatherData.objects.filter(
+                    location_id=matched_location['id'],
+                    date__gt=today,
+                    date__lte=today + timedelta(days=days)
+                ).order_by('date')
+            )
+            if len(stored) == days:
+                return Response({
+                    'source': 'database',
+                    'matched_location': matched_location,
+                    'forecast': [_weather_from_model(weather) for weather in stored]
+                })
+        
         if not weather_service:
             return Response(
                 {"error": WEATHER_SERVICE_UNAVAILABLE}, 
@@ -71,7 +194,11 @@ def get_weather_forecast(request, lat, lon):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        return Response(forecast_data)
+        return Response({
+            'source': 'openweathermap',
+            'matched_location': matched_location,
+            'forecast': _daily_forecast_from_openweathermap(forecast_data, days)
+        })
         
     except ValueError as e:
         return Response(
@@ -128,6 +255,20 @@ def get_nasa_satellite_data(request, lat, lon):
     GET /api/satellite/{lat}/{lon}/
     """
     try:
+        # Servir la serie almacenada si el punto corresponde a una ubicación monitoreada
+        matched_location = _snap_location(lat, lon)
+        if matched_location:
+            series = _stored_ndvi_series(matched_location['id'])
+            if series:
+                return Response({
+                    'source': 'database',
+                    'matched_location': matched_location,
+                    'data_type': 'ndvi',
+                    'days': STORED_SATELLITE_DAYS,
+                    'series': series,
+                    'upstream': None
+                })
+        
         nasa_api_key = os.getenv('NASA_API_KEY')
         if not nasa_api_key:
             return Response(
@@ -152,7 +293,15 @@ def get_nasa_satellite_data(request, lat, lon):
         response = requests.get(nasa_url, params=params)
         
         if response.status_code == 200:
-            return Response(response.json())
+            # Misma forma que la serie almacenada; la respuesta de NASA se adjunta sin procesar
+            return Response({
+                'source': 'nasa',
+                'matched_location': matched_location,
+                'data_type': 'ndvi',
+                'days': STORED_SATELLITE_DAYS,
+                'series': [],
+                'upstream': response.json()
+            })
         else:
             return Response(
                 {"error": "Error obteniendo datos de NASA", "details": response.text}, 
@@ -187,11 +336,24 @@ def get_combined_analysis(request, lat, lon):
             "last_update": datetime.now().isoformat()
         }
         
+        # Usar el último NDVI almacenado si el punto corresponde a una ubicación monitoreada
+        matched_location = _snap_location(lat, lon)
+        if matched_location:
+            series = _stored_ndvi_series(matched_location['id'])
+            if series:
+                satellite_data = {
+                    "ndvi": series[-1]['value'],
+                    "quality_flag": series[-1]['quality_flag'],
+                    "last_update": series[-1]['timestamp'].isoformat(),
+                    "source": "database"
+                }
+        
         combined_analysis = {
             "location": {
                 "latitude": float(lat),
                 "longitude": float(lon)
             },
+            "matched_location": matched_location,
             "weather_analysis": weather_analysis,
             "satellite_data": satellite_data,
             "flowering_prediction": {
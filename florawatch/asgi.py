@@ -6,3 +6,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'florawatch.settings')
 
 application = get_asgi_application()
+
+# Cargar los modelos activos antes de atender peticiones
+from predictions.registry import preload_models  # noqa: E402
+
+preload_models()
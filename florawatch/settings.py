@@ -92,6 +92,24 @@ DATABASES = {
     }
 }
 
+# Caché compartida por los workers web y los comandos de gestión (Redis). Sin
+# REDIS_URL cada proceso tiene su propia caché en memoria: solo para desarrollo,
+# las invalidaciones de un proceso no llegan a los demás
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -178,10 +196,49 @@ CORS_ALLOW_CREDENTIALS = True
 NASA_API_KEY = os.getenv('NASA_API_KEY', '')
 SATELLITE_DATA_CACHE_TIMEOUT = 3600  # 1 hora
 
+# Índice espacial en memoria de ubicaciones (ajuste de coordenadas libres)
+LOCATION_SNAP_TOLERANCE_M = 250  # metros
+LOCATION_INDEX_MAX_AGE = 300  # segundos antes de reconstruir el índice
+
 # Configuración para modelos de IA
 AI_MODELS_PATH = BASE_DIR / 'ai_models'
 TRAINING_DATA_PATH = BASE_DIR / 'training_data'
 
+# Caché de artefactos de modelos por proceso
+AI_MODEL_CACHE_MAX_ITEMS = 4
+AI_MODEL_CACHE_MAX_MB = 2048
+AI_MODEL_PRELOAD = os.getenv('AI_MODEL_PRELOAD', 'True').lower() == 'true'
+
+# Caché de resultados de predicción (clave: modelo, versión y huella de características)
+PREDICTION_CACHE_TIMEOUT = 86400  # 1 día
+
+# Entrenamiento en segundo plano
+AI_TRAINING_MAX_CONCURRENT = int(os.getenv('AI_TRAINING_MAX_CONCURRENT', '2'))
+AI_TRAINING_STALE_MINUTES = 30  # sin progreso durante este tiempo se considera abandonado
+
+# Validación automática de predicciones contra eventos observados
+AUTO_VALIDATION_RADIUS_M = 1000
+AUTO_VALIDATION_WINDOW_DAYS = 3
+AUTO_VALIDATION_MIN_CONFIDENCE = 0.5
+
+# Detección de anomalías en datos satelitales
+ANOMALY_Z_THRESHOLD = 3.0  # desviaciones respecto a la línea base estacional
+ANOMALY_MIN_BASELINE = 8  # observaciones mínimas antes de puntuar
+
+# Estadísticas agregadas (página de inicio y /api/plants/statistics/)
+STATISTICS_CACHE_TIMEOUT = 600  # segundos; las escrituras invalidan antes
+STATISTICS_ESTIMATE_THRESHOLD = 1_000_000  # filas a partir de las cuales se usa la estimación de PostgreSQL
+
+# Derivados de fotos (miniaturas)
+PHOTO_DERIVATIVE_SIZES = {'thumb': 200, 'medium': 800}  # lado mayor en píxeles
+PHOTO_DERIVATIVE_QUALITY = 80
+PHOTO_DERIVATIVE_WORKERS = int(os.getenv('PHOTO_DERIVATIVE_WORKERS', '2'))
+
+# Ventanas fenológicas aprendidas
+PHENOLOGY_LATITUDE_BAND = 10  # grados por banda
+PHENOLOGY_MIN_SEASONS = 3  # temporadas (planta y año) mínimas por ventana
+PHENOLOGY_CACHE_TIMEOUT = 86400  # la clave incluye phenology_fitted_at; esto solo purga versiones antiguas
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -2,25 +2,15 @@
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from django.contrib.auth.models import User
-from plants.models import PlantSpecies, Location, FloweringEvent
-from predictions.models import AIModel
-from satellite_data.models import SatelliteDataSource
+from plants.statistics import system_counts
 
 
 @require_http_methods(["GET"])
 def api_home(request):
     """Página de inicio del API con información del sistema"""
     
-    # Estadísticas básicas
-    stats = {
-        'users': User.objects.count(),
-        'plant_species': PlantSpecies.objects.count(),
-        'locations': Location.objects.count(),
-        'flowering_events': FloweringEvent.objects.count(),
-        'ai_models': AIModel.objects.count(),
-        'satellite_sources': SatelliteDataSource.objects.count(),
-    }
+    # Estadísticas básicas (cacheadas; una sola consulta al recalcular)
+    stats = system_counts()
     
     return JsonResponse({
         'message': '🌸 Bienvenido a FloraWatch Backend API',
@@ -7,3 +7,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'florawatch.settings')
 
 application = get_wsgi_application()
+
+# Cargar los modelos activos antes de atender peticiones
+from predictions.registry import preload_models  # noqa: E402
+
+preload_models()
@@ -2,7 +2,7 @@
 Configuración del admin para la aplicación Plants
 """
 from django.contrib import admin
-from .models import PlantSpecies, Location, PlantMonitor, FloweringEvent
+from .models import PlantSpecies, Location, PlantMonitor, FloweringEvent, FloweringCalendar, PhenologyWindow
 
 
 @admin.register(PlantSpecies)
@@ -41,3 +41,19 @@ class FloweringEventAdmin(admin.ModelAdmin):
     ordering = ['-detection_date']
     raw_id_fields = ['plant_monitor', 'reported_by']
     date_hierarchy = 'detection_date'
+
+
+@admin.register(FloweringCalendar)
+class FloweringCalendarAdmin(admin.ModelAdmin):
+    list_display = ['species', 'event_count', 'total_weight', 'updated_at']
+    search_fields = ['species__name', 'species__scientific_name']
+    readonly_fields = ['histogram', 'event_count', 'total_weight', 'updated_at']
+
+
+@admin.register(PhenologyWindow)
+class PhenologyWindowAdmin(admin.ModelAdmin):
+    list_display = ['species', 'latitude_min', 'latitude_max', 'onset_day', 'peak_day', 'duration_days', 'seasons', 'fitted_at']
+    list_filter = ['latitude_min']
+    search_fields = ['species__name', 'species__scientific_name']
+    list_select_related = ['species']
+    readonly_fields = [field.name for field in PhenologyWindow._meta.fields]
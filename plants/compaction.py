@@ -0,0 +1,98 @@
+"""
+Compactación de eventos de floración
+Fusiona los eventos repetidos de una planta en el mismo día y etapa en un evento canónico
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .flowering_calendar import rebuild_calendars
+from .models import FloweringEvent, PlantMonitor
+from .statistics import invalidate_statistics
+
+
+# Plantas procesadas por sentencia (cada bloque en su propia transacción)
+COMPACTION_BATCH_MONITORS = 500
+
+# Una sola sentencia por bloque: agrupa, actualiza el evento canónico y borra el resto.
+# Los reportes de usuario y los eventos con foto no entran en los grupos: borrarlos
+# perdería la foto, las notas y el autor. El canónico es el de mayor confianza (a
+# igualdad, el más antiguo); la intensidad es la media ponderada por las
+# observaciones que ya representa cada evento.
+COMPACT_EVENTS_SQL = """
+    WITH groups AS (
+        SELECT array_agg(id ORDER BY confidence_score DESC, id) AS ids,
+               max(confidence_score) AS confidence,
+               sum(intensity * source_count) / NULLIF(sum(source_count) FILTER (WHERE intensity IS NOT NULL), 0)
+                   AS intensity,
+               sum(source_count) AS sources
+        FROM {table}
+        WHERE plant_monitor_id = ANY(%(monitors)s)
+          AND detection_method <> ALL(%(unmerged)s)
+          AND photo = '' {date_filter}
+        GROUP BY plant_monitor_id, (detection_date AT TIME ZONE %(tz)s)::date, flowering_stage
+        HAVING count(*) > 1
+    ), canonical AS (
+        UPDATE {table} AS e SET
+            confidence_score = g.confidence,
+            intensity = g.intensity,
+            source_count = g.sources,
+            updated_at = now()
+        FROM groups AS g
+        WHERE e.id = g.ids[1]
+        RETURNING e.plant_monitor_id
+    ), merged AS (
+        DELETE FROM {table} AS e
+        USING groups AS g
+        WHERE e.id = ANY(g.ids[2:])
+        RETURNING e.id
+    )
+    SELECT (SELECT count(*) FROM canonical),
+           (SELECT count(*) FROM merged),
+           (SELECT array_agg(DISTINCT plant_monitor_id) FROM canonical)
+"""
+
+
+def compact_events(since=None, until=None, batch_size=COMPACTION_BATCH_MONITORS):
+    """
+    Compactar los eventos repetidos (planta, día local, etapa).
+
+    Solo se fusionan los eventos sin foto que no son reportes de usuario.
+    Recorre las plantas en bloques de `batch_size`; cada bloque se resuelve
+    con una única sentencia en su propia transacción. Es idempotente: un
+    evento ya compactado conserva en source_count las observaciones que
+    representa. Devuelve {'groups', 'removed', 'monitors'}.
+    """
+
+    date_filter = ''
+    params = {'tz': settings.TIME_ZONE, 'unmerged': list(FloweringEvent.UNMERGED_DETECTION_METHODS)}
+    if since is not None:
+        date_filter += ' AND detection_date >= %(since)s'
+        params['since'] = since
+    if until is not None:
+        date_filter += ' AND detection_date < %(until)s'
+        params['until'] = until
+    sql = COMPACT_EVENTS_SQL.format(
+        table=connection.ops.quote_name(FloweringEvent._meta.db_table), date_filter=date_filter
+    )
+
+    monitor_ids = list(PlantMonitor.objects.order_by('id').values_list('id', flat=True))
+    groups = removed = 0
+    touched = set()
+    for start in range(0, len(monitor_ids), batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, dict(params, monitors=monitor_ids[start:start + batch_size]))
+            batch_groups, batch_removed, batch_monitors = cursor.fetchone()
+        groups += batch_groups
+        removed += batch_removed
+        touched.update(batch_monitors or [])
+
+    # El SQL directo no emite señales: recalcular los agregados de las especies afectadas
+    if removed:
+        species_ids = set(
+            PlantMonitor.objects.filter(id__in=touched).values_list('species_id', flat=True)
+        )
+        rebuild_calendars(species_ids)
+        invalidate_statistics()
+
+    return {'groups': groups, 'removed': removed, 'monitors': len(touched)}
@@ -0,0 +1,162 @@
+"""
+Calendario de floración por especie
+Histograma día-del-año de las etapas de floración ponderado por confianza, mantenido incrementalmente
+"""
+
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractDay, ExtractMonth
+from django.utils import timezone
+
+from .models import FloweringCalendar, FloweringEvent
+
+
+# Los días se indexan sobre un año bisiesto para que cada fecha caiga siempre en el mismo bin
+DAYS_IN_YEAR = 366
+
+STAGES = [stage for stage, _ in FloweringEvent.FLOWERING_STAGES]
+
+# Primer día del año (1-366) de cada mes en un año bisiesto, para agregar por meses
+MONTH_STARTS = [(date(2000, month, 1) - date(2000, 1, 1)).days + 1 for month in range(1, 13)]
+
+
+def day_index(month, day):
+    """Posición (0-365) de un mes/día en el año bisiesto de referencia"""
+    return (date(2000, month, day) - date(2000, 1, 1)).days
+
+
+def empty_histogram():
+    return {stage: [0.0] * DAYS_IN_YEAR for stage in STAGES}
+
+
+def rebuild_calendars(species_ids=None):
+    """
+    Reconstruir los calendarios con una única consulta agrupada.
+
+    Agrupa por (especie, etapa, mes, día) sumando la confianza; el
+    resultado se reparte en Python y se guarda con un upsert por especie.
+    """
+
+    events = FloweringEvent.objects.all()
+    if species_ids is not None:
+        events = events.filter(plant_monitor__species_id__in=list(species_ids))
+
+    grouped = events.values(
+        'plant_monitor__species_id', 'flowering_stage',
+        month=ExtractMonth('detection_date'), day=ExtractDay('detection_date')
+    ).annotate(weight=Sum('confidence_score'), events=Count('id')).order_by()
+
+    calendars = {}
+    for row in grouped:
+        calendar = calendars.setdefault(row['plant_monitor__species_id'], {
+            'histogram': empty_histogram(), 'event_count': 0, 'total_weight': 0.0
+        })
+        calendar['histogram'][row['flowering_stage']][day_index(row['month'], row['day'])] += row['weight']
+        calendar['event_count'] += row['events']
+        calendar['total_weight'] += row['weight']
+
+    if species_ids is None:
+        FloweringCalendar.objects.exclude(species_id__in=list(calendars)).delete()
+    else:
+        # Las especies pedidas sin eventos quedan con el calendario vacío
+        for species_id in species_ids:
+            calendars.setdefault(species_id, {'histogram': empty_histogram(), 'event_count': 0, 'total_weight': 0.0})
+
+    FloweringCalendar.objects.bulk_create(
+        [FloweringCalendar(species_id=species_id, **values) for species_id, values in calendars.items()],
+        update_conflicts=True,
+        unique_fields=['species'],
+        update_fields=['histogram', 'event_count', 'total_weight', 'updated_at'],
+    )
+    return len(calendars)
+
+
+def _apply_changes(changes):
+    """
+    Sumar o restar contribuciones de eventos en los calendarios afectados.
+
+    `changes` son tuplas (especie, fecha de detección, etapa, confianza,
+    signo). Solo lee y escribe las filas de esas especies; si alguna aún no
+    tiene calendario se reconstruyen completas, ya con el estado actual de
+    la base de datos.
+    """
+
+    species_ids = sorted({species_id for species_id, *_ in changes})
+    with transaction.atomic():
+        calendars = {
+            calendar.species_id: calendar
+            for calendar in FloweringCalendar.objects.select_for_update().filter(
+                species_id__in=species_ids
+            ).order_by('species_id')
+        }
+        if len(calendars) < len(species_ids):
+            rebuild_calendars(species_ids)
+            return
+
+        for species_id, detection_date, stage, confidence, sign in changes:
+            detected = timezone.localtime(detection_date)
+            calendar = calendars[species_id]
+            calendar.histogram = calendar.histogram or empty_histogram()
+            calendar.histogram.setdefault(stage, [0.0] * DAYS_IN_YEAR)[
+                day_index(detected.month, detected.day)
+            ] += sign * confidence
+            calendar.event_count += sign
+            calendar.total_weight += sign * confidence
+        for calendar in calendars.values():
+            calendar.save(update_fields=['histogram', 'event_count', 'total_weight', 'updated_at'])
+
+
+def event_contribution(event, species_id):
+    """(especie, fecha, etapa, confianza): lo que un evento aporta al calendario"""
+    return (species_id, event.detection_date, event.flowering_stage, event.confidence_score)
+
+
+def add_event(event, species_id):
+    """
+    Sumar un evento nuevo al calendario de su especie (lectura y escritura de una fila).
+
+    Si la especie aún no tiene calendario se reconstruye completo: crearlo
+    solo con este evento ignoraría los eventos anteriores.
+    """
+    _apply_changes([event_contribution(event, species_id) + (1,)])
+
+
+def remove_event(event, species_id):
+    """Restar un evento borrado del calendario de su especie"""
+    _apply_changes([event_contribution(event, species_id) + (-1,)])
+
+
+def update_event(previous, event, species_id):
+    """
+    Mover un evento editado: restar su contribución anterior (`previous`,
+    tomada antes de guardar) y sumar la nueva, aunque cambie de especie.
+    """
+    current = event_contribution(event, species_id)
+    if previous != current:
+        _apply_changes([previous + (-1,), current + (1,)])
+
+
+def summarize(calendar):
+    """Resumen para la API: totales mensuales por etapa y día de máxima floración"""
+
+    histogram = calendar.histogram or empty_histogram()
+    bounds = MONTH_STARTS + [DAYS_IN_YEAR + 1]
+    monthly = {
+        stage: [round(sum(days[bounds[month] - 1:bounds[month + 1] - 1]), 4) for month in range(12)]
+        for stage, days in histogram.items()
+    }
+    peak = histogram.get('peak') or [0.0] * DAYS_IN_YEAR
+    peak_day = max(range(DAYS_IN_YEAR), key=peak.__getitem__) + 1 if any(peak) else None
+
+    return {
+        'species_id': calendar.species_id,
+        'event_count': calendar.event_count,
+        'total_weight': round(calendar.total_weight, 4),
+        'peak_day_of_year': peak_day,
+        'peak_date': (date(2000, 1, 1) + timedelta(days=peak_day - 1)).strftime('%m-%d') if peak_day else None,
+        'monthly': monthly,
+        'daily': histogram,
+        'updated_at': calendar.updated_at,
+    }
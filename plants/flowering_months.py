@@ -0,0 +1,91 @@
+"""
+Meses de floración
+Conversión del texto libre "Marzo-Mayo" a una máscara de 12 bits (bit 0 = enero)
+"""
+
+import re
+import unicodedata
+
+
+ALL_MONTHS_MASK = (1 << 12) - 1
+
+# Prefijos de tres letras (español e inglés) de cada mes
+MONTH_PREFIXES = {
+    'ene': 1, 'jan': 1,
+    'feb': 2,
+    'mar': 3,
+    'abr': 4, 'apr': 4,
+    'may': 5,
+    'jun': 6,
+    'jul': 7,
+    'ago': 8, 'aug': 8,
+    'sep': 9, 'set': 9,
+    'oct': 10,
+    'nov': 11,
+    'dic': 12, 'dec': 12,
+}
+
+# Guiones tipográficos (‐ ‑ ‒ – — ―, signo menos): la conversión a ASCII los eliminaría
+DASHES = dict.fromkeys(map(ord, '\u2010\u2011\u2012\u2013\u2014\u2015\u2212'), '-')
+
+ALL_YEAR_PATTERN = re.compile(r'todo el ano|all year|year round|perenne')
+RANGE_SEPARATOR = re.compile(r'\s*(?:-|\ba\b|\bhasta\b|\bto\b)\s*')
+LIST_SEPARATOR = re.compile(r'\s*(?:,|;|/|\by\b|\band\b)\s*')
+
+
+def month_bit(month):
+    return 1 << (month - 1)
+
+
+def _normalize(text):
+    text = (text or '').translate(DASHES)
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return text.lower().strip()
+
+
+def _month_number(token):
+    token = token.strip(' .')
+    if token.isdigit():
+        month = int(token)
+        return month if 1 <= month <= 12 else None
+    return MONTH_PREFIXES.get(token[:3])
+
+
+def months_to_mask(months):
+    mask = 0
+    for month in months:
+        mask |= month_bit(month)
+    return mask
+
+
+def mask_to_months(mask):
+    return [month for month in range(1, 13) if mask & month_bit(month)]
+
+
+def parse_flowering_months(text):
+    """
+    Máscara de meses a partir de texto libre.
+
+    Admite meses sueltos, listas ("Marzo, Junio y Agosto"), rangos
+    ("Marzo-Mayo", "abril a junio") que cruzan el año ("Nov-Feb"),
+    números de mes y "todo el año". Los fragmentos no reconocidos se
+    ignoran; un texto sin meses da 0.
+    """
+
+    text = _normalize(text)
+    if not text:
+        return 0
+    if ALL_YEAR_PATTERN.search(text):
+        return ALL_MONTHS_MASK
+
+    mask = 0
+    for part in LIST_SEPARATOR.split(text):
+        bounds = [_month_number(token) for token in RANGE_SEPARATOR.split(part) if token]
+        bounds = [month for month in bounds if month]
+        if not bounds:
+            continue
+        start, end = bounds[0], bounds[-1]
+        span = (end - start) % 12
+        for offset in range(span + 1):
+            mask |= month_bit((start - 1 + offset) % 12 + 1)
+    return mask
@@ -0,0 +1,71 @@
+"""
+FloraWatch - Serialización GeoJSON en streaming
+Escribe FeatureCollections grandes de forma incremental sin cargarlas en memoria
+"""
+
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+# Filas leídas por viaje del cursor de servidor
+STREAM_CHUNK_SIZE = 2000
+
+# Features agrupadas en cada fragmento enviado al cliente
+STREAM_FEATURES_PER_WRITE = 500
+
+GEOJSON_CONTENT_TYPE = 'application/geo+json'
+
+
+def iter_feature_collection(queryset, geometry_field, properties, id_field='id',
+                            chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Genera una FeatureCollection GeoJSON como fragmentos de texto.
+
+    `properties` es un dict {nombre_salida: lookup_orm}. La geometría se
+    codifica en PostgreSQL con ST_AsGeoJSON y se inserta tal cual, de modo
+    que no se crea ningún objeto GEOS por feature. Las filas se recorren con
+    un cursor de servidor (QuerySet.iterator).
+    """
+
+    names = list(properties)
+    rows = queryset.annotate(
+        geojson_geometry=AsGeoJSON(geometry_field)
+    ).values_list(
+        id_field, 'geojson_geometry', *properties.values()
+    ).iterator(chunk_size=chunk_size)
+
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    yield '{"type":"FeatureCollection","features":['
+
+    buffer = []
+    separator = ''
+    for row in rows:
+        buffer.append(
+            '%s{"type":"Feature","id":%s,"geometry":%s,"properties":%s}' % (
+                separator,
+                encoder.encode(row[0]),
+                row[1] or 'null',
+                encoder.encode(dict(zip(names, row[2:]))),
+            )
+        )
+        separator = ','
+        if len(buffer) >= STREAM_FEATURES_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+
+    if buffer:
+        yield ''.join(buffer)
+    yield ']}'
+
+
+def streaming_geojson_response(queryset, geometry_field, properties, filename=None, **kwargs):
+    """StreamingHttpResponse con la FeatureCollection del queryset"""
+
+    response = StreamingHttpResponse(
+        iter_feature_collection(queryset, geometry_field, properties, **kwargs),
+        content_type=GEOJSON_CONTENT_TYPE
+    )
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -4,16 +4,57 @@ APIs avanzadas para consultas espaciales con PostGIS
 """
 
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.db.models.functions import Distance, GeometryDistance
 from django.contrib.gis.measure import D
+from django.db.models import Count, Exists, F, OuterRef, Window
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework_gis.filters import DistanceFilter, InBBoxFilter
+from rest_framework_gis.filters import DistanceToPointFilter, InBBoxFilter
+from rest_framework_gis.fields import GeometryField
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
 from .models import Location, PlantMonitor, FloweringEvent
 from .serializers import LocationSerializer, PlantMonitorSerializer
+from .geojson import streaming_geojson_response
+from .spatial import get_region
+
+
+# Límites de la búsqueda de vecinos más cercanos
+NEAREST_DEFAULT_K = 10
+NEAREST_MAX_K = 100
+
+# Candidatos por vecino pedido: `<->` ordena en grados y a latitudes altas
+# ese orden difiere del real en metros, así que se reordena un margen mayor
+NEAREST_CANDIDATE_FACTOR = 4
+
+# Paginación de consultas por región
+REGION_PAGE_SIZE = 100
+REGION_MAX_PAGE_SIZE = 1000
+
+# Propiedades de las exportaciones GeoJSON en streaming {salida: lookup}
+LOCATION_EXPORT_PROPERTIES = {
+    'name': 'name',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'altitude': 'altitude',
+    'country': 'country',
+    'region': 'region',
+    'description': 'description',
+}
+
+EVENT_EXPORT_PROPERTIES = {
+    'plant_monitor': 'plant_monitor_id',
+    'plant_name': 'plant_monitor__name',
+    'species': 'plant_monitor__species__name',
+    'location': 'plant_monitor__location__name',
+    'detection_date': 'detection_date',
+    'flowering_stage': 'flowering_stage',
+    'detection_method': 'detection_method',
+    'confidence_score': 'confidence_score',
+    'intensity': 'intensity',
+}
 
 
 class LocationGeoSerializer(GeoFeatureModelSerializer):
@@ -29,25 +70,24 @@ class LocationGeoSerializer(GeoFeatureModelSerializer):
 
 
 class PlantMonitorGeoSerializer(GeoFeatureModelSerializer):
-    """Serializer geoespacial para monitores de plantas"""
+    """
+    Serializer geoespacial compacto para monitores de plantas
+
+    Espera un queryset anotado con `coordinates` y `species_name`
+    (ver PlantMonitorGeoViewSet.get_queryset), de modo que no hay
+    consultas adicionales por fila.
+    """
     
-    location_coordinates = serializers.SerializerMethodField()
+    coordinates = GeometryField(read_only=True)
+    species_name = serializers.CharField(read_only=True)
     
     class Meta:
         model = PlantMonitor
-        geo_field = "location__coordinates"
+        geo_field = 'coordinates'
         fields = (
-            'id', 'name', 'species', 'location', 'location_coordinates',
-            'installed_date', 'camera_type', 'status'
+            'id', 'identifier', 'name', 'species', 'species_name',
+            'location', 'is_monitored'
         )
-    
-    def get_location_coordinates(self, obj):
-        if obj.location and obj.location.coordinates:
-            return {
-                'type': 'Point',
-                'coordinates': [obj.location.coordinates.x, obj.location.coordinates.y]
-            }
-        return None
 
 
 class LocationGeoViewSet(viewsets.ModelViewSet):
@@ -55,7 +95,7 @@ class LocationGeoViewSet(viewsets.ModelViewSet):
     
     queryset = Location.objects.all()
     serializer_class = LocationGeoSerializer
-    filter_backends = [DistanceFilter, InBBoxFilter]
+    filter_backends = [DistanceToPointFilter, InBBoxFilter]
     distance_filter_field = 'coordinates'
     bbox_filter_field = 'coordinates'
     
@@ -96,39 +136,152 @@ class LocationGeoViewSet(viewsets.ModelViewSet):
                 'error': f'Coordenadas inválidas: {str(e)}'
             }, status=status.HTTP_400_BAD_REQUEST)
     
-    @action(detail=False, methods=['post'])
-    def in_region(self, request):
-        """Encontrar ubicaciones dentro de una región (polígono)"""
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """
+        Los k elementos más cercanos a un punto (ubicaciones o monitores)
+
+        Ordena con el operador KNN `<->` de PostGIS, que recorre el índice
+        GiST de coordinates sin necesidad de un radio de búsqueda.
+        """
         
-        from django.contrib.gis.geos import Polygon
+        params = request.query_params
+        target = params.get('target', 'locations')
+        species_id = params.get('species')
         
-        coordinates = request.data.get('polygon_coordinates')
+        if target not in ('locations', 'monitors'):
+            return Response({
+                'error': "target debe ser 'locations' o 'monitors'"
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        if not coordinates:
+        try:
+            point = Point(float(params['longitude']), float(params['latitude']), srid=4326)
+            k = min(max(int(params.get('k', NEAREST_DEFAULT_K)), 1), NEAREST_MAX_K)
+            species_id = int(species_id) if species_id else None
+        except KeyError:
+            return Response({
+                'error': 'Se requieren latitude y longitude'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, TypeError) as e:
             return Response({
-                'error': 'Se requieren coordenadas del polígono'
+                'error': f'Parámetros inválidos: {str(e)}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        monitors = PlantMonitor.objects.filter(is_monitored=True)
+        if species_id:
+            monitors = monitors.filter(species_id=species_id)
+        
+        locations = Location.objects.filter(is_active=True)
+        if target == 'monitors' or species_id:
+            locations = locations.filter(
+                Exists(monitors.filter(location=OuterRef('pk')))
+            )
+        
+        # Cada ubicación candidata tiene al menos un monitor válido, así que los
+        # k monitores más cercanos están siempre entre las k ubicaciones más cercanas
+        candidates = list(
+            locations.annotate(
+                distance=Distance('coordinates', point)
+            ).order_by(GeometryDistance('coordinates', point))[:k * NEAREST_CANDIDATE_FACTOR]
+        )
+        # `<->` sobre SRID 4326 ordena en grados; reordenar los candidatos por distancia real
+        candidates.sort(key=lambda location: (location.distance.m, location.id))
+        nearest_locations = candidates[:k]
+        
+        if target == 'locations':
+            serializer = self.get_serializer(nearest_locations, many=True)
+            results = serializer.data['features']
+            for feature, location in zip(results, nearest_locations):
+                feature['properties']['distance_km'] = round(location.distance.km, 3)
+        else:
+            distances = {location.id: location.distance for location in nearest_locations}
+            nearest_monitors = sorted(
+                monitors.filter(location_id__in=distances).select_related('species', 'location'),
+                key=lambda monitor: (distances[monitor.location_id].m, monitor.id)
+            )[:k]
+            results = [{
+                'id': monitor.id,
+                'identifier': monitor.identifier,
+                'name': monitor.name,
+                'species': monitor.species.name,
+                'location': monitor.location.name,
+                'coordinates': [monitor.location.coordinates.x, monitor.location.coordinates.y],
+                'distance_km': round(distances[monitor.location_id].km, 3),
+            } for monitor in nearest_monitors]
+        
+        return Response({
+            'center_point': {'latitude': point.y, 'longitude': point.x},
+            'target': target,
+            'species': species_id,
+            'k': k,
+            'total_found': len(results),
+            'results': results
+        })
+    
+    @action(detail=False, methods=['post'])
+    def in_region(self, request):
+        """
+        Encontrar ubicaciones dentro de una región (Polygon o MultiPolygon)
+
+        Acepta `geometry` en GeoJSON o el formato heredado `polygon_coordinates`.
+        El total y la página salen de la misma consulta (COUNT(*) OVER ()).
+        """
+        
         try:
-            # Crear polígono desde coordenadas
-            polygon = Polygon(coordinates)
-            
-            locations_in_region = Location.objects.filter(
-                coordinates__within=polygon
+            region = get_region(
+                geometry=request.data.get('geometry'),
+                polygon_coordinates=request.data.get('polygon_coordinates'),
+                simplify_tolerance=request.data.get('simplify_tolerance'),
             )
-            
-            serializer = self.get_serializer(locations_in_region, many=True)
-            
-            return Response({
-                'polygon_area': polygon.area,
-                'total_found': locations_in_region.count(),
-                'locations': serializer.data
-            })
-            
-        except Exception as e:
+            limit = min(max(int(request.data.get('limit', REGION_PAGE_SIZE)), 1), REGION_MAX_PAGE_SIZE)
+            offset = max(int(request.data.get('offset', 0)), 0)
+        except (ValueError, TypeError) as e:
             return Response({
-                'error': f'Polígono inválido: {str(e)}'
+                'error': f'Región inválida: {str(e)}'
             }, status=status.HTTP_400_BAD_REQUEST)
+        
+        locations_in_region = list(
+            Location.objects.filter(
+                coordinates__within=region.geometry
+            ).annotate(
+                total_found=Window(expression=Count('id'))
+            ).order_by('name', 'id')[offset:offset + limit]
+        )
+        
+        if locations_in_region:
+            total_found = locations_in_region[0].total_found
+        elif offset:
+            # Página fuera de rango: solo aquí hace falta un conteo aparte
+            total_found = Location.objects.filter(coordinates__within=region.geometry).count()
+        else:
+            total_found = 0
+        
+        serializer = self.get_serializer(locations_in_region, many=True)
+        
+        return Response({
+            'polygon_area': region.area,
+            'region_vertices': region.vertices,
+            'original_vertices': region.original_vertices,
+            'simplified': region.simplified,
+            'total_found': total_found,
+            'limit': limit,
+            'offset': offset,
+            'locations': serializer.data
+        })
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exportar ubicaciones como GeoJSON en streaming
+
+        Respeta los filtros in_bbox / dist+point del listado.
+        """
+        
+        queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+        return streaming_geojson_response(
+            queryset, 'coordinates', LOCATION_EXPORT_PROPERTIES,
+            filename='locations.geojson'
+        )
     
     @action(detail=True, methods=['get'])
     def flowering_events_nearby(self, request, pk=None):
@@ -183,6 +336,41 @@ class LocationGeoViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class PlantMonitorGeoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Capa de mapa de monitores de plantas
+
+    Una sola consulta une especie y coordenadas de la ubicación. Filtros:
+    in_bbox (índice GiST de Location), species=1,2,3 y monitored=false
+    para incluir monitores inactivos.
+    """
+    
+    serializer_class = PlantMonitorGeoSerializer
+    filter_backends = [InBBoxFilter]
+    bbox_filter_field = 'location__coordinates'
+    
+    def get_queryset(self):
+        queryset = PlantMonitor.objects.annotate(
+            coordinates=F('location__coordinates'),
+            species_name=F('species__name')
+        ).only(
+            'id', 'identifier', 'name', 'species', 'location', 'is_monitored'
+        ).order_by('id')
+        
+        if self.request.query_params.get('monitored', 'true').lower() != 'false':
+            queryset = queryset.filter(is_monitored=True)
+        
+        species = self.request.query_params.get('species')
+        if species:
+            try:
+                species_ids = [int(value) for value in species.split(',') if value]
+            except ValueError:
+                raise ValidationError({'species': 'Debe ser una lista de IDs separados por comas'})
+            queryset = queryset.filter(species_id__in=species_ids)
+        
+        return queryset
+
+
 class SpatialAnalysisViewSet(viewsets.ViewSet):
     """ViewSet para análisis espaciales avanzados"""
     
@@ -190,7 +378,7 @@ class SpatialAnalysisViewSet(viewsets.ViewSet):
     def hotspots(self, request):
         """Identificar hotspots de floración"""
         
-        from django.contrib.gis.db.models import Count
+        from django.contrib.gis.db.models import Count, Sum
         from django.db.models import Q
         from datetime import datetime, timedelta
         
@@ -205,7 +393,8 @@ class SpatialAnalysisViewSet(viewsets.ViewSet):
         hotspots = Location.objects.filter(
             plantmonitor__floweringevent__detection_date__gte=date_limit
         ).annotate(
-            event_count=Count('plantmonitor__floweringevent')
+            event_count=Count('plantmonitor__floweringevent'),
+            observation_count=Sum('plantmonitor__floweringevent__source_count')
         ).filter(
             event_count__gte=min_events
         ).order_by('-event_count')
@@ -217,6 +406,7 @@ class SpatialAnalysisViewSet(viewsets.ViewSet):
                 'name': location.name,
                 'coordinates': [location.coordinates.x, location.coordinates.y],
                 'event_count': location.event_count,
+                'observation_count': location.observation_count,
                 'region': location.region,
                 'country': location.country
             })
@@ -228,6 +418,34 @@ class SpatialAnalysisViewSet(viewsets.ViewSet):
             'hotspots': hotspot_data
         })
     
+    @action(detail=False, methods=['get'])
+    def events_export(self, request):
+        """Exportar eventos de floración como GeoJSON en streaming"""
+        
+        from datetime import timedelta
+        from django.utils import timezone
+        
+        events = FloweringEvent.objects.all()
+        
+        try:
+            days_back = request.query_params.get('days')
+            if days_back:
+                events = events.filter(
+                    detection_date__gte=timezone.now() - timedelta(days=int(days_back))
+                )
+            species_id = request.query_params.get('species')
+            if species_id:
+                events = events.filter(plant_monitor__species_id=int(species_id))
+        except ValueError as e:
+            return Response({
+                'error': f'Parámetros inválidos: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return streaming_geojson_response(
+            events.order_by('id'), 'plant_monitor__location__coordinates',
+            EVENT_EXPORT_PROPERTIES, filename='flowering_events.geojson'
+        )
+    
     @action(detail=False, methods=['post'])
     def density_map(self, request):
         """Crear mapa de densidad de especies o eventos"""
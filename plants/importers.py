@@ -0,0 +1,363 @@
+"""
+Importación masiva de eventos de floración
+Lectura en streaming de exportaciones CSV de iNaturalist y PhenoCam con búsquedas cacheadas e inserción en bloque
+"""
+
+import csv
+import io
+from datetime import datetime, time
+
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .flowering_calendar import rebuild_calendars
+from .models import FloweringEvent, Location, PlantMonitor, PlantSpecies
+from .spatial import location_index
+from .statistics import invalidate_statistics
+
+
+# Filas procesadas por bloque (memoria constante independientemente del tamaño del archivo)
+IMPORT_BATCH_SIZE = 5000
+
+# Tamaño de celda (grados) con la que se agrupan observaciones sin ubicación cercana (~1 km)
+GRID_DECIMALS = 2
+
+IMPORT_FORMATS = ('inaturalist', 'phenocam')
+
+# Anotación "Plant Phenology" de iNaturalist -> etapa de floración
+INATURALIST_PHENOLOGY = {
+    'flowering': 'peak',
+    'flower budding': 'bud',
+    'fruiting': 'end',
+}
+INATURALIST_PHENOLOGY_COLUMNS = ('plant_phenology', 'phenology', 'Plant Phenology')
+INATURALIST_CONFIDENCE = {'research': 0.9, 'needs_id': 0.6, 'casual': 0.4}
+
+# Transiciones de PhenoCam (dirección, umbral) -> etapa de floración
+PHENOCAM_TRANSITIONS = {
+    ('rising', 'transition_10'): 'early',
+    ('rising', 'transition_50'): 'peak',
+    ('falling', 'transition_50'): 'late',
+    ('falling', 'transition_10'): 'end',
+}
+PHENOCAM_CONFIDENCE = 0.8
+
+
+class ImportResult:
+    """Contadores de una importación"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.created_species = 0
+        self.created_locations = 0
+        self.created_monitors = 0
+        self.errors = []
+
+    def skip(self, line, reason):
+        self.skipped += 1
+        if len(self.errors) < 100:
+            self.errors.append(f'Fila {line}: {reason}')
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _aware(value):
+    """Fecha u hora de la exportación como datetime con zona horaria"""
+    value = value.strip().replace(' UTC', '+00:00')
+    moment = parse_datetime(value) if 'T' in value or ':' in value else None
+    if moment is None:
+        day = parse_date(value[:10])
+        if day is None:
+            raise ValueError(f'Fecha no válida: {value}')
+        moment = datetime.combine(day, time(12, 0))
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _coordinate(value, limit):
+    number = float(value)
+    if not -limit <= number <= limit:
+        raise ValueError(f'Coordenada fuera de rango: {value}')
+    return number
+
+
+def parse_inaturalist(reader, result):
+    """Observaciones de iNaturalist (una fila por observación)"""
+
+    for line, row in enumerate(reader, start=2):
+        result.rows += 1
+        try:
+            phenology = next(
+                (row[column].strip().lower() for column in INATURALIST_PHENOLOGY_COLUMNS if row.get(column)), ''
+            )
+            if not phenology:
+                # Sin anotación no se sabe la etapa: no se inventa un pico de floración
+                result.skip(line, 'sin anotación de fenología')
+                continue
+            if phenology not in INATURALIST_PHENOLOGY:
+                # "No Evidence of Flowering" y similares no son eventos
+                result.skip(line, f'fenología sin floración ({phenology})')
+                continue
+            scientific_name = (row.get('scientific_name') or '').strip()
+            if not scientific_name:
+                raise ValueError('sin scientific_name')
+            yield {
+                'scientific_name': scientific_name,
+                'common_name': (row.get('common_name') or '').strip(),
+                'latitude': _coordinate(row['latitude'], 90),
+                'longitude': _coordinate(row['longitude'], 180),
+                'country': (row.get('place_country_name') or '').strip(),
+                'region': (row.get('place_state_name') or '').strip(),
+                'monitor_key': None,
+                'detection_date': _aware(row.get('time_observed_at') or row['observed_on']),
+                'flowering_stage': INATURALIST_PHENOLOGY[phenology],
+                'confidence_score': INATURALIST_CONFIDENCE.get(row.get('quality_grade', ''), 0.5),
+                'notes': f"inaturalist:{row.get('id', '')}",
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            result.skip(line, str(e))
+
+
+def parse_phenocam(reader, result, species_name):
+    """Fechas de transición de PhenoCam (una fila por sitio, ROI y dirección)"""
+
+    for line, row in enumerate(reader, start=2):
+        result.rows += 1
+        try:
+            direction = row['direction'].strip().lower()
+            site = row['site'].strip()
+            coordinates = (_coordinate(row['latitude'], 90), _coordinate(row['longitude'], 180))
+            for (transition_direction, column), stage in PHENOCAM_TRANSITIONS.items():
+                if transition_direction != direction or not row.get(column):
+                    continue
+                yield {
+                    'scientific_name': row.get('scientific_name') or species_name,
+                    'common_name': '',
+                    'latitude': coordinates[0],
+                    'longitude': coordinates[1],
+                    'country': (row.get('country') or '').strip(),
+                    'region': '',
+                    'monitor_key': f"PHENOCAM_{site}_{row.get('roi_id', '').strip() or row.get('veg_type', '').strip()}",
+                    'detection_date': _aware(row[column]),
+                    'flowering_stage': stage,
+                    'confidence_score': PHENOCAM_CONFIDENCE,
+                    'notes': f'phenocam:{site}:{column}',
+                }
+        except (KeyError, TypeError, ValueError) as e:
+            result.skip(line, str(e))
+
+
+class LookupCache:
+    """
+    Especies, ubicaciones y plantas ya resueltas durante la importación.
+
+    Cada bloque resuelve sus claves desconocidas con una consulta por tipo
+    y crea las que faltan con bulk_create.
+    """
+
+    def __init__(self, source, user, result):
+        self.source = source
+        self.user = user
+        self.result = result
+        self.species = {}
+        self.locations = {}
+        self.monitors = {}
+
+    def resolve_species(self, records):
+        missing = {record['scientific_name'] for record in records} - set(self.species)
+        if not missing:
+            return
+        self.species.update(
+            PlantSpecies.objects.filter(scientific_name__in=missing).values_list('scientific_name', 'id')
+        )
+        names = {record['scientific_name']: record['common_name'] for record in records}
+        new = [
+            PlantSpecies(
+                scientific_name=name,
+                name=names.get(name) or name,
+                plant_type='flower',
+                typical_flowering_months='',
+            )
+            for name in missing - set(self.species)
+        ]
+        if new:
+            PlantSpecies.objects.bulk_create(new, ignore_conflicts=True)
+            self.species.update(
+                PlantSpecies.objects.filter(scientific_name__in=[species.scientific_name for species in new])
+                .values_list('scientific_name', 'id')
+            )
+            self.result.created_species += len(new)
+
+    def _location_key(self, record):
+        """Ubicación existente más cercana o celda de la rejilla de importación"""
+        match = location_index.snap(record['latitude'], record['longitude'])
+        if match is not None:
+            return match['id']
+        return (round(record['latitude'], GRID_DECIMALS), round(record['longitude'], GRID_DECIMALS))
+
+    def _grid_name(self, key):
+        return f'{self.source} {key[0]:.{GRID_DECIMALS}f},{key[1]:.{GRID_DECIMALS}f}'
+
+    def resolve_locations(self, records):
+        keys = {}
+        for record in records:
+            record['location_key'] = self._location_key(record)
+            if isinstance(record['location_key'], tuple):
+                keys.setdefault(record['location_key'], record)
+
+        missing = {key: record for key, record in keys.items() if key not in self.locations}
+        if not missing:
+            return
+        names = {self._grid_name(key): key for key in missing}
+        for location_id, name in Location.objects.filter(name__in=names).values_list('id', 'name'):
+            self.locations[names[name]] = location_id
+
+        new = []
+        for key, record in missing.items():
+            if key in self.locations:
+                continue
+            new.append(Location(
+                name=self._grid_name(key),
+                coordinates=Point(key[1], key[0], srid=4326),
+                latitude=key[0],
+                longitude=key[1],
+                country=record['country'],
+                region=record['region'],
+                description=f'Celda creada al importar {self.source}',
+            ))
+        if new:
+            created = Location.objects.bulk_create(new)
+            for location in created:
+                self.locations[names[location.name]] = location.pk
+            self.result.created_locations += len(created)
+
+    def location_id(self, record):
+        key = record['location_key']
+        return self.locations[key] if isinstance(key, tuple) else key
+
+    def resolve_monitors(self, records):
+        for record in records:
+            record['location_id'] = self.location_id(record)
+            record['species_id'] = self.species[record['scientific_name']]
+            record['monitor_key'] = record['monitor_key'] or (
+                f"{self.source.upper()}_{record['species_id']}_{record['location_id']}"
+            )
+
+        firsts = {}
+        for record in records:
+            key = record['monitor_key']
+            if key not in self.monitors and (key not in firsts or record['detection_date'] < firsts[key]['detection_date']):
+                firsts[key] = record
+        if not firsts:
+            return
+        self.monitors.update(
+            PlantMonitor.objects.filter(identifier__in=list(firsts)).values_list('identifier', 'id')
+        )
+        new = [
+            PlantMonitor(
+                identifier=key,
+                name=f"{record['scientific_name']} ({self.source})",
+                species_id=record['species_id'],
+                location_id=record['location_id'],
+                monitoring_start_date=timezone.localtime(record['detection_date']).date(),
+                created_by=self.user,
+            )
+            for key, record in firsts.items() if key not in self.monitors
+        ]
+        if new:
+            PlantMonitor.objects.bulk_create(new, ignore_conflicts=True)
+            self.monitors.update(
+                PlantMonitor.objects.filter(identifier__in=[monitor.identifier for monitor in new])
+                .values_list('identifier', 'id')
+            )
+            self.result.created_monitors += len(new)
+
+
+def _import_batch(records, lookups, user, result):
+    """Resolver referencias, descartar duplicados e insertar un bloque de eventos"""
+
+    lookups.resolve_species(records)
+    lookups.resolve_locations(records)
+    lookups.resolve_monitors(records)
+
+    for record in records:
+        record['plant_monitor_id'] = lookups.monitors[record['monitor_key']]
+
+    # Duplicados ya guardados: una consulta por bloque acotada a sus plantas y fechas
+    monitor_ids = {record['plant_monitor_id'] for record in records}
+    dates = [record['detection_date'] for record in records]
+    existing = set(
+        FloweringEvent.objects.filter(
+            plant_monitor_id__in=monitor_ids,
+            detection_date__gte=min(dates),
+            detection_date__lte=max(dates)
+        ).values_list('plant_monitor_id', 'detection_date', 'flowering_stage')
+    )
+
+    # Los bloques anteriores ya están guardados: basta con deduplicar dentro del bloque
+    seen = set()
+    events = []
+    for record in records:
+        key = (record['plant_monitor_id'], record['detection_date'], record['flowering_stage'])
+        if key in existing or key in seen:
+            result.duplicates += 1
+            continue
+        seen.add(key)
+        events.append(FloweringEvent(
+            plant_monitor_id=record['plant_monitor_id'],
+            detection_date=record['detection_date'],
+            flowering_stage=record['flowering_stage'],
+            detection_method='satellite' if lookups.source == 'phenocam' else 'user_report',
+            confidence_score=record['confidence_score'],
+            notes=record['notes'],
+            reported_by=user,
+        ))
+    FloweringEvent.objects.bulk_create(events)
+    result.imported += len(events)
+
+
+def import_flowering_events(stream, source, user, species_name=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Importar eventos desde un CSV (archivo de texto o binario) en streaming.
+
+    Las filas se leen de una en una y se procesan en bloques de
+    `batch_size`; cada bloque se inserta en su propia transacción.
+    """
+
+    if source not in IMPORT_FORMATS:
+        raise ValueError(f'Formato no soportado: {source}')
+    if source == 'phenocam' and not species_name:
+        raise ValueError('PhenoCam requiere indicar la especie (scientific_name)')
+
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(stream, 'mode', ''):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    # Las exportaciones de PhenoCam empiezan con líneas de comentario '#'
+    reader = csv.DictReader(line for line in stream if not line.startswith('#'))
+
+    result = ImportResult()
+    records = parse_phenocam(reader, result, species_name) if source == 'phenocam' else parse_inaturalist(reader, result)
+    lookups = LookupCache(source, user, result)
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                _import_batch(batch, lookups, user, result)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            _import_batch(batch, lookups, user, result)
+
+    # bulk_create no emite señales: actualizar cachés y agregados derivados una vez
+    if result.created_locations:
+        location_index.invalidate()
+    if result.imported:
+        rebuild_calendars(set(lookups.species.values()))
+    invalidate_statistics()
+    return result
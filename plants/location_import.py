@@ -0,0 +1,250 @@
+"""
+Carga masiva de ubicaciones
+Importación de sitios desde CSV o GeoJSON con upsert en SQL por código de sitio
+"""
+
+import csv
+import hashlib
+import io
+import json
+
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from .models import Location
+from .spatial import location_index
+from .statistics import invalidate_statistics
+
+
+# Filas por sentencia INSERT ... SELECT FROM unnest(...)
+LOCATION_BATCH_SIZE = 5000
+
+LOCATION_FORMATS = ('csv', 'geojson')
+
+# Nombres de columna aceptados para cada campo (el primero presente gana)
+COLUMN_ALIASES = {
+    'site_code': ('site_code', 'code', 'site_id', 'id'),
+    'name': ('name', 'site_name', 'nombre'),
+    'latitude': ('latitude', 'lat', 'latitud'),
+    'longitude': ('longitude', 'lon', 'lng', 'longitud'),
+    'altitude': ('altitude', 'elevation', 'altitud'),
+    'country': ('country', 'pais', 'país'),
+    'region': ('region', 'state', 'región'),
+    'description': ('description', 'descripcion', 'descripción'),
+}
+
+# Campos de texto con longitud máxima: una fila demasiado larga se descarta en lugar de abortar la carga
+LENGTH_CHECKED_FIELDS = ('site_code', 'name', 'country', 'region')
+
+# Las coordenadas PostGIS y los campos decimales se calculan a partir de los
+# mismos float8 en la propia sentencia, así ambas representaciones coinciden
+UPSERT_LOCATIONS_SQL = """
+    INSERT INTO {table} AS l (site_code, name, latitude, longitude, coordinates, altitude,
+                              country, region, description, created_at, updated_at, is_active)
+    SELECT v.site_code, v.name, round(v.lat::numeric, 7), round(v.lon::numeric, 7),
+           ST_SetSRID(ST_MakePoint(v.lon, v.lat), 4326), v.altitude,
+           v.country, v.region, v.description, now(), now(), TRUE
+    FROM unnest(%s::varchar[], %s::varchar[], %s::float8[], %s::float8[], %s::float8[],
+                %s::varchar[], %s::varchar[], %s::text[])
+         AS v(site_code, name, lat, lon, altitude, country, region, description)
+    ON CONFLICT (site_code) DO UPDATE SET
+        name = EXCLUDED.name,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        coordinates = EXCLUDED.coordinates,
+        altitude = COALESCE(EXCLUDED.altitude, l.altitude),
+        country = EXCLUDED.country,
+        region = COALESCE(NULLIF(EXCLUDED.region, ''), l.region),
+        description = COALESCE(NULLIF(EXCLUDED.description, ''), l.description),
+        updated_at = EXCLUDED.updated_at
+    RETURNING (xmax = 0) AS inserted
+"""
+
+# Repara filas cuyos campos decimales no coinciden con coordinates (autoritativo)
+SYNC_COORDINATES_SQL = """
+    UPDATE {table} SET
+        latitude = round(ST_Y(coordinates)::numeric, 7),
+        longitude = round(ST_X(coordinates)::numeric, 7),
+        updated_at = now()
+    WHERE latitude IS DISTINCT FROM round(ST_Y(coordinates)::numeric, 7)
+       OR longitude IS DISTINCT FROM round(ST_X(coordinates)::numeric, 7)
+"""
+
+
+class LocationImportResult:
+    """Contadores de una carga de ubicaciones"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.errors = []
+
+    def skip(self, line, reason):
+        self.skipped += 1
+        if len(self.errors) < 100:
+            self.errors.append(f'Fila {line}: {reason}')
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _pick(row, field):
+    for column in COLUMN_ALIASES[field]:
+        value = row.get(column)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _float(value, limit=None):
+    number = float(value)
+    if limit is not None and not -limit <= number <= limit:
+        raise ValueError(f'Coordenada fuera de rango: {value}')
+    return number
+
+
+def natural_key(site_code, country, name):
+    """
+    Código del sitio, o país + nombre cuando la fuente no trae código.
+
+    La clave derivada que no cabe en site_code se recorta y se completa con
+    un resumen del texto completo para que siga siendo única.
+    """
+    if site_code not in (None, ''):
+        return str(site_code).strip()
+    key = f'{slugify(country)}:{slugify(name)}'
+    max_length = Location._meta.get_field('site_code').max_length
+    if len(key) > max_length:
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        key = f'{key[:max_length - len(digest) - 1]}~{digest}'
+    return key
+
+
+def _check_lengths(row):
+    for field in LENGTH_CHECKED_FIELDS:
+        max_length = Location._meta.get_field(field).max_length
+        if len(row[field]) > max_length:
+            raise ValueError(f'{field} supera {max_length} caracteres')
+    return row
+
+
+def _location_row(properties, latitude, longitude, default_country, altitude=None):
+    name = (_pick(properties, 'name') or '').strip()
+    if not name:
+        raise ValueError('sin nombre')
+    country = (_pick(properties, 'country') or default_country or '').strip()
+    if not country:
+        raise ValueError('sin país')
+    altitude = _pick(properties, 'altitude') if altitude is None else altitude
+    return _check_lengths({
+        'site_code': natural_key(_pick(properties, 'site_code'), country, name),
+        'name': name,
+        'latitude': _float(latitude, 90),
+        'longitude': _float(longitude, 180),
+        'altitude': _float(altitude) if altitude not in (None, '') else None,
+        'country': country,
+        'region': (_pick(properties, 'region') or '').strip(),
+        'description': (_pick(properties, 'description') or '').strip(),
+    })
+
+
+def parse_csv(stream, result, default_country=None):
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        result.rows += 1
+        try:
+            yield _location_row(row, _pick(row, 'latitude'), _pick(row, 'longitude'), default_country)
+        except (TypeError, ValueError) as e:
+            result.skip(line, str(e))
+
+
+def parse_geojson(stream, result, default_country=None):
+    """Features Point de una FeatureCollection ([lon, lat] o [lon, lat, alt])"""
+    collection = json.load(stream)
+    features = collection.get('features') if isinstance(collection, dict) else None
+    if features is None:
+        raise ValueError('Se esperaba una FeatureCollection GeoJSON')
+
+    for index, feature in enumerate(features, start=1):
+        result.rows += 1
+        try:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                raise ValueError(f"geometría {geometry.get('type')} no soportada (solo Point)")
+            position = geometry['coordinates']
+            properties = dict(feature.get('properties') or {})
+            if feature.get('id') is not None:
+                properties.setdefault('site_code', feature['id'])
+            yield _location_row(
+                properties, position[1], position[0], default_country,
+                altitude=position[2] if len(position) > 2 else None
+            )
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+            result.skip(index, str(e))
+
+
+def _upsert_batch(rows, result):
+    # ON CONFLICT no admite dos filas con la misma clave en una sentencia: gana la última
+    unique = {}
+    for row in rows:
+        if row['site_code'] in unique:
+            result.duplicates += 1
+        unique[row['site_code']] = row
+    rows = list(unique.values())
+
+    columns = ('site_code', 'name', 'latitude', 'longitude', 'altitude', 'country', 'region', 'description')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT_LOCATIONS_SQL.format(table=connection.ops.quote_name(Location._meta.db_table)),
+            [[row[column] for row in rows] for column in columns]
+        )
+        inserted = sum(1 for (was_inserted,) in cursor.fetchall() if was_inserted)
+    result.created += inserted
+    result.updated += len(rows) - inserted
+
+
+def import_locations(stream, source_format, default_country=None, batch_size=LOCATION_BATCH_SIZE):
+    """
+    Crear o actualizar ubicaciones en bloque.
+
+    Cada bloque es un único INSERT ... ON CONFLICT (site_code) DO UPDATE
+    que calcula coordinates, latitude y longitude en SQL a partir de los
+    mismos valores; Location.save() no interviene.
+    """
+
+    if source_format not in LOCATION_FORMATS:
+        raise ValueError(f'Formato no soportado: {source_format}')
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(stream, 'mode', ''):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    result = LocationImportResult()
+    parse = parse_geojson if source_format == 'geojson' else parse_csv
+    rows = parse(stream, result, default_country)
+
+    batch = []
+    with transaction.atomic():
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _upsert_batch(batch, result)
+                batch = []
+        if batch:
+            _upsert_batch(batch, result)
+
+    # El SQL directo no emite señales
+    if result.created or result.updated:
+        location_index.invalidate()
+        invalidate_statistics()
+    return result
+
+
+def sync_location_coordinates():
+    """Alinear latitude/longitude con coordinates en las filas inconsistentes; devuelve cuántas"""
+    with connection.cursor() as cursor:
+        cursor.execute(SYNC_COORDINATES_SQL.format(table=connection.ops.quote_name(Location._meta.db_table)))
+        fixed = cursor.rowcount
+    if fixed:
+        location_index.invalidate()
+    return fixed
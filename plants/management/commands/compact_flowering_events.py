@@ -0,0 +1,28 @@
+"""
+Compacta los eventos de floración repetidos del mismo día y etapa
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from plants.compaction import COMPACTION_BATCH_MONITORS, compact_events
+
+
+class Command(BaseCommand):
+    help = 'Fusiona los eventos de una planta con el mismo día y etapa (confianza máxima, intensidad media)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Limitar a los eventos de los últimos N días (por defecto, todo el histórico)')
+        parser.add_argument('--batch-size', type=int, default=COMPACTION_BATCH_MONITORS,
+                            help='Plantas por bloque')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        result = compact_events(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Grupos compactados: {result['groups']}, eventos eliminados: {result['removed']} "
+            f"({result['monitors']} plantas)"
+        ))
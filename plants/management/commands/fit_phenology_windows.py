@@ -0,0 +1,29 @@
+"""
+Ajusta las ventanas fenológicas por especie y banda de latitud desde el histórico de eventos
+"""
+
+from django.core.management.base import BaseCommand
+
+from plants.models import FloweringEvent
+from plants.phenology import fit_windows
+
+
+class Command(BaseCommand):
+    help = 'Ajusta inicio, máximo y duración de floración; por defecto solo especies con datos nuevos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('species_ids', nargs='*', type=int, help='Especies a ajustar')
+        parser.add_argument('--all', action='store_true', help='Reajustar todas las especies con eventos')
+        parser.add_argument('--band-size', type=int, default=None, help='Grados por banda de latitud')
+        parser.add_argument('--min-seasons', type=int, default=None, help='Temporadas mínimas por ventana')
+
+    def handle(self, *args, **options):
+        species_ids = options['species_ids'] or None
+        if options['all']:
+            species_ids = FloweringEvent.objects.values_list('plant_monitor__species_id', flat=True).distinct()
+        result = fit_windows(
+            species_ids, band_size=options['band_size'], min_seasons=options['min_seasons']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Especies ajustadas: {result['species']}, ventanas: {result['windows']}"
+        ))
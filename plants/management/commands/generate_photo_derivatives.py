@@ -0,0 +1,28 @@
+"""
+Genera las miniaturas de las fotos de plantas y eventos que aún no las tienen
+"""
+
+from django.core.management.base import BaseCommand
+
+from plants.models import FloweringEvent, PlantMonitor
+from plants.photos import generate_derivatives, get_executor
+
+
+class Command(BaseCommand):
+    help = 'Genera (o regenera con --all) los derivados WebP/JPEG de las fotos en el pool de hilos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerar también las fotos con derivados vigentes')
+
+    def handle(self, *args, **options):
+        futures = []
+        for model in (PlantMonitor, FloweringEvent):
+            photos = model.objects.exclude(photo='').values_list('pk', 'photo', 'photo_derivatives')
+            for pk, photo, derivatives in photos.iterator():
+                if options['all'] or (derivatives or {}).get('source') != photo:
+                    futures.append(get_executor().submit(generate_derivatives, model, pk))
+
+        generated = sum(1 for future in futures if future.result() is not None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Derivados generados para {generated} de {len(futures)} fotos pendientes'
+        ))
@@ -0,0 +1,43 @@
+"""
+Importa eventos de floración desde exportaciones CSV de iNaturalist o PhenoCam
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from plants.importers import IMPORT_BATCH_SIZE, IMPORT_FORMATS, import_flowering_events
+
+
+class Command(BaseCommand):
+    help = 'Importa en streaming un CSV de iNaturalist o PhenoCam creando especies, ubicaciones y plantas según haga falta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Ruta del archivo CSV')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, required=True, help='Origen de la exportación')
+        parser.add_argument('--species', default=None, help='Nombre científico (obligatorio para PhenoCam)')
+        parser.add_argument('--user', default=None, help='Usuario responsable (por defecto, el primer superusuario)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Filas por bloque')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options['user']) if options['user'] else \
+            User.objects.filter(is_superuser=True).order_by('id')
+        user = users.first()
+        if user is None:
+            raise CommandError('No se encontró el usuario responsable de la importación')
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                result = import_flowering_events(
+                    stream, options['format'], user,
+                    species_name=options['species'], batch_size=options['batch_size']
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors[:20]:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Filas: {result.rows}, importados: {result.imported}, duplicados: {result.duplicates}, '
+            f'omitidos: {result.skipped} (nuevas especies: {result.created_species}, '
+            f'ubicaciones: {result.created_locations}, plantas: {result.created_monitors})'
+        ))
@@ -0,0 +1,50 @@
+"""
+Carga masiva de ubicaciones desde CSV o GeoJSON
+"""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from plants.location_import import (
+    LOCATION_BATCH_SIZE, LOCATION_FORMATS, import_locations, sync_location_coordinates
+)
+
+
+class Command(BaseCommand):
+    help = 'Crea o actualiza ubicaciones en bloque (upsert por código de sitio) desde CSV o GeoJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Ruta del archivo CSV o GeoJSON')
+        parser.add_argument('--format', choices=LOCATION_FORMATS, default=None,
+                            help='Formato del archivo (por defecto, según la extensión)')
+        parser.add_argument('--country', default=None, help='País para las filas que no lo indican')
+        parser.add_argument('--batch-size', type=int, default=LOCATION_BATCH_SIZE, help='Filas por sentencia')
+        parser.add_argument('--sync', action='store_true',
+                            help='Alinear latitude/longitude con coordinates en las filas existentes')
+
+    def handle(self, *args, **options):
+        if options['sync']:
+            fixed = sync_location_coordinates()
+            self.stdout.write(self.style.SUCCESS(f'Ubicaciones sincronizadas: {fixed}'))
+        if not options['path']:
+            if not options['sync']:
+                raise CommandError('Indique un archivo o --sync')
+            return
+
+        path = Path(options['path'])
+        source_format = options['format'] or ('geojson' if path.suffix.lower() in ('.geojson', '.json') else 'csv')
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                result = import_locations(
+                    stream, source_format, default_country=options['country'], batch_size=options['batch_size']
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors[:20]:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Filas: {result.rows}, creadas: {result.created}, actualizadas: {result.updated}, '
+            f'duplicadas: {result.duplicates}, omitidas: {result.skipped}'
+        ))
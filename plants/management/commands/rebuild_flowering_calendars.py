@@ -0,0 +1,18 @@
+"""
+Reconstruye los calendarios de floración por especie desde los eventos registrados
+"""
+
+from django.core.management.base import BaseCommand
+
+from plants.flowering_calendar import rebuild_calendars
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los histogramas de floración por especie con una consulta agrupada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('species_ids', nargs='*', type=int, help='Especies a reconstruir (por defecto, todas)')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_calendars(options['species_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Calendarios reconstruidos: {rebuilt}'))
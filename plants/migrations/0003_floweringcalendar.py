@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0002_location_coordinates_alter_location_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FloweringCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('histogram', models.JSONField(default=dict, help_text='Suma de confianza por etapa y día del año', verbose_name='Histograma')),
+                ('event_count', models.PositiveIntegerField(default=0, verbose_name='Eventos')),
+                ('total_weight', models.FloatField(default=0, verbose_name='Peso total')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('species', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='flowering_calendar', to='plants.plantspecies', verbose_name='Especie')),
+            ],
+            options={
+                'verbose_name': 'Calendario de floración',
+                'verbose_name_plural': 'Calendarios de floración',
+            },
+        ),
+    ]
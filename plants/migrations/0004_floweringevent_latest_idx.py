@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0003_floweringcalendar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='floweringevent',
+            index=models.Index(fields=['plant_monitor', '-detection_date'], name='floweringevent_latest_idx'),
+        ),
+    ]
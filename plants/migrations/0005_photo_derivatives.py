@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0004_floweringevent_latest_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floweringevent',
+            name='photo_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Miniaturas generadas en segundo plano: {tamaño: {formato: ruta}, source: foto original}', verbose_name='Derivados de la foto'),
+        ),
+        migrations.AddField(
+            model_name='plantmonitor',
+            name='photo_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Miniaturas generadas en segundo plano: {tamaño: {formato: ruta}, source: foto original}', verbose_name='Derivados de la foto'),
+        ),
+    ]
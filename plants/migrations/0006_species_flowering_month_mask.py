@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+from plants.flowering_months import parse_flowering_months
+
+
+def populate_month_masks(apps, schema_editor):
+    PlantSpecies = apps.get_model('plants', 'PlantSpecies')
+    species = list(PlantSpecies.objects.only('id', 'typical_flowering_months'))
+    for item in species:
+        item.flowering_month_mask = parse_flowering_months(item.typical_flowering_months)
+    PlantSpecies.objects.bulk_update(species, ['flowering_month_mask'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0005_photo_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plantspecies',
+            name='flowering_month_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Meses de floración como máscara de 12 bits (bit 0 = enero), derivada del texto', verbose_name='Máscara de meses'),
+        ),
+        migrations.RunPython(populate_month_masks, migrations.RunPython.noop),
+    ]
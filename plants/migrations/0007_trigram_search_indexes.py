@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:38
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0006_species_flowering_month_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='location_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plantmonitor',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('identifier'), name='gin_trgm_ops'), name='monitor_identifier_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plantspecies',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='species_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plantspecies',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('scientific_name'), name='gin_trgm_ops'), name='species_sciname_trgm_idx'),
+        ),
+    ]
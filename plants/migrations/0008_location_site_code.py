@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:39
+
+from django.db import migrations, models
+
+from plants.location_import import natural_key
+
+
+def backfill_site_codes(apps, schema_editor):
+    """
+    Clave natural (país + nombre) para las ubicaciones existentes, la misma
+    que usa la carga masiva, para que reimportarlas actualice en lugar de
+    duplicar. Con varias ubicaciones de igual clave solo la más antigua la
+    recibe; el resto queda sin código.
+    """
+    Location = apps.get_model('plants', 'Location')
+    taken = set(Location.objects.exclude(site_code=None).values_list('site_code', flat=True))
+    locations = []
+    for location in Location.objects.filter(site_code=None).only('id', 'name', 'country').order_by('id'):
+        key = natural_key(None, location.country, location.name)
+        if key in taken:
+            continue
+        taken.add(key)
+        location.site_code = key
+        locations.append(location)
+    Location.objects.bulk_update(locations, ['site_code'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0007_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='site_code',
+            field=models.CharField(blank=True, help_text='Clave natural del sitio en la red de origen; las cargas masivas actualizan por este código', max_length=100, null=True, unique=True, verbose_name='Código del sitio'),
+        ),
+        migrations.RunPython(backfill_site_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0008_location_site_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floweringevent',
+            name='source_count',
+            field=models.PositiveIntegerField(default=1, help_text='Observaciones del mismo día y etapa fusionadas en este evento', verbose_name='Observaciones'),
+        ),
+    ]
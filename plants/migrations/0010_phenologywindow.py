@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0009_floweringevent_source_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plantspecies',
+            name='phenology_fitted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Último ajuste de las ventanas fenológicas a partir del histórico', null=True, verbose_name='Fenología ajustada'),
+        ),
+        migrations.CreateModel(
+            name='PhenologyWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude_min', models.SmallIntegerField(verbose_name='Latitud mínima')),
+                ('latitude_max', models.SmallIntegerField(verbose_name='Latitud máxima')),
+                ('onset_day', models.FloatField(verbose_name='Inicio (día del año)')),
+                ('peak_day', models.FloatField(verbose_name='Máximo (día del año)')),
+                ('end_day', models.FloatField(verbose_name='Fin (día del año)')),
+                ('duration_days', models.FloatField(verbose_name='Duración (días)')),
+                ('onset_std', models.FloatField(default=0, verbose_name='Desviación inicio (días)')),
+                ('peak_std', models.FloatField(default=0, verbose_name='Desviación máximo (días)')),
+                ('seasons', models.PositiveIntegerField(help_text='Temporadas (planta y año) usadas en el ajuste', verbose_name='Temporadas')),
+                ('event_count', models.PositiveIntegerField(default=0, verbose_name='Eventos')),
+                ('fitted_at', models.DateTimeField(verbose_name='Ajustada')),
+                ('species', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='phenology_windows', to='plants.plantspecies', verbose_name='Especie')),
+            ],
+            options={
+                'verbose_name': 'Ventana fenológica',
+                'verbose_name_plural': 'Ventanas fenológicas',
+                'ordering': ['species', 'latitude_min'],
+                'unique_together': {('species', 'latitude_min', 'latitude_max')},
+            },
+        ),
+    ]
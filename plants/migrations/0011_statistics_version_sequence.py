@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0010_phenologywindow'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS plants_statistics_version',
+            'DROP SEQUENCE IF EXISTS plants_statistics_version',
+        ),
+    ]
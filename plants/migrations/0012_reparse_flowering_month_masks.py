@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:58
+
+from django.db import migrations
+
+from plants.flowering_months import DASHES, parse_flowering_months
+
+
+def reparse_dashed_ranges(apps, schema_editor):
+    """Las máscaras de rangos con guion tipográfico ("Marzo–Mayo") se calcularon mal"""
+    PlantSpecies = apps.get_model('plants', 'PlantSpecies')
+    species = [
+        item for item in PlantSpecies.objects.only('id', 'typical_flowering_months')
+        if item.typical_flowering_months.translate(DASHES) != item.typical_flowering_months
+    ]
+    for item in species:
+        item.flowering_month_mask = parse_flowering_months(item.typical_flowering_months)
+    PlantSpecies.objects.bulk_update(species, ['flowering_month_mask'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0011_statistics_version_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparse_dashed_ranges, migrations.RunPython.noop),
+    ]
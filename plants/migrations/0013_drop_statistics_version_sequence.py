@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0012_reparse_flowering_month_masks'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'DROP SEQUENCE IF EXISTS plants_statistics_version',
+            'CREATE SEQUENCE IF NOT EXISTS plants_statistics_version',
+        ),
+    ]
@@ -4,10 +4,15 @@ Gestiona información de plantas y especies monitoreadas
 """
 
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import Case, F, Q, Value, When, Window
+from django.db.models.functions import RowNumber, TruncDate, Upper
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.gis.geos import Point
 
+from .flowering_months import parse_flowering_months
+
 
 class PlantSpecies(models.Model):
     """Especies de plantas que monitoreamos"""
@@ -36,6 +41,19 @@ class PlantSpecies(models.Model):
         help_text="Duración típica de floración en días",
         verbose_name="Duración floración (días)"
     )
+    phenology_fitted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Último ajuste de las ventanas fenológicas a partir del histórico",
+        verbose_name="Fenología ajustada"
+    )
+    flowering_month_mask = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Meses de floración como máscara de 12 bits (bit 0 = enero), derivada del texto",
+        verbose_name="Máscara de meses"
+    )
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
@@ -46,6 +64,19 @@ class PlantSpecies(models.Model):
         verbose_name = "Especie de planta"
         verbose_name_plural = "Especies de plantas"
         ordering = ['name']
+        indexes = [
+            # Búsqueda por trigramas sobre UPPER(), la expresión que usan icontains y plants.search
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='species_name_trgm_idx'),
+            GinIndex(OpClass(Upper('scientific_name'), name='gin_trgm_ops'), name='species_sciname_trgm_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        """Mantener la máscara de meses sincronizada con el texto"""
+        self.flowering_month_mask = parse_flowering_months(self.typical_flowering_months)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'typical_flowering_months' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'flowering_month_mask'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.name} ({self.scientific_name})"
@@ -55,6 +86,14 @@ class Location(models.Model):
     """Ubicaciones geográficas donde monitoreamos plantas"""
     
     name = models.CharField(max_length=200, verbose_name="Nombre del lugar")
+    site_code = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Clave natural del sitio en la red de origen; las cargas masivas actualizan por este código",
+        verbose_name="Código del sitio"
+    )
     
     # Campo geoespacial PostGIS
     coordinates = models.PointField(
@@ -94,6 +133,9 @@ class Location(models.Model):
         verbose_name = "Ubicación"
         verbose_name_plural = "Ubicaciones"
         ordering = ['name']
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='location_name_trgm_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         """Sincronizar coordenadas PostGIS con campos tradicionales"""
@@ -136,6 +178,13 @@ class PlantMonitor(models.Model):
     # Información adicional
     notes = models.TextField(blank=True, verbose_name="Notas")
     photo = models.ImageField(upload_to='plants/photos/', blank=True, verbose_name="Foto")
+    photo_derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Miniaturas generadas en segundo plano: {tamaño: {formato: ruta}, source: foto original}",
+        verbose_name="Derivados de la foto"
+    )
     
     # Usuario responsable
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Creado por")
@@ -148,11 +197,41 @@ class PlantMonitor(models.Model):
         verbose_name = "Monitor de planta"
         verbose_name_plural = "Monitores de plantas"
         ordering = ['name']
+        indexes = [
+            GinIndex(OpClass(Upper('identifier'), name='gin_trgm_ops'), name='monitor_identifier_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.species.name}"
 
 
+class FloweringEventQuerySet(models.QuerySet):
+    
+    def compacted(self):
+        """
+        Un evento por (planta, día local, etapa): el que conserva plants.compaction.
+        
+        Los reportes de usuario y los eventos con foto nunca se fusionan y se
+        devuelven siempre. De cada grupo restante se devuelve la fila canónica
+        (mayor confianza y, a igualdad, la más antigua) con sus propios
+        valores: confidence_score, intensity y source_count solo resumen el
+        grupo completo cuando la compactación ya lo ha procesado.
+        """
+        # Las filas que no se fusionan forman un grupo propio (su id)
+        merge_group = Case(
+            When(Q(detection_method__in=FloweringEvent.UNMERGED_DETECTION_METHODS) | ~Q(photo=''), then=F('id')),
+            default=Value(0),
+            output_field=models.BigIntegerField(),
+        )
+        return self.alias(
+            group_rank=Window(
+                RowNumber(),
+                partition_by=['plant_monitor_id', TruncDate('detection_date'), 'flowering_stage', merge_group],
+                order_by=[F('confidence_score').desc(), 'id'],
+            )
+        ).filter(group_rank=1)
+
+
 class FloweringEvent(models.Model):
     """Eventos de floración observados o detectados"""
     
@@ -163,6 +242,9 @@ class FloweringEvent(models.Model):
         ('user_report', 'Reporte de usuario'),
     ]
     
+    # La compactación no fusiona estos eventos: conservan autor, notas y foto
+    UNMERGED_DETECTION_METHODS = ('user_report',)
+    
     FLOWERING_STAGES = [
         ('bud', 'Capullo'),
         ('early', 'Floración temprana'),
@@ -199,10 +281,22 @@ class FloweringEvent(models.Model):
         help_text="Intensidad de la floración (0-100%)",
         verbose_name="Intensidad (%)"
     )
+    source_count = models.PositiveIntegerField(
+        default=1,
+        help_text="Observaciones del mismo día y etapa fusionadas en este evento",
+        verbose_name="Observaciones"
+    )
     
     # Datos adicionales
     notes = models.TextField(blank=True, verbose_name="Notas")
     photo = models.ImageField(upload_to='flowering/photos/', blank=True, verbose_name="Foto")
+    photo_derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Miniaturas generadas en segundo plano: {tamaño: {formato: ruta}, source: foto original}",
+        verbose_name="Derivados de la foto"
+    )
     
     # Usuario que registró (si aplica)
     reported_by = models.ForeignKey(
@@ -217,10 +311,88 @@ class FloweringEvent(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = FloweringEventQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Evento de floración"
         verbose_name_plural = "Eventos de floración"
         ordering = ['-detection_date']
+        indexes = [
+            # Último evento por planta (DISTINCT ON plant_monitor ... ORDER BY detection_date DESC)
+            models.Index(fields=['plant_monitor', '-detection_date'], name='floweringevent_latest_idx'),
+        ]
     
     def __str__(self):
         return f"{self.plant_monitor.name} - {self.flowering_stage} ({self.detection_date.date()})"
+
+
+class FloweringCalendar(models.Model):
+    """Calendario de floración precalculado por especie"""
+    
+    species = models.OneToOneField(
+        PlantSpecies,
+        on_delete=models.CASCADE,
+        related_name='flowering_calendar',
+        verbose_name="Especie"
+    )
+    
+    # Histograma por etapa: {etapa: [peso por día del año (1-366)]}, ponderado por confianza
+    histogram = models.JSONField(
+        default=dict,
+        help_text="Suma de confianza por etapa y día del año",
+        verbose_name="Histograma"
+    )
+    event_count = models.PositiveIntegerField(default=0, verbose_name="Eventos")
+    total_weight = models.FloatField(default=0, verbose_name="Peso total")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Calendario de floración"
+        verbose_name_plural = "Calendarios de floración"
+    
+    def __str__(self):
+        return f"Calendario {self.species.name} ({self.event_count} eventos)"
+
+
+class PhenologyWindow(models.Model):
+    """Ventana de floración aprendida del histórico, por especie y banda de latitud"""
+    
+    species = models.ForeignKey(
+        PlantSpecies,
+        on_delete=models.CASCADE,
+        related_name='phenology_windows',
+        verbose_name="Especie"
+    )
+    
+    # Banda de latitud [min, max); la ventana de toda la especie usa [-90, 90]
+    latitude_min = models.SmallIntegerField(verbose_name="Latitud mínima")
+    latitude_max = models.SmallIntegerField(verbose_name="Latitud máxima")
+    
+    # Días del año (1-366) medios entre temporadas
+    onset_day = models.FloatField(verbose_name="Inicio (día del año)")
+    peak_day = models.FloatField(verbose_name="Máximo (día del año)")
+    end_day = models.FloatField(verbose_name="Fin (día del año)")
+    duration_days = models.FloatField(verbose_name="Duración (días)")
+    onset_std = models.FloatField(default=0, verbose_name="Desviación inicio (días)")
+    peak_std = models.FloatField(default=0, verbose_name="Desviación máximo (días)")
+    
+    seasons = models.PositiveIntegerField(
+        help_text="Temporadas (planta y año) usadas en el ajuste",
+        verbose_name="Temporadas"
+    )
+    event_count = models.PositiveIntegerField(default=0, verbose_name="Eventos")
+    fitted_at = models.DateTimeField(verbose_name="Ajustada")
+    
+    class Meta:
+        verbose_name = "Ventana fenológica"
+        verbose_name_plural = "Ventanas fenológicas"
+        ordering = ['species', 'latitude_min']
+        unique_together = ['species', 'latitude_min', 'latitude_max']
+    
+    @property
+    def is_species_wide(self):
+        return self.latitude_min == -90 and self.latitude_max == 90
+    
+    def __str__(self):
+        return f"{self.species.name} [{self.latitude_min}, {self.latitude_max}): día {self.peak_day:.0f}"
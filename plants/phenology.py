@@ -0,0 +1,238 @@
+"""
+Ventanas fenológicas aprendidas
+Inicio, máximo y duración de la floración por especie y banda de latitud, ajustados con NumPy
+"""
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .flowering_calendar import DAYS_IN_YEAR, MONTH_STARTS
+from .models import FloweringEvent, PhenologyWindow, PlantSpecies
+
+
+# Etapa cuyos días estiman el máximo de cada temporada
+PEAK_STAGE = 'peak'
+
+# Banda que representa a toda la especie
+SPECIES_WIDE_BAND = (-90, 90)
+
+# Especies ajustadas por lectura del histórico (memoria acotada)
+FIT_SPECIES_CHUNK = 200
+
+
+def _cache_key(species_id, fitted_at):
+    # Versionada por el último ajuste leído de la base de datos: un ajuste en
+    # otro proceso (el comando) deja obsoletas las entradas de todos los workers
+    version = fitted_at.timestamp() if fitted_at else 'none'
+    return f'phenology:windows:{species_id}:{version}'
+
+
+def stale_species():
+    """Especies con eventos creados o modificados después de su último ajuste"""
+    events = FloweringEvent.objects.filter(plant_monitor__species=OuterRef('pk'))
+    return PlantSpecies.objects.alias(
+        has_events=Exists(events),
+        has_new_events=Exists(events.filter(updated_at__gt=OuterRef('phenology_fitted_at'))),
+    ).filter(
+        Q(phenology_fitted_at__isnull=True, has_events=True) | Q(has_new_events=True)
+    ).values_list('id', flat=True)
+
+
+def _read_events(species_ids):
+    """Columnas NumPy de los eventos de las especies (día del año sobre el eje bisiesto)"""
+    rows = FloweringEvent.objects.filter(
+        plant_monitor__species_id__in=species_ids
+    ).annotate(
+        year=ExtractYear('detection_date'),
+        month=ExtractMonth('detection_date'),
+        day=ExtractDay('detection_date'),
+    ).values_list(
+        'plant_monitor__species_id', 'plant_monitor_id', 'plant_monitor__location__latitude',
+        'year', 'month', 'day', 'flowering_stage', 'confidence_score', 'source_count'
+    ).order_by()
+
+    rows = list(rows)
+    columns = list(zip(*rows)) if rows else [()] * 9
+    species, monitor, latitude, year, month, day, stage, confidence, sources = columns
+    month_starts = np.asarray(MONTH_STARTS, dtype=np.int64)
+    return {
+        'species': np.asarray(species, dtype=np.int64),
+        'monitor': np.asarray(monitor, dtype=np.int64),
+        'latitude': np.asarray(latitude, dtype=np.float64),
+        'year': np.asarray(year, dtype=np.int64),
+        'doy': month_starts[np.asarray(month, dtype=np.int64) - 1] + np.asarray(day, dtype=np.int64) - 1
+        if len(month) else np.empty(0, dtype=np.int64),
+        'is_peak': np.asarray(stage, dtype=object) == PEAK_STAGE,
+        'weight': np.asarray(confidence, dtype=np.float64) * np.asarray(sources, dtype=np.float64),
+    }
+
+
+def _season_statistics(events):
+    """
+    Inicio, máximo y fin de cada temporada (planta y año).
+
+    Inicio y fin son el primer y último día con cualquier etapa; el máximo
+    es la media ponderada por confianza de los días en etapa 'peak', o de
+    todos los días si la temporada no tiene ninguno.
+    """
+
+    keys = np.stack([events['monitor'], events['year']], axis=1)
+    _, first, season = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    season = season.ravel()
+    n = len(first)
+    doy = events['doy'].astype(np.float64)
+    weight = events['weight']
+
+    onset = np.full(n, np.inf)
+    end = np.full(n, -np.inf)
+    np.minimum.at(onset, season, doy)
+    np.maximum.at(end, season, doy)
+
+    peak_weight = np.bincount(season, weights=weight * events['is_peak'], minlength=n)
+    peak_sum = np.bincount(season, weights=weight * doy * events['is_peak'], minlength=n)
+    all_weight = np.bincount(season, weights=weight, minlength=n)
+    all_sum = np.bincount(season, weights=weight * doy, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        peak = np.where(peak_weight > 0, peak_sum / peak_weight, all_sum / all_weight)
+    # Temporadas con confianza total nula: punto medio entre inicio y fin
+    peak = np.where(np.isfinite(peak), peak, (onset + end) / 2)
+
+    return {
+        'species': events['species'][first],
+        'latitude': events['latitude'][first],
+        'onset': onset,
+        'peak': peak,
+        'end': end,
+        'events': np.bincount(season, minlength=n),
+    }
+
+
+def _group_windows(seasons, group, now, min_seasons):
+    """Medias y desviaciones entre temporadas para cada grupo (especie, banda)"""
+
+    keys, inverse = np.unique(group, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    count = np.bincount(inverse, minlength=len(keys))
+
+    def mean_std(values):
+        mean = np.bincount(inverse, weights=values, minlength=len(keys)) / count
+        variance = np.bincount(inverse, weights=(values - mean[inverse]) ** 2, minlength=len(keys)) / count
+        return mean, np.sqrt(variance)
+
+    onset, onset_std = mean_std(seasons['onset'])
+    peak, peak_std = mean_std(seasons['peak'])
+    end, _ = mean_std(seasons['end'])
+    duration, _ = mean_std(seasons['end'] - seasons['onset'] + 1)
+    events = np.bincount(inverse, weights=seasons['events'], minlength=len(keys))
+
+    return [
+        PhenologyWindow(
+            species_id=int(species_id),
+            latitude_min=int(latitude_min),
+            latitude_max=int(latitude_max),
+            onset_day=round(float(onset[i]), 2),
+            peak_day=round(float(peak[i]), 2),
+            end_day=round(float(end[i]), 2),
+            duration_days=round(float(duration[i]), 2),
+            onset_std=round(float(onset_std[i]), 2),
+            peak_std=round(float(peak_std[i]), 2),
+            seasons=int(count[i]),
+            event_count=int(events[i]),
+            fitted_at=now,
+        )
+        for i, (species_id, latitude_min, latitude_max) in enumerate(keys)
+        if count[i] >= min_seasons
+    ]
+
+
+def fit_windows(species_ids=None, band_size=None, min_seasons=None):
+    """
+    Ajustar las ventanas de las especies indicadas o, por defecto, solo de
+    las que tienen datos nuevos desde su último ajuste.
+
+    Cada especie obtiene una ventana global ([-90, 90]) y una por banda de
+    latitud de `band_size` grados con al menos `min_seasons` temporadas.
+    Las temporadas son años naturales, por lo que una floración que cruza
+    el 31 de diciembre se reparte entre dos. Devuelve {'species', 'windows'}.
+    """
+
+    band_size = band_size or settings.PHENOLOGY_LATITUDE_BAND
+    min_seasons = min_seasons or settings.PHENOLOGY_MIN_SEASONS
+    species_ids = sorted(set(stale_species() if species_ids is None else species_ids))
+
+    windows = 0
+    for start in range(0, len(species_ids), FIT_SPECIES_CHUNK):
+        chunk = species_ids[start:start + FIT_SPECIES_CHUNK]
+        # Marca tomada antes de leer: lo que llegue durante el ajuste se reajusta en la siguiente pasada
+        now = timezone.now()
+        events = _read_events(chunk)
+
+        fitted = []
+        if len(events['doy']):
+            seasons = _season_statistics(events)
+            band_min = (np.floor(np.minimum(seasons['latitude'], 89.999) / band_size) * band_size).astype(np.int64)
+            band_max = np.minimum(band_min + band_size, 90)
+            species_wide = np.broadcast_to(np.asarray(SPECIES_WIDE_BAND), (len(band_min), 2))
+            fitted = (
+                _group_windows(seasons, np.column_stack([seasons['species'], species_wide]), now, min_seasons)
+                + _group_windows(seasons, np.column_stack([seasons['species'], band_min, band_max]), now, min_seasons)
+            )
+
+        # Sustituir las ventanas de las especies ajustadas (una banda puede quedar sin datos suficientes)
+        with transaction.atomic():
+            PhenologyWindow.objects.filter(species_id__in=chunk).delete()
+            PhenologyWindow.objects.bulk_create(fitted)
+            PlantSpecies.objects.filter(id__in=chunk).update(phenology_fitted_at=now)
+        windows += len(fitted)
+
+    return {'species': len(species_ids), 'windows': windows}
+
+
+def species_windows(species_id):
+    """Ventanas de una especie, de la banda más estrecha a la global (cacheadas hasta el próximo ajuste)"""
+    fitted_at = PlantSpecies.objects.filter(pk=species_id).values_list('phenology_fitted_at', flat=True).first()
+    key = _cache_key(species_id, fitted_at)
+    windows = cache.get(key)
+    if windows is None:
+        windows = [
+            {
+                'latitude_min': window.latitude_min,
+                'latitude_max': window.latitude_max,
+                'onset_day': window.onset_day,
+                'peak_day': window.peak_day,
+                'end_day': window.end_day,
+                'duration_days': window.duration_days,
+                'onset_std': window.onset_std,
+                'peak_std': window.peak_std,
+                'seasons': window.seasons,
+                'fitted_at': window.fitted_at,
+            }
+            for window in PhenologyWindow.objects.filter(species_id=species_id)
+        ]
+        windows.sort(key=lambda window: window['latitude_max'] - window['latitude_min'])
+        cache.set(key, windows, settings.PHENOLOGY_CACHE_TIMEOUT)
+    return windows
+
+
+def window_for(species_id, latitude=None):
+    """Ventana de la banda que contiene la latitud o, en su defecto, la de toda la especie"""
+    for window in species_windows(species_id):
+        band = (window['latitude_min'], window['latitude_max'])
+        if band == SPECIES_WIDE_BAND or (latitude is not None and band[0] <= latitude < band[1]):
+            return window
+    return None
+
+
+def window_position(window, day):
+    """Posición de una fecha respecto a la ventana: días hasta el máximo (circular) y si cae dentro"""
+    doy = MONTH_STARTS[day.month - 1] + day.day - 1
+    to_peak = (window['peak_day'] - doy + DAYS_IN_YEAR / 2) % DAYS_IN_YEAR - DAYS_IN_YEAR / 2
+    return {
+        'days_to_peak': round(to_peak, 1),
+        'in_window': window['onset_day'] <= doy <= window['end_day'],
+    }
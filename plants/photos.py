@@ -0,0 +1,134 @@
+"""
+Derivados de fotos de plantas y eventos
+Miniaturas WebP/JPEG generadas fuera de la petición en un pool de hilos
+"""
+
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+# Formatos generados para cada tamaño: (extensión, formato de Pillow)
+DERIVATIVE_FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+# Subdirectorio, junto al original, donde se guardan los derivados
+DERIVATIVES_DIR = 'derivatives'
+
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Pillow libera el GIL al decodificar, redimensionar y codificar
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PHOTO_DERIVATIVE_WORKERS,
+                thread_name_prefix='photo-derivatives',
+            )
+        return _executor
+
+
+def derivative_name(photo_name, size_name, extension):
+    """Ruta del derivado: <dir>/derivatives/<nombre>_<tamaño>.<ext>"""
+    directory, filename = posixpath.split(photo_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, DERIVATIVES_DIR, f'{stem}_{size_name}.{extension}')
+
+
+def derivatives_are_current(instance, field_name='photo'):
+    photo = getattr(instance, field_name)
+    return bool(photo) and (instance.photo_derivatives or {}).get('source') == photo.name
+
+
+def _open_scaled(file, max_side):
+    """
+    Abrir la imagen pidiendo al decodificador JPEG una versión reducida.
+
+    En modo draft libjpeg decodifica directamente a 1/2, 1/4 o 1/8 de la
+    resolución, lo que evita descomprimir fotos de 12+ MP completas.
+    """
+    image = Image.open(file)
+    image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return image
+
+
+def render_derivatives(storage, photo_name):
+    """Generar y guardar todos los derivados de una foto; devuelve {tamaño: {ext: ruta}}"""
+
+    sizes = settings.PHOTO_DERIVATIVE_SIZES
+    with storage.open(photo_name, 'rb') as file:
+        image = _open_scaled(file, max(sizes.values()))
+
+    # Del tamaño mayor al menor, reutilizando la reducción anterior
+    derivatives = {}
+    for size_name, max_side in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        derivatives[size_name] = {}
+        for extension, image_format in DERIVATIVE_FORMATS:
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=settings.PHOTO_DERIVATIVE_QUALITY, optimize=True)
+            name = derivative_name(photo_name, size_name, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            derivatives[size_name][extension] = storage.save(name, ContentFile(buffer.getvalue()))
+    return derivatives
+
+
+def generate_derivatives(model, pk, field_name='photo'):
+    """
+    Tarea del pool: generar los derivados de la foto actual de una instancia.
+
+    Se guardan con un UPDATE condicionado al nombre de la foto, de modo que
+    una foto reemplazada mientras tanto no recibe derivados de la anterior.
+    """
+    try:
+        photo_name = model.objects.filter(pk=pk).values_list(field_name, flat=True).first()
+        if not photo_name:
+            return None
+        storage = model._meta.get_field(field_name).storage
+        derivatives = dict(render_derivatives(storage, photo_name), source=photo_name)
+        model.objects.filter(pk=pk, **{field_name: photo_name}).update(photo_derivatives=derivatives)
+        return derivatives
+    except Exception:
+        logger.exception('Error generando derivados de %s %s', model._meta.label, pk)
+        return None
+    finally:
+        # Cada hilo del pool abre su propia conexión
+        connection.close()
+
+
+def schedule_derivatives(instance, field_name='photo'):
+    """Encolar la generación si la foto cambió; no bloquea la respuesta de subida"""
+    if getattr(instance, field_name) and not derivatives_are_current(instance, field_name):
+        get_executor().submit(generate_derivatives, type(instance), instance.pk, field_name)
+
+
+def derivative_urls(instance, request=None, field_name='photo'):
+    """URLs de los derivados vigentes, o None si aún no se han generado"""
+    if not derivatives_are_current(instance, field_name):
+        return None
+    storage = instance._meta.get_field(field_name).storage
+    urls = {}
+    for size_name, names in instance.photo_derivatives.items():
+        if size_name == 'source':
+            continue
+        urls[size_name] = {
+            extension: request.build_absolute_uri(storage.url(name)) if request else storage.url(name)
+            for extension, name in names.items()
+        }
+    return urls
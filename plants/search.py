@@ -0,0 +1,113 @@
+"""
+Búsqueda de especies, ubicaciones y plantas
+Búsqueda por trigramas (pg_trgm) con autocompletado por prefijo y tolerancia a erratas
+"""
+
+from django.db import connection, transaction
+
+from .models import Location, PlantMonitor, PlantSpecies
+
+
+# Umbral de word_similarity para aceptar una coincidencia aproximada (0-1)
+SEARCH_MIN_SIMILARITY = 0.3
+
+# Longitud mínima de la consulta (un trigrama útil necesita al menos dos letras)
+SEARCH_MIN_LENGTH = 2
+
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+
+# Bonificación de las coincidencias por prefijo sobre la similitud (0-1)
+PREFIX_BOOST = 1.0
+
+# Tipo de resultado -> (tabla, columna buscada, columna de detalle, filtro)
+SEARCH_TARGETS = {
+    'species': (PlantSpecies._meta.db_table, 'name', 'scientific_name', 'is_active'),
+    'scientific_name': (PlantSpecies._meta.db_table, 'scientific_name', 'name', 'is_active'),
+    'location': (Location._meta.db_table, 'name', 'region', 'is_active'),
+    'monitor': (PlantMonitor._meta.db_table, 'identifier', 'name', 'TRUE'),
+}
+
+# Los resultados por nombre científico se devuelven como especie
+RESULT_TYPES = {'species': 'species', 'scientific_name': 'species', 'location': 'location', 'monitor': 'monitor'}
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _branch(target):
+    """
+    SELECT de un tipo de resultado.
+
+    Las condiciones se escriben sobre UPPER(columna), la misma expresión que
+    los índices GIN gin_trgm_ops; así el índice sirve tanto el operador <%
+    (similitud de palabra) como el ILIKE de prefijo y el icontains del admin.
+    """
+    table, column, detail, condition = SEARCH_TARGETS[target]
+    quote = connection.ops.quote_name
+    column_sql = f'UPPER({quote(column)})'
+    return f"""
+        SELECT %(type_{target})s AS result_type, id, {quote(column)} AS label, {quote(detail)} AS detail,
+               word_similarity(%(query)s, {column_sql})
+               + CASE WHEN {column_sql} LIKE %(prefix)s THEN {PREFIX_BOOST} ELSE 0 END AS score,
+               {column_sql} LIKE %(prefix)s AS prefix_match
+        FROM {quote(table)}
+        WHERE {condition} AND (%(query)s <%% {column_sql} OR {column_sql} LIKE %(prefix)s)
+    """
+
+
+def search(query, limit=SEARCH_DEFAULT_LIMIT, types=None):
+    """
+    Resultados ordenados por relevancia en una sola consulta.
+
+    Cada rama (nombre común, nombre científico, ubicación, identificador de
+    planta) usa su índice de trigramas; las coincidencias por prefijo van
+    primero y dentro de cada grupo se ordena por similitud. Una especie que
+    coincide por los dos nombres aparece una vez con su mejor puntuación.
+    """
+
+    query = ' '.join((query or '').split()).upper()
+    if len(query) < SEARCH_MIN_LENGTH:
+        return []
+    limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+
+    targets = [target for target in SEARCH_TARGETS if types is None or RESULT_TYPES[target] in types]
+    if not targets:
+        return []
+
+    sql = f"""
+        SELECT result_type, id, label, detail, score::float8, prefix_match FROM (
+            SELECT DISTINCT ON (result_type, id) * FROM (
+                {' UNION ALL '.join(_branch(target) for target in targets)}
+            ) AS matches
+            ORDER BY result_type, id, score DESC
+        ) AS best
+        ORDER BY score DESC, label
+        LIMIT %(limit)s
+    """
+    params = {
+        'query': query,
+        'prefix': _escape_like(query) + '%',
+        'limit': limit,
+        **{f'type_{target}': RESULT_TYPES[target] for target in targets},
+    }
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Umbral local a la transacción para el operador <%
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+            [str(SEARCH_MIN_SIMILARITY)]
+        )
+        cursor.execute(sql, params)
+        return [
+            {
+                'type': result_type,
+                'id': pk,
+                'label': label,
+                'detail': detail,
+                'score': round(score, 4),
+                'prefix_match': prefix_match,
+            }
+            for result_type, pk, label, detail, score, prefix_match in cursor.fetchall()
+        ]
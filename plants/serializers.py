@@ -3,12 +3,28 @@ Serializers para la aplicación Plants
 """
 
 from rest_framework import serializers
+from .flowering_months import mask_to_months
 from .models import PlantSpecies, Location, PlantMonitor, FloweringEvent
+from .photos import derivative_urls
+
+
+class PhotoDerivativesMixin(serializers.Serializer):
+    """Expone las URLs de las miniaturas para que los listados no descarguen el original"""
+    
+    photo_thumbnails = serializers.SerializerMethodField()
+    
+    def get_photo_thumbnails(self, obj):
+        return derivative_urls(obj, self.context.get('request'))
 
 
 class PlantSpeciesSerializer(serializers.ModelSerializer):
     """Serializer para especies de plantas"""
     
+    flowering_months = serializers.SerializerMethodField()
+    
+    def get_flowering_months(self, obj):
+        return mask_to_months(obj.flowering_month_mask)
+    
     class Meta:
         model = PlantSpecies
         fields = '__all__'
@@ -22,7 +38,7 @@ class LocationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class PlantMonitorSerializer(serializers.ModelSerializer):
+class PlantMonitorSerializer(PhotoDerivativesMixin, serializers.ModelSerializer):
     """Serializer para monitores de plantas"""
     
     species_name = serializers.CharField(source='species.name', read_only=True)
@@ -33,7 +49,7 @@ class PlantMonitorSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class FloweringEventSerializer(serializers.ModelSerializer):
+class FloweringEventSerializer(PhotoDerivativesMixin, serializers.ModelSerializer):
     """Serializer para eventos de floración"""
     
     plant_name = serializers.CharField(source='plant_monitor.name', read_only=True)
@@ -0,0 +1,86 @@
+"""
+Señales de la aplicación Plants
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .flowering_calendar import add_event, rebuild_calendars, remove_event, update_event
+from .models import FloweringEvent, Location, PlantMonitor, PlantSpecies
+from .photos import derivatives_are_current, schedule_derivatives
+from .spatial import location_index
+from .statistics import invalidate_statistics
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_location_index(sender, **kwargs):
+    """Marcar el índice espacial en memoria como obsoleto"""
+    location_index.invalidate()
+
+
+@receiver(post_save, sender=PlantMonitor)
+@receiver(post_save, sender=FloweringEvent)
+def queue_photo_derivatives(sender, instance, **kwargs):
+    """Generar las miniaturas tras el commit, fuera de la petición"""
+    if instance.photo and not derivatives_are_current(instance):
+        transaction.on_commit(lambda: schedule_derivatives(instance))
+
+
+def _species_of(event):
+    return PlantMonitor.objects.filter(pk=event.plant_monitor_id).values_list('species_id', flat=True).first()
+
+
+@receiver(pre_save, sender=FloweringEvent)
+def remember_calendar_contribution(sender, instance, raw=False, **kwargs):
+    """Guardar lo que el evento aportaba al calendario antes de la edición"""
+    instance._calendar_previous = None
+    if instance.pk and not raw:
+        instance._calendar_previous = FloweringEvent.objects.filter(pk=instance.pk).values_list(
+            'plant_monitor__species_id', 'detection_date', 'flowering_stage', 'confidence_score'
+        ).first()
+
+
+@receiver(post_save, sender=FloweringEvent)
+def update_flowering_calendar(sender, instance, created, **kwargs):
+    """Sumar los eventos nuevos al calendario y mover los editados (restar lo anterior, sumar lo nuevo)"""
+    species_id = _species_of(instance)
+    previous = getattr(instance, '_calendar_previous', None)
+    if species_id is None:
+        return
+    if created:
+        add_event(instance, species_id)
+    elif previous is None:
+        # Estado anterior desconocido (carga raw de fixtures): reconstruir la especie
+        rebuild_calendars([species_id])
+    else:
+        update_event(previous, instance, species_id)
+
+
+@receiver(post_delete, sender=FloweringEvent)
+def remove_from_flowering_calendar(sender, instance, **kwargs):
+    species_id = _species_of(instance)
+    if species_id is not None:
+        remove_event(instance, species_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=PlantSpecies)
+@receiver(post_delete, sender=PlantSpecies)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=PlantMonitor)
+@receiver(post_delete, sender=PlantMonitor)
+@receiver(post_save, sender=FloweringEvent)
+@receiver(post_delete, sender=FloweringEvent)
+def invalidate_cached_statistics(sender, **kwargs):
+    """
+    Cualquier escritura en las tablas contadas invalida las estadísticas cacheadas.
+
+    Las aplicaciones dueñas del resto de tablas contadas (modelos de IA,
+    fuentes satelitales) conectan su propio receptor en sus señales.
+    """
+    invalidate_statistics()
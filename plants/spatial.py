@@ -0,0 +1,252 @@
+"""
+FloraWatch - Utilidades espaciales
+Normalización y caché de geometrías de región usadas en consultas PostGIS
+e índice espacial en memoria de ubicaciones monitoreadas
+"""
+
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry, MultiPolygon, Polygon
+from shapely import STRtree, points
+
+
+# Tipos GeoJSON aceptados como región de búsqueda
+REGION_GEOMETRY_TYPES = ('Polygon', 'MultiPolygon')
+
+# Por encima de este número de vértices la región se simplifica antes de consultar
+REGION_MAX_VERTICES = 1000
+
+# Tolerancia de simplificación por defecto en grados (~50 m en el ecuador)
+REGION_SIMPLIFY_TOLERANCE = 0.0005
+
+# Número máximo de regiones preparadas en memoria por proceso
+REGION_CACHE_SIZE = 128
+
+# Metros por grado de latitud (aproximación esférica)
+METERS_PER_DEGREE = 111320.0
+
+# Radio medio terrestre en metros
+EARTH_RADIUS_M = 6371008.8
+
+
+class RegionCache:
+    """Caché LRU de regiones normalizadas, simplificadas y preparadas"""
+
+    def __init__(self, maxsize=REGION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            region = self._items.get(key)
+            if region is not None:
+                self._items.move_to_end(key)
+            return region
+
+    def set(self, key, region):
+        with self._lock:
+            self._items[key] = region
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class Region:
+    """Región de búsqueda lista para filtrar en PostGIS y evaluar en memoria"""
+
+    def __init__(self, geometry, original_vertices, simplified):
+        self.geometry = geometry
+        self.prepared = geometry.prepared
+        self.original_vertices = original_vertices
+        self.simplified = simplified
+
+    @property
+    def vertices(self):
+        return self.geometry.num_coords
+
+    @property
+    def area(self):
+        return self.geometry.area
+
+    def contains(self, point):
+        """Comprobación en memoria con la geometría preparada"""
+        return self.prepared.contains(point)
+
+
+region_cache = RegionCache()
+
+
+def _region_payload(geometry=None, polygon_coordinates=None):
+    """Convierte la entrada de la petición en un dict GeoJSON"""
+
+    if geometry is not None:
+        if isinstance(geometry, str):
+            geometry = json.loads(geometry)
+        if not isinstance(geometry, dict):
+            raise ValueError('La geometría debe ser un objeto GeoJSON')
+        if geometry.get('type') == 'Feature':
+            geometry = geometry.get('geometry') or {}
+        if geometry.get('type') not in REGION_GEOMETRY_TYPES:
+            raise ValueError(
+                f"Tipo de geometría no soportado: {geometry.get('type')}. "
+                f"Use {' o '.join(REGION_GEOMETRY_TYPES)}"
+            )
+        return geometry
+
+    if polygon_coordinates:
+        # Formato heredado: un anillo exterior [[lng, lat], ...]
+        return {'type': 'Polygon', 'coordinates': [polygon_coordinates]}
+
+    raise ValueError('Se requiere geometry (GeoJSON) o polygon_coordinates')
+
+
+def _build_geometry(payload):
+    geometry = GEOSGeometry(json.dumps(payload))
+    if geometry.srid is None:
+        geometry.srid = 4326
+    if not geometry.valid:
+        geometry = geometry.make_valid()
+    if not isinstance(geometry, (Polygon, MultiPolygon)):
+        raise ValueError(f'La región resultante no es un polígono: {geometry.geom_type}')
+    return geometry
+
+
+def get_region(geometry=None, polygon_coordinates=None, simplify_tolerance=None):
+    """
+    Devuelve una Region normalizada y cacheada para la entrada dada.
+
+    Las regiones con más de REGION_MAX_VERTICES vértices se simplifican
+    (preservando topología) con la tolerancia indicada o la de defecto.
+    Repetir la misma región reutiliza la geometría ya parseada, validada,
+    simplificada y preparada.
+    """
+
+    payload = _region_payload(geometry, polygon_coordinates)
+    tolerance = REGION_SIMPLIFY_TOLERANCE if simplify_tolerance is None else float(simplify_tolerance)
+    if tolerance < 0:
+        raise ValueError('simplify_tolerance no puede ser negativo')
+
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    key = hashlib.sha1(f'{tolerance}|{canonical}'.encode('utf-8')).hexdigest()
+
+    region = region_cache.get(key)
+    if region is not None:
+        return region
+
+    try:
+        polygon = _build_geometry(payload)
+    except (GDALException, GEOSException, TypeError, ValueError) as e:
+        raise ValueError(str(e))
+
+    original_vertices = polygon.num_coords
+    simplified = False
+    if tolerance and (simplify_tolerance is not None or original_vertices > REGION_MAX_VERTICES):
+        reduced = polygon.simplify(tolerance, preserve_topology=True)
+        if not reduced.empty:
+            reduced.srid = polygon.srid
+            polygon = reduced
+            simplified = True
+
+    region = Region(polygon, original_vertices, simplified)
+    region_cache.set(key, region)
+    return region
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distancia geodésica aproximada en metros entre dos puntos WGS84"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class LocationSnapIndex:
+    """
+    Índice STRtree en memoria de las ubicaciones activas.
+
+    Permite ajustar coordenadas libres a la Location monitoreada más cercana
+    sin consultar la base de datos. Se reconstruye cuando una señal marca el
+    índice como obsoleto o cuando supera LOCATION_INDEX_MAX_AGE segundos
+    (cambios hechos por otros procesos).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshot = None
+        self._built_at = 0.0
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    def _build(self):
+        from .models import Location
+
+        rows = list(
+            Location.objects.filter(is_active=True).values_list('id', 'name', 'longitude', 'latitude')
+        )
+        ids = [row[0] for row in rows]
+        names = [row[1] for row in rows]
+        coords = [(float(row[2]), float(row[3])) for row in rows]
+        tree = STRtree(points(coords)) if coords else None
+        return tree, ids, names, coords
+
+    def _get_snapshot(self):
+        max_age = settings.LOCATION_INDEX_MAX_AGE
+        if self._stale or time.monotonic() - self._built_at > max_age:
+            with self._lock:
+                if self._stale or time.monotonic() - self._built_at > max_age:
+                    # Marcar antes de construir para no perder invalidaciones concurrentes
+                    self._stale = False
+                    self._snapshot = self._build()
+                    self._built_at = time.monotonic()
+        return self._snapshot
+
+    def snap(self, latitude, longitude, tolerance_m=None):
+        """
+        Devuelve la ubicación más cercana dentro de la tolerancia o None.
+
+        El resultado es un dict con id, name, latitude, longitude y distance_m.
+        """
+
+        if tolerance_m is None:
+            tolerance_m = settings.LOCATION_SNAP_TOLERANCE_M
+
+        tree, ids, names, coords = self._get_snapshot()
+        if tree is None:
+            return None
+
+        # Tolerancia en grados conservadora: el grado de longitud se acorta con la latitud
+        scale = max(math.cos(math.radians(latitude)), 0.01)
+        max_distance = tolerance_m / (METERS_PER_DEGREE * scale)
+
+        indices = tree.query_nearest(points(longitude, latitude), max_distance=max_distance)
+        best = None
+        for index in indices:
+            lon, lat = coords[index]
+            distance = haversine_m(latitude, longitude, lat, lon)
+            if distance <= tolerance_m and (best is None or distance < best['distance_m']):
+                best = {
+                    'id': ids[index],
+                    'name': names[index],
+                    'latitude': lat,
+                    'longitude': lon,
+                    'distance_m': round(distance, 1),
+                }
+        return best
+
+
+location_index = LocationSnapIndex()
@@ -0,0 +1,182 @@
+"""
+Estadísticas agregadas del sistema
+Recuentos y desgloses calculados en pocas consultas agrupadas y servidos desde caché
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Avg, BooleanField, Case, Count, Exists, OuterRef, Q, Value, When
+from django.utils import timezone
+
+from predictions.models import AIModel
+from satellite_data.models import SatelliteDataSource
+from .models import FloweringEvent, Location, PlantMonitor, PlantSpecies
+
+
+SYSTEM_COUNTS_CACHE_KEY = 'statistics:system_counts'
+PLANT_STATISTICS_CACHE_KEY = 'statistics:plants'
+
+# Versión vigente de las claves de caché, guardada en la propia caché
+# compartida: invalidar es incrementarla y leerla no consulta la base de datos
+STATISTICS_VERSION_CACHE_KEY = 'statistics:version'
+
+# Modelos contados en la página de inicio
+COUNTED_MODELS = {
+    'users': User,
+    'plant_species': PlantSpecies,
+    'locations': Location,
+    'flowering_events': FloweringEvent,
+    'ai_models': AIModel,
+    'satellite_sources': SatelliteDataSource,
+}
+
+# Días considerados "recientes" en las estadísticas de eventos
+RECENT_DAYS = 30
+
+
+def _bump_statistics_version():
+    try:
+        cache.incr(STATISTICS_VERSION_CACHE_KEY)
+    except ValueError:
+        # Sin versión (primer uso o clave expulsada): empezar por una que no se haya usado
+        cache.add(STATISTICS_VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+def invalidate_statistics():
+    """
+    Invalidar las estadísticas cacheadas en todos los procesos.
+
+    La versión avanza tras el commit: antes, otro proceso podría recalcular
+    sin ver la escritura y guardar el resultado con la versión nueva.
+    """
+    transaction.on_commit(_bump_statistics_version)
+
+
+def statistics_version():
+    version = cache.get(STATISTICS_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(STATISTICS_VERSION_CACHE_KEY, time.time_ns(), None)
+        version = cache.get(STATISTICS_VERSION_CACHE_KEY)
+    return version
+
+
+def _cached(key, compute):
+    """Resultado cacheado bajo la versión vigente (sin consultas con la caché caliente)"""
+    key = f'{key}:v{statistics_version()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute()
+        cache.set(key, stats, settings.STATISTICS_CACHE_TIMEOUT)
+    return stats
+
+
+def _estimated_counts(models):
+    """Filas estimadas por PostgreSQL (pg_class.reltuples) para cada modelo, en una consulta"""
+    tables = {model._meta.db_table: name for name, model in models.items()}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s) AND relkind = %s',
+            [list(tables), 'r']
+        )
+        return {tables[relname]: max(int(reltuples), 0) for relname, reltuples in cursor.fetchall()}
+
+
+def count_models(models):
+    """
+    Recuento de varias tablas en una sola ida y vuelta.
+
+    Las tablas cuya estimación supera STATISTICS_ESTIMATE_THRESHOLD usan la
+    estimación del planificador; el resto se cuentan exactamente con
+    subconsultas escalares dentro de un único SELECT.
+    """
+
+    estimates = _estimated_counts(models)
+    threshold = settings.STATISTICS_ESTIMATE_THRESHOLD
+    counts = {name: estimate for name, estimate in estimates.items() if estimate >= threshold}
+    exact = [name for name in models if name not in counts]
+
+    if exact:
+        quote = connection.ops.quote_name
+        sql = 'SELECT ' + ', '.join(
+            f'(SELECT COUNT(*) FROM {quote(models[name]._meta.db_table)})' for name in exact
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            counts.update(zip(exact, cursor.fetchone()))
+    return {name: counts[name] for name in models}, sorted(set(models) - set(exact))
+
+
+def _compute_system_counts():
+    counts, estimated = count_models(COUNTED_MODELS)
+    return dict(counts, estimated=estimated)
+
+
+def system_counts():
+    """Recuentos de la página de inicio (cacheados hasta la próxima escritura)"""
+    return _cached(SYSTEM_COUNTS_CACHE_KEY, _compute_system_counts)
+
+
+def _compute_plant_statistics():
+    counts, estimated = count_models({
+        'species': PlantSpecies,
+        'locations': Location,
+        'monitors': PlantMonitor,
+        'flowering_events': FloweringEvent,
+    })
+
+    species_by_type = dict(
+        PlantSpecies.objects.values_list('plant_type').annotate(total=Count('id')).order_by()
+    )
+    monitors = PlantMonitor.objects.aggregate(
+        monitored=Count('id', filter=Q(is_monitored=True)),
+        with_events=Count('id', filter=Q(Exists(FloweringEvent.objects.filter(plant_monitor=OuterRef('pk'))))),
+    )
+
+    # Un solo GROUP BY (etapa, método, reciente) para todos los desgloses de eventos
+    is_recent = Case(
+        When(detection_date__gte=timezone.now() - timedelta(days=RECENT_DAYS), then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+    grouped = FloweringEvent.objects.annotate(is_recent=is_recent).values(
+        'flowering_stage', 'detection_method', 'is_recent'
+    ).annotate(total=Count('id'), confidence=Avg('confidence_score')).order_by()
+
+    by_stage = {}
+    by_method = {}
+    recent = 0
+    weighted_confidence = 0.0
+    for row in grouped:
+        by_stage[row['flowering_stage']] = by_stage.get(row['flowering_stage'], 0) + row['total']
+        by_method[row['detection_method']] = by_method.get(row['detection_method'], 0) + row['total']
+        recent += row['total'] if row['is_recent'] else 0
+        weighted_confidence += (row['confidence'] or 0.0) * row['total']
+    grouped_events = sum(by_stage.values())
+
+    return {
+        'totals': counts,
+        'estimated': estimated,
+        'species_by_type': species_by_type,
+        'monitors': {
+            'total': counts['monitors'],
+            'monitored': monitors['monitored'],
+            'with_events': monitors['with_events'],
+        },
+        'flowering_events': {
+            'by_stage': by_stage,
+            'by_detection_method': by_method,
+            f'last_{RECENT_DAYS}_days': recent,
+            'average_confidence': round(weighted_confidence / grouped_events, 4) if grouped_events else None,
+        },
+        'generated_at': timezone.now(),
+    }
+
+
+def plant_statistics():
+    """Estadísticas de plantas y eventos (cacheadas hasta la próxima escritura)"""
+    return _cached(PLANT_STATISTICS_CACHE_KEY, _compute_plant_statistics)
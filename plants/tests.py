@@ -1,3 +1,454 @@
-from django.test import TestCase
+"""
+Tests de la aplicación Plants
+"""
 
-# Create your tests here.
+import csv
+import io
+import json
+from datetime import date, datetime
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .compaction import compact_events
+from .flowering_calendar import add_event, day_index
+from .flowering_months import ALL_MONTHS_MASK, mask_to_months, months_to_mask, parse_flowering_months
+from .location_import import LocationImportResult, import_locations, natural_key, parse_csv, parse_geojson
+from .importers import ImportResult, import_flowering_events, parse_inaturalist, parse_phenocam
+from .models import FloweringCalendar, FloweringEvent, Location, PhenologyWindow, PlantMonitor, PlantSpecies
+from .phenology import _group_windows, _season_statistics, fit_windows, species_windows, window_position
+from .search import search
+from .spatial import get_region, haversine_m, region_cache
+from .statistics import invalidate_statistics, statistics_version, system_counts
+
+
+def _aware(year, month, day, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+class PlantFixtures:
+    """Especie, ubicación y planta compartidas por los tests con base de datos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tester')
+        cls.species = PlantSpecies.objects.create(
+            name='Almendro', scientific_name='Prunus dulcis', plant_type='tree',
+            typical_flowering_months='Febrero-Marzo'
+        )
+        cls.location = Location.objects.create(
+            name='Parcela', coordinates=Point(-3.7, 40.4, srid=4326), country='España'
+        )
+        cls.monitor = PlantMonitor.objects.create(
+            species=cls.species, location=cls.location, identifier='ALM_001', name='Almendro 1',
+            monitoring_start_date=date(2024, 1, 1), created_by=cls.user
+        )
+
+    @classmethod
+    def event(cls, when, stage='peak', method='visual', confidence=0.8, **extra):
+        return FloweringEvent.objects.create(
+            plant_monitor=cls.monitor, detection_date=when, flowering_stage=stage,
+            detection_method=method, confidence_score=confidence, **extra
+        )
+
+
+SQUARE = {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}
+
+
+class RegionTests(SimpleTestCase):
+
+    def setUp(self):
+        region_cache.clear()
+
+    def test_polygon_is_parsed_and_cached(self):
+        region = get_region(geometry=SQUARE)
+        self.assertEqual(region.geometry.srid, 4326)
+        self.assertAlmostEqual(region.area, 1.0)
+        self.assertIs(get_region(geometry=SQUARE), region)
+
+    def test_legacy_polygon_coordinates(self):
+        region = get_region(polygon_coordinates=SQUARE['coordinates'][0])
+        self.assertAlmostEqual(region.area, 1.0)
+
+    def test_malformed_coordinates_raise_value_error(self):
+        with self.assertRaises(ValueError):
+            get_region(geometry={'type': 'Polygon', 'coordinates': 'abc'})
+        with self.assertRaises(ValueError):
+            get_region(geometry={'type': 'Polygon', 'coordinates': [[[0, 0], [1]]]})
+
+    def test_unsupported_type_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            get_region(geometry={'type': 'Point', 'coordinates': [0, 0]})
+
+    def test_haversine_one_degree_of_latitude(self):
+        self.assertAlmostEqual(haversine_m(0, 0, 1, 0), 111195, delta=50)
+
+
+class GeoQueryTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        region_cache.clear()
+
+    def test_in_region_clamps_limit(self):
+        Location.objects.create(name='Dentro', coordinates=Point(0.5, 0.5, srid=4326), country='España')
+        for limit in (-5, 0):
+            response = self.client.post(
+                '/api/plants/geo/locations/in_region/', {'geometry': SQUARE, 'limit': limit}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['locations']['features']), 1)
+
+    def test_nearest_ranks_by_metres_at_high_latitude(self):
+        # A 70°N, 0.9° de longitud son ~34 km y 0.5° de latitud ~56 km: el orden en grados es el inverso
+        east = Location.objects.create(name='Este', coordinates=Point(0.9, 70, srid=4326), country='Noruega')
+        Location.objects.create(name='Norte', coordinates=Point(0, 70.5, srid=4326), country='Noruega')
+        response = self.client.get(
+            '/api/plants/geo/locations/nearest/', {'latitude': 70, 'longitude': 0, 'k': 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([feature['id'] for feature in response.data['results']], [east.pk])
+
+
+class FloweringCalendarTests(PlantFixtures, TestCase):
+
+    def test_first_incremental_event_builds_the_full_calendar(self):
+        # bulk_create no emite señales: eventos previos sin calendario
+        FloweringEvent.objects.bulk_create([
+            FloweringEvent(
+                plant_monitor=self.monitor, detection_date=_aware(2023, 3, 1), flowering_stage='peak',
+                detection_method='visual', confidence_score=0.5
+            ),
+        ])
+        self.assertFalse(FloweringCalendar.objects.filter(species=self.species).exists())
+
+        event = FloweringEvent(
+            plant_monitor=self.monitor, detection_date=_aware(2024, 3, 2), flowering_stage='peak',
+            detection_method='visual', confidence_score=0.8
+        )
+        FloweringEvent.objects.bulk_create([event])
+        add_event(event, self.species.pk)
+
+        calendar = FloweringCalendar.objects.get(species=self.species)
+        self.assertEqual(calendar.event_count, 2)
+        self.assertAlmostEqual(calendar.total_weight, 1.3)
+        self.assertAlmostEqual(calendar.histogram['peak'][day_index(3, 1)], 0.5)
+        self.assertAlmostEqual(calendar.histogram['peak'][day_index(3, 2)], 0.8)
+
+    def test_existing_calendar_is_updated_incrementally(self):
+        self.event(_aware(2024, 3, 1), confidence=0.5)
+        self.event(_aware(2024, 3, 1), confidence=0.25)
+        calendar = FloweringCalendar.objects.get(species=self.species)
+        self.assertEqual(calendar.event_count, 2)
+        self.assertAlmostEqual(calendar.histogram['peak'][day_index(3, 1)], 0.75)
+
+    def test_edits_and_deletes_move_the_contribution_without_rebuilding(self):
+        kept = self.event(_aware(2024, 3, 1), confidence=0.5)
+        moved = self.event(_aware(2024, 3, 1), confidence=0.25)
+        with mock.patch('plants.flowering_calendar.rebuild_calendars') as rebuild, \
+                mock.patch('plants.signals.rebuild_calendars') as rebuild_in_signal:
+            moved.detection_date = _aware(2024, 4, 10)
+            moved.flowering_stage = 'late'
+            moved.confidence_score = 0.4
+            moved.save()
+            kept.delete()
+        rebuild.assert_not_called()
+        rebuild_in_signal.assert_not_called()
+
+        calendar = FloweringCalendar.objects.get(species=self.species)
+        self.assertEqual(calendar.event_count, 1)
+        self.assertAlmostEqual(calendar.total_weight, 0.4)
+        self.assertAlmostEqual(calendar.histogram['peak'][day_index(3, 1)], 0)
+        self.assertAlmostEqual(calendar.histogram['late'][day_index(4, 10)], 0.4)
+
+
+class StatisticsVersionTests(PlantFixtures, TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_advances_only_after_commit(self):
+        before = statistics_version()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            invalidate_statistics()
+        self.assertEqual(statistics_version(), before)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(statistics_version(), before)
+
+    def test_writes_in_other_apps_invalidate_the_counts(self):
+        from predictions.models import AIModel
+
+        self.assertEqual(system_counts()['ai_models'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            AIModel.objects.create(
+                name='rf', model_type='random_forest', version='1', description='', created_by=self.user
+            )
+        self.assertEqual(system_counts()['ai_models'], 1)
+
+    def test_warm_cache_needs_no_queries(self):
+        system_counts()
+        with self.assertNumQueries(0):
+            system_counts()
+
+
+INATURALIST_CSV = """id,observed_on,time_observed_at,scientific_name,common_name,latitude,longitude,quality_grade,plant_phenology
+1,2024-03-01,2024-03-01 10:00:00 UTC,Prunus dulcis,Almendro,40.4,-3.7,research,Flowering
+2,2024-03-02,,Prunus dulcis,Almendro,40.4,-3.7,needs_id,
+3,2024-03-03,,Prunus dulcis,Almendro,40.4,-3.7,casual,No Evidence of Flowering
+4,2024-03-04,,Prunus dulcis,Almendro,95,-3.7,research,Flower Budding
+5,2024-03-05,,,Almendro,40.4,-3.7,research,Fruiting
+"""
+
+PHENOCAM_CSV = """# comentario de cabecera
+site,roi_id,direction,latitude,longitude,transition_10,transition_50
+harvard,DB_1000,rising,42.5,-72.2,2024-04-20,2024-05-01
+harvard,DB_1000,falling,42.5,-72.2,2024-10-10,
+"""
+
+
+def _reader(text):
+    return csv.DictReader(line for line in io.StringIO(text) if not line.startswith('#'))
+
+
+class ImportParserTests(SimpleTestCase):
+
+    def test_inaturalist_rows_without_flowering_annotation_are_skipped(self):
+        result = ImportResult()
+        records = list(parse_inaturalist(_reader(INATURALIST_CSV), result))
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record['flowering_stage'], 'peak')
+        self.assertEqual(record['confidence_score'], 0.9)
+        self.assertEqual(record['detection_date'].utcoffset().total_seconds(), 0)
+        self.assertEqual((result.rows, result.skipped), (5, 4))
+        self.assertTrue(any('sin anotación' in error for error in result.errors))
+
+    def test_phenocam_transitions_map_to_stages(self):
+        result = ImportResult()
+        records = list(parse_phenocam(_reader(PHENOCAM_CSV), result, 'Quercus rubra'))
+        self.assertEqual([record['flowering_stage'] for record in records], ['early', 'peak', 'end'])
+        self.assertEqual({record['monitor_key'] for record in records}, {'PHENOCAM_harvard_DB_1000'})
+        self.assertEqual(records[0]['scientific_name'], 'Quercus rubra')
+        self.assertEqual(result.skipped, 0)
+
+
+class ImportFloweringEventsTests(PlantFixtures, TestCase):
+
+    def test_reimport_counts_duplicates(self):
+        first = import_flowering_events(io.StringIO(INATURALIST_CSV), 'inaturalist', self.user)
+        self.assertEqual(first.imported, 1)
+        second = import_flowering_events(io.StringIO(INATURALIST_CSV), 'inaturalist', self.user)
+        self.assertEqual((second.imported, second.duplicates), (0, 1))
+        self.assertEqual(FloweringEvent.objects.filter(detection_method='user_report').count(), 1)
+
+
+class FloweringMonthsTests(SimpleTestCase):
+
+    def months(self, text):
+        return mask_to_months(parse_flowering_months(text))
+
+    def test_ranges_with_any_dash(self):
+        for text in ('Marzo-Mayo', 'Marzo–Mayo', 'Marzo — Mayo', 'marzo a mayo', 'March to May'):
+            with self.subTest(text=text):
+                self.assertEqual(self.months(text), [3, 4, 5])
+
+    def test_ranges_across_new_year_lists_and_numbers(self):
+        self.assertEqual(self.months('Nov–Feb'), [1, 2, 11, 12])
+        self.assertEqual(self.months('Marzo, Junio y Agosto'), [3, 6, 8])
+        self.assertEqual(self.months('4-6'), [4, 5, 6])
+        self.assertEqual(self.months('Diciembre'), [12])
+
+    def test_all_year_and_unrecognized_text(self):
+        self.assertEqual(parse_flowering_months('Todo el año'), ALL_MONTHS_MASK)
+        self.assertEqual(parse_flowering_months('variable'), 0)
+        self.assertEqual(parse_flowering_months(None), 0)
+
+    def test_mask_round_trip(self):
+        self.assertEqual(mask_to_months(months_to_mask([1, 7, 12])), [1, 7, 12])
+
+
+LOCATIONS_CSV = """site_code,name,lat,lon,country,region
+ES-001,Parcela norte,40.4,-3.7,España,Madrid
+,Parcela sur,40.3,-3.7,España,
+ES-003,{long_name},40.2,-3.7,España,
+ES-004,Parcela este,40.1,-3.7,{long_country},
+{long_code},Parcela oeste,40.0,-3.7,España,
+ES-006,Parcela fuera,95,-3.7,España,
+"""
+
+
+class LocationImportParserTests(SimpleTestCase):
+
+    def test_rows_over_field_lengths_are_skipped(self):
+        text = LOCATIONS_CSV.format(long_name='x' * 201, long_country='y' * 101, long_code='Z' * 101)
+        result = LocationImportResult()
+        rows = list(parse_csv(io.StringIO(text), result))
+        self.assertEqual([row['site_code'] for row in rows], ['ES-001', 'espana:parcela-sur'])
+        self.assertEqual((result.rows, result.skipped), (6, 4))
+        self.assertTrue(any('name supera 200' in error for error in result.errors))
+        self.assertTrue(any('country supera 100' in error for error in result.errors))
+        self.assertTrue(any('site_code supera 100' in error for error in result.errors))
+
+    def test_long_derived_keys_stay_unique_and_fit(self):
+        first = natural_key(None, 'España', 'a' * 150 + ' uno')
+        second = natural_key(None, 'España', 'a' * 150 + ' dos')
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(first), 100)
+        self.assertEqual(natural_key(' ES-1 ', 'España', 'x'), 'ES-1')
+
+    def test_geojson_points_with_feature_id(self):
+        collection = {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'id': 'S1', 'geometry': {'type': 'Point', 'coordinates': [-3.7, 40.4, 650]},
+             'properties': {'name': 'Sitio', 'country': 'España'}},
+            {'type': 'Feature', 'geometry': SQUARE, 'properties': {'name': 'Área', 'country': 'España'}},
+        ]}
+        result = LocationImportResult()
+        rows = list(parse_geojson(io.StringIO(json.dumps(collection)), result))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['site_code'], rows[0]['altitude'], rows[0]['latitude']), ('S1', 650, 40.4))
+        self.assertEqual(result.skipped, 1)
+
+
+class ImportLocationsTests(TestCase):
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        text = "site_code,name,lat,lon,country\nES-001,Parcela,40.4,-3.7,España\n,Sin código,40.3,-3.7,España\n"
+        first = import_locations(io.StringIO(text), 'csv')
+        self.assertEqual((first.created, first.updated), (2, 0))
+        second = import_locations(io.StringIO(text.replace('40.4', '40.5')), 'csv')
+        self.assertEqual((second.created, second.updated), (0, 2))
+        location = Location.objects.get(site_code='ES-001')
+        self.assertAlmostEqual(location.coordinates.y, 40.5)
+        self.assertEqual(float(location.latitude), 40.5)
+        self.assertEqual(Location.objects.count(), 2)
+
+
+class CompactionTests(PlantFixtures, TestCase):
+
+    def setUp(self):
+        self.low = self.event(_aware(2024, 3, 1, hour=9), method='satellite', confidence=0.6, intensity=40)
+        self.high = self.event(_aware(2024, 3, 1, hour=15), method='satellite', confidence=0.9, intensity=80)
+        self.report = self.event(
+            _aware(2024, 3, 1, hour=11), method='user_report', confidence=0.5,
+            notes='Primeras flores abiertas', reported_by=self.user
+        )
+        self.with_photo = self.event(
+            _aware(2024, 3, 1, hour=12), method='visual', confidence=0.4, photo='flowering/photos/a.jpg'
+        )
+        self.other_day = self.event(_aware(2024, 3, 2), method='satellite', confidence=0.7)
+
+    def test_read_matches_what_compaction_keeps(self):
+        expected = {self.high.pk, self.report.pk, self.with_photo.pk, self.other_day.pk}
+        self.assertEqual(set(FloweringEvent.objects.compacted().values_list('id', flat=True)), expected)
+
+        result = compact_events()
+        self.assertEqual((result['groups'], result['removed']), (1, 1))
+        self.assertEqual(set(FloweringEvent.objects.values_list('id', flat=True)), expected)
+        self.assertEqual(set(FloweringEvent.objects.compacted().values_list('id', flat=True)), expected)
+
+    def test_canonical_row_summarizes_the_group(self):
+        compact_events()
+        canonical = FloweringEvent.objects.get(pk=self.high.pk)
+        self.assertEqual(canonical.source_count, 2)
+        self.assertAlmostEqual(canonical.intensity, 60)
+        self.assertAlmostEqual(canonical.confidence_score, 0.9)
+
+    def test_user_reports_and_photos_are_untouched(self):
+        compact_events()
+        report = FloweringEvent.objects.get(pk=self.report.pk)
+        self.assertEqual((report.notes, report.reported_by_id, report.source_count), (
+            'Primeras flores abiertas', self.user.pk, 1
+        ))
+        self.assertEqual(FloweringEvent.objects.get(pk=self.with_photo.pk).photo.name, 'flowering/photos/a.jpg')
+        # Segunda pasada: nada más que fusionar
+        self.assertEqual(compact_events()['removed'], 0)
+
+
+class PhenologyFitTests(SimpleTestCase):
+
+    def setUp(self):
+        # Tres temporadas: (planta 1, 2024), (planta 2, 2023) y (planta 2, 2024)
+        self.events = {
+            'species': np.array([7, 7, 7, 7, 7, 7, 7]),
+            'monitor': np.array([1, 1, 1, 2, 2, 2, 2]),
+            'latitude': np.array([40.4, 40.4, 40.4, 52.0, 52.0, 52.0, 52.0]),
+            'year': np.array([2024, 2024, 2024, 2024, 2024, 2023, 2023]),
+            'doy': np.array([60, 70, 80, 100, 110, 40, 60]),
+            'is_peak': np.array([False, True, True, False, False, False, False]),
+            'weight': np.array([1.0, 1.0, 3.0, 1.0, 3.0, 0.0, 0.0]),
+        }
+
+    def test_season_statistics(self):
+        seasons = _season_statistics(self.events)
+        np.testing.assert_array_equal(seasons['onset'], [60, 40, 100])
+        np.testing.assert_array_equal(seasons['end'], [80, 60, 110])
+        np.testing.assert_array_equal(seasons['events'], [3, 2, 2])
+        # Media ponderada de los días 'peak'; sin 'peak', de todos; con peso nulo, punto medio
+        np.testing.assert_allclose(seasons['peak'], [77.5, 50, 107.5])
+        np.testing.assert_array_equal(seasons['latitude'], [40.4, 52.0, 52.0])
+
+    def test_group_windows(self):
+        seasons = _season_statistics(self.events)
+        group = np.column_stack([seasons['species'], np.full(3, -90), np.full(3, 90)])
+        now = timezone.now()
+
+        window, = _group_windows(seasons, group, now, min_seasons=3)
+        self.assertEqual((window.species_id, window.latitude_min, window.latitude_max), (7, -90, 90))
+        self.assertEqual((window.seasons, window.event_count, window.fitted_at), (3, 7, now))
+        self.assertAlmostEqual(window.onset_day, round(np.mean([60, 40, 100]), 2))
+        self.assertAlmostEqual(window.peak_day, round(np.mean([77.5, 50, 107.5]), 2))
+        self.assertAlmostEqual(window.duration_days, round(np.mean([21, 21, 11]), 2))
+        self.assertAlmostEqual(window.onset_std, round(np.std([60, 40, 100]), 2))
+        self.assertEqual(_group_windows(seasons, group, now, min_seasons=4), [])
+
+    def test_window_position_wraps_around_the_year(self):
+        window = {'onset_day': 1, 'peak_day': 5, 'end_day': 20}
+        self.assertEqual(window_position(window, date(2024, 12, 30)), {'days_to_peak': 6.0, 'in_window': False})
+        self.assertEqual(window_position(window, date(2024, 1, 10)), {'days_to_peak': -5.0, 'in_window': True})
+
+
+class PhenologyCacheTests(PlantFixtures, TestCase):
+
+    def test_fit_replaces_windows_cached_before_it(self):
+        self.assertEqual(species_windows(self.species.pk), [])
+        for year in (2021, 2022, 2023):
+            self.event(_aware(year, 2, 20))
+
+        self.assertEqual(fit_windows([self.species.pk]), {'species': 1, 'windows': 2})
+        windows = species_windows(self.species.pk)
+        self.assertEqual([(w['latitude_min'], w['latitude_max']) for w in windows], [(40, 50), (-90, 90)])
+        self.assertEqual(windows[0]['seasons'], 3)
+
+    def test_fit_in_another_process_invalidates_the_cache(self):
+        fit_windows([self.species.pk])
+        self.assertEqual(species_windows(self.species.pk), [])
+
+        # Ajuste hecho fuera de este proceso: solo cambian las filas, no la caché local
+        fitted_at = timezone.now()
+        PhenologyWindow.objects.create(
+            species=self.species, latitude_min=-90, latitude_max=90, onset_day=40, peak_day=50,
+            end_day=60, duration_days=21, seasons=3, fitted_at=fitted_at
+        )
+        PlantSpecies.objects.filter(pk=self.species.pk).update(phenology_fitted_at=fitted_at)
+
+        window, = species_windows(self.species.pk)
+        self.assertEqual(window['peak_day'], 50)
+
+
+class SearchTests(PlantFixtures, TestCase):
+
+    def test_prefix_match_comes_from_the_prefix_itself(self):
+        # word_similarity 1.0 sin ser prefijo: antes se marcaba como prefijo
+        inside = Location.objects.create(
+            name='El Almendro', coordinates=Point(-3.6, 40.4, srid=4326), country='España'
+        )
+        results = {(result['type'], result['id']): result for result in search('almendro')}
+        self.assertTrue(results[('species', self.species.pk)]['prefix_match'])
+        self.assertFalse(results[('location', inside.pk)]['prefix_match'])
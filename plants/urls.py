@@ -3,7 +3,7 @@ URLs para la aplicación Plants
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, gis_views
 
 router = DefaultRouter()
 router.register(r'species', views.PlantSpeciesViewSet, basename='species')
@@ -11,6 +11,11 @@ router.register(r'locations', views.LocationViewSet, basename='locations')
 router.register(r'monitors', views.PlantMonitorViewSet, basename='monitors')
 router.register(r'flowering-events', views.FloweringEventViewSet, basename='flowering-events')
 
+# Endpoints geoespaciales (PostGIS)
+router.register(r'geo/locations', gis_views.LocationGeoViewSet, basename='geo-locations')
+router.register(r'geo/monitors', gis_views.PlantMonitorGeoViewSet, basename='geo-monitors')
+router.register(r'geo/analysis', gis_views.SpatialAnalysisViewSet, basename='geo-analysis')
+
 urlpatterns = [
     path('', include(router.urls)),
     
@@ -24,4 +29,7 @@ urlpatterns = [
     path('statistics/', 
          views.PlantStatisticsView.as_view(), 
          name='plant-statistics'),
+    path('search/', 
+         views.SearchView.as_view(), 
+         name='plant-search'),
 ]
\ No newline at end of file
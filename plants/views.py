@@ -4,26 +4,92 @@ Views para la aplicación Plants
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db.models import Exists, F, OuterRef
 from django.shortcuts import get_object_or_404
-from .models import PlantSpecies, Location, PlantMonitor, FloweringEvent
+from .flowering_calendar import rebuild_calendars, summarize
+from .flowering_months import months_to_mask
+from .importers import IMPORT_FORMATS, import_flowering_events
+from .location_import import LOCATION_FORMATS, import_locations
+from .phenology import species_windows
+from .search import RESULT_TYPES, SEARCH_DEFAULT_LIMIT, search
+from .models import PlantSpecies, Location, PlantMonitor, FloweringEvent, FloweringCalendar
+from .statistics import plant_statistics
 from .serializers import (
     PlantSpeciesSerializer, LocationSerializer, 
     PlantMonitorSerializer, FloweringEventSerializer
 )
 
 
+# Etapas que cuentan como "en floración"
+FLOWERING_NOW_STAGES = ('early', 'peak', 'late')
+
+
 class PlantSpeciesViewSet(viewsets.ModelViewSet):
-    """ViewSet para especies de plantas"""
+    """
+    ViewSet para especies de plantas
+    
+    Filtros: ?flowering_in=3 (o 3,4) especies que florecen en alguno de
+    esos meses; ?region=X especies con plantas monitoreadas en esa región.
+    """
     queryset = PlantSpecies.objects.all()
     serializer_class = PlantSpeciesSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        
+        flowering_in = params.get('flowering_in')
+        if flowering_in:
+            try:
+                months = [int(month) for month in flowering_in.split(',')]
+            except ValueError:
+                raise ValidationError({'flowering_in': 'Meses separados por comas (1-12)'})
+            if not all(1 <= month <= 12 for month in months):
+                raise ValidationError({'flowering_in': 'Los meses deben estar entre 1 y 12'})
+            # Test de bits en SQL: mask & bits <> 0
+            queryset = queryset.alias(
+                flowering_bits=F('flowering_month_mask').bitand(months_to_mask(months))
+            ).filter(flowering_bits__gt=0)
+        
+        region = params.get('region')
+        if region:
+            queryset = queryset.filter(Exists(PlantMonitor.objects.filter(
+                species=OuterRef('pk'), location__region__iexact=region
+            )))
+        return queryset
 
 
 class LocationViewSet(viewsets.ModelViewSet):
     """ViewSet para ubicaciones"""
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """
+        Carga masiva de ubicaciones (multipart: file, format=csv|geojson, country?)
+        
+        Crea o actualiza por site_code; las coordenadas se calculan en SQL.
+        """
+        upload = request.FILES.get('file')
+        source_format = request.data.get('format')
+        if upload is None or source_format not in LOCATION_FORMATS:
+            return Response({
+                'error': f"Se requieren file y format ({' | '.join(LOCATION_FORMATS)})"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = import_locations(upload.file, source_format, default_country=request.data.get('country'))
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
 
 
 class PlantMonitorViewSet(viewsets.ModelViewSet):
@@ -33,27 +99,166 @@ class PlantMonitorViewSet(viewsets.ModelViewSet):
 
 
 class FloweringEventViewSet(viewsets.ModelViewSet):
-    """ViewSet para eventos de floración"""
+    """
+    ViewSet para eventos de floración
+    
+    ?compacted=true devuelve la fila que conserva la compactación por
+    planta, día y etapa (los reportes de usuario y los eventos con foto se
+    devuelven siempre), también en días aún no compactados; sus valores
+    son los de esa fila, no un agregado del grupo.
+    """
     queryset = FloweringEvent.objects.all()
     serializer_class = FloweringEventSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list' and self.request.query_params.get('compacted', '').lower() in ('1', 'true'):
+            queryset = queryset.compacted()
+        return queryset
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """
+        Importar un CSV de iNaturalist o PhenoCam (multipart: file, format, species?)
+        
+        El archivo se lee en streaming desde el almacenamiento temporal de la subida.
+        """
+        upload = request.FILES.get('file')
+        source = request.data.get('format')
+        if upload is None or source not in IMPORT_FORMATS:
+            return Response({
+                'error': f"Se requieren file y format ({' | '.join(IMPORT_FORMATS)})"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        user = request.user if request.user.is_authenticated else None
+        if user is None:
+            return Response({
+                'error': 'Se requiere un usuario autenticado para importar'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        
+        try:
+            result = import_flowering_events(
+                upload.file, source, user, species_name=request.data.get('species')
+            )
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
 
 
 class FloweringCalendarView(APIView):
-    """Vista para calendario de floración por especie"""
+    """
+    Vista para calendario de floración por especie
+
+    Lee el calendario precalculado (una fila); solo se construye aquí la
+    primera vez que se consulta una especie.
+    """
     
     def get(self, request, species_id):
-        return Response({"message": "Calendario de floración - En desarrollo"})
+        calendar = FloweringCalendar.objects.select_related('species').filter(species_id=species_id).first()
+        if calendar is None:
+            if not PlantSpecies.objects.filter(pk=species_id).exists():
+                return Response({
+                    'error': 'Especie no encontrada'
+                }, status=status.HTTP_404_NOT_FOUND)
+            rebuild_calendars([species_id])
+            calendar = FloweringCalendar.objects.select_related('species').get(species_id=species_id)
+        
+        return Response(dict(
+            summarize(calendar),
+            species_name=calendar.species.name,
+            typical_flowering_months=calendar.species.typical_flowering_months,
+            phenology_windows=species_windows(species_id),
+        ))
 
 
 class CurrentFloweringView(APIView):
-    """Vista para floración actual por ubicación"""
+    """
+    Vista para floración actual por ubicación
+
+    Último evento de cada planta monitoreada de la ubicación con una única
+    consulta DISTINCT ON (plant_monitor) apoyada en el índice
+    (plant_monitor, -detection_date).
+    """
     
     def get(self, request, location_id):
-        return Response({"message": "Floración actual - En desarrollo"})
+        location = Location.objects.filter(pk=location_id).values('id', 'name').first()
+        if location is None:
+            return Response({
+                'error': 'Ubicación no encontrada'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        monitors = list(
+            PlantMonitor.objects.filter(location_id=location_id, is_monitored=True).values(
+                'id', 'name', 'identifier', 'species_id', species_name=F('species__name')
+            ).order_by('name')
+        )
+        latest = {
+            event['plant_monitor_id']: event
+            for event in FloweringEvent.objects.filter(
+                plant_monitor__location_id=location_id,
+                plant_monitor__is_monitored=True
+            ).order_by('plant_monitor_id', '-detection_date').distinct('plant_monitor_id').values(
+                'plant_monitor_id', 'detection_date', 'flowering_stage',
+                'detection_method', 'confidence_score', 'intensity'
+            )
+        }
+        
+        stages = {}
+        for monitor in monitors:
+            event = latest.get(monitor['id'])
+            if event is not None:
+                event = {key: value for key, value in event.items() if key != 'plant_monitor_id'}
+                stages[event['flowering_stage']] = stages.get(event['flowering_stage'], 0) + 1
+            monitor['current_event'] = event
+            monitor['is_flowering'] = bool(event) and event['flowering_stage'] in FLOWERING_NOW_STAGES
+        
+        return Response({
+            'location': location,
+            'total_monitors': len(monitors),
+            'flowering_now': sum(1 for monitor in monitors if monitor['is_flowering']),
+            'stages': stages,
+            'monitors': monitors,
+        })
 
 
 class PlantStatisticsView(APIView):
-    """Vista para estadísticas de plantas"""
+    """Vista para estadísticas de plantas (cacheadas; sin consultas con la caché caliente)"""
+    
+    def get(self, request):
+        return Response(plant_statistics())
+
+
+class SearchView(APIView):
+    """
+    Búsqueda y autocompletado de especies, ubicaciones y plantas
+    
+    GET ?q=texto&limit=10&types=species,location,monitor
+    Las coincidencias por prefijo van primero; el resto se ordena por
+    similitud de trigramas, lo que tolera erratas.
+    """
     
     def get(self, request):
-        return Response({"message": "Estadísticas de plantas - En desarrollo"})
+        types = request.query_params.get('types')
+        if types:
+            types = set(types.split(','))
+            unknown = types - set(RESULT_TYPES.values())
+            if unknown:
+                return Response({
+                    'error': f'Tipos no válidos: {sorted(unknown)}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = int(request.query_params.get('limit', SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            return Response({
+                'error': 'limit debe ser un entero'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        query = request.query_params.get('q', '')
+        return Response({
+            'query': query,
+            'results': search(query, limit=limit, types=types),
+        })
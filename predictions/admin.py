@@ -4,7 +4,7 @@ Configuración del admin para la aplicación Predictions
 from django.contrib import admin
 from .models import (
     AIModel, PredictionSession, FloweringPrediction, 
-    ModelPerformanceMetric, TrainingDataset
+    ModelPerformanceMetric, TrainingDataset, FeatureVector, ValidationRun, AnomalyBaseline
 )
 
 
@@ -20,13 +20,16 @@ class AIModelAdmin(admin.ModelAdmin):
 
 @admin.register(PredictionSession)
 class PredictionSessionAdmin(admin.ModelAdmin):
-    list_display = ['session_type', 'model', 'start_date', 'end_date', 'status', 'total_predictions', 'executed_by']
+    list_display = ['session_type', 'model', 'start_date', 'end_date', 'status', 'total_predictions', 'average_confidence', 'executed_by']
+    list_select_related = ['model', 'executed_by']
     list_filter = ['session_type', 'status', 'model', 'created_at']
     search_fields = ['model__name']
     ordering = ['-created_at']
     raw_id_fields = ['model', 'executed_by']
     filter_horizontal = ['locations', 'plant_monitors']
     date_hierarchy = 'created_at'
+    readonly_fields = ['total_predictions', 'successful_predictions', 'average_confidence',
+                       'confidence_sum', 'confidence_sum_squares']
 
 
 @admin.register(FloweringPrediction)
@@ -57,3 +60,30 @@ class TrainingDatasetAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     raw_id_fields = ['created_by']
     readonly_fields = ['created_at', 'updated_at']
+
+
+
+@admin.register(FeatureVector)
+class FeatureVectorAdmin(admin.ModelAdmin):
+    list_display = ['location', 'date', 'schema_version', 'ndvi_mean', 'growing_degree_days', 'stale', 'computed_at']
+    list_filter = ['schema_version', 'stale', 'date']
+    search_fields = ['location__name']
+    ordering = ['location', 'date']
+    raw_id_fields = ['location']
+    readonly_fields = ['computed_at']
+    date_hierarchy = 'date'
+
+
+@admin.register(ValidationRun)
+class ValidationRunAdmin(admin.ModelAdmin):
+    list_display = ['run_at', 'watermark', 'since_date', 'until_date', 'radius_m', 'window_days', 'validated_count', 'positive_count']
+    ordering = ['-run_at']
+    readonly_fields = ['run_at', 'watermark']
+
+
+@admin.register(AnomalyBaseline)
+class AnomalyBaselineAdmin(admin.ModelAdmin):
+    list_display = ['location', 'data_type', 'period', 'count', 'mean', 'updated_at']
+    list_filter = ['data_type']
+    search_fields = ['location__name']
+    raw_id_fields = ['location']
@@ -0,0 +1,82 @@
+"""
+Agregados incrementales de sesiones de predicción
+Mantiene recuento, suma y suma de cuadrados de la confianza sin recorrer las predicciones
+"""
+
+import numpy as np
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import FloweringPrediction, PredictionSession
+
+
+def add_to_session(session_id, confidences, successful):
+    """
+    Sumar un bloque de predicciones recién insertadas a los agregados de la sesión.
+
+    Una única sentencia UPDATE con expresiones F(): es atómica frente a
+    escrituras concurrentes y la media se recalcula con los valores nuevos.
+    """
+
+    confidences = np.asarray(confidences, dtype=float)
+    count = len(confidences)
+    if not count:
+        return 0
+    total = float(confidences.sum())
+    squares = float(np.square(confidences).sum())
+    return PredictionSession.objects.filter(pk=session_id).update(
+        total_predictions=F('total_predictions') + count,
+        successful_predictions=F('successful_predictions') + int(successful),
+        confidence_sum=F('confidence_sum') + total,
+        confidence_sum_squares=F('confidence_sum_squares') + squares,
+        average_confidence=(F('confidence_sum') + total) / (F('total_predictions') + count),
+        updated_at=timezone.now()
+    )
+
+
+# Predicción exitosa: calculada con todas las características (ningún valor nulo)
+REPAIR_SQL = """
+    UPDATE {session} AS s
+    SET total_predictions = COALESCE(a.total, 0),
+        successful_predictions = COALESCE(a.successful, 0),
+        confidence_sum = COALESCE(a.confidence_sum, 0),
+        confidence_sum_squares = COALESCE(a.confidence_sum_squares, 0),
+        average_confidence = a.confidence_sum / NULLIF(a.total, 0)
+    FROM {session} AS target
+    LEFT JOIN (
+        SELECT session_id,
+               count(*) AS total,
+               count(*) FILTER (
+                   WHERE NOT jsonb_path_exists(input_features, '$.* ? (@ == null)')
+               ) AS successful,
+               sum(confidence_score) AS confidence_sum,
+               sum(confidence_score * confidence_score) AS confidence_sum_squares
+        FROM {prediction}
+        {prediction_filter}
+        GROUP BY session_id
+    ) AS a ON a.session_id = target.id
+    WHERE s.id = target.id {session_filter}
+"""
+
+
+def repair_session_aggregates(session_ids=None):
+    """Recalcular los agregados desde las predicciones en una pasada agrupada"""
+
+    prediction_filter = session_filter = ''
+    params = []
+    if session_ids is not None:
+        session_ids = list(session_ids)
+        prediction_filter = 'WHERE session_id = ANY(%s)'
+        session_filter = 'AND target.id = ANY(%s)'
+        params = [session_ids, session_ids]
+
+    sql = REPAIR_SQL.format(
+        session=PredictionSession._meta.db_table,
+        prediction=FloweringPrediction._meta.db_table,
+        prediction_filter=prediction_filter,
+        session_filter=session_filter,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
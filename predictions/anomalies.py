@@ -0,0 +1,232 @@
+"""
+Detección de anomalías en datos satelitales
+Puntúa cada lote de puntos contra líneas base estacionales por ubicación y las actualiza en el mismo paso
+"""
+
+from math import erf, sqrt
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from satellite_data.models import SatelliteDataPoint
+from .aggregates import add_to_session
+from .features import EXCLUDED_QUALITY_FLAGS
+from .inference import BULK_BATCH_SIZE
+from .models import AIModel, AnomalyBaseline, FloweringPrediction, PredictionSession
+
+
+# Índices con línea base estacional
+ANOMALY_DATA_TYPES = ('ndvi', 'evi', 'lst')
+
+# Periodos de 16 días (composición MODIS); el día 353+ cae en el último
+PERIOD_DAYS = 16
+N_PERIODS = 23
+
+
+# Fusión de estadísticos (Chan et al.) atómica en la propia sentencia de inserción
+MERGE_BASELINES_SQL = """
+    INSERT INTO {table} AS b (location_id, data_type, period, count, mean, m2, updated_at)
+    SELECT * FROM unnest(%s::bigint[], %s::varchar[], %s::smallint[], %s::integer[],
+                         %s::float8[], %s::float8[], %s::timestamptz[])
+    ON CONFLICT (location_id, data_type, period) DO UPDATE SET
+        mean = b.mean + (EXCLUDED.mean - b.mean) * EXCLUDED.count / (b.count + EXCLUDED.count),
+        m2 = b.m2 + EXCLUDED.m2
+             + (EXCLUDED.mean - b.mean) ^ 2 * b.count * EXCLUDED.count / (b.count + EXCLUDED.count),
+        count = b.count + EXCLUDED.count,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def period_of(day):
+    return min((day.timetuple().tm_yday - 1) // PERIOD_DAYS, N_PERIODS - 1)
+
+
+def get_anomaly_model():
+    """Modelo de anomalías activo más reciente (registra la autoría de las sesiones)"""
+    ai_model = AIModel.objects.filter(
+        model_type='isolation_forest', status='active'
+    ).order_by('-updated_at').first()
+    if ai_model is None:
+        raise ValueError('No hay ningún modelo de anomalías (isolation_forest) activo')
+    return ai_model
+
+
+def _batch_statistics(group_index, n_groups, values, include):
+    """Recuento, media y M2 por grupo de los valores incluidos (vectorizado)"""
+    weights = include.astype(float)
+    count = np.bincount(group_index, weights=weights, minlength=n_groups)
+    total = np.bincount(group_index, weights=values * weights, minlength=n_groups)
+    mean = np.divide(total, count, out=np.zeros(n_groups), where=count > 0)
+    m2 = np.bincount(group_index, weights=weights * (values - mean[group_index]) ** 2, minlength=n_groups)
+    return count.astype(int), mean, m2
+
+
+def _merge_baselines(keys, count, mean, m2):
+    """Sumar los estadísticos del lote a las líneas base (upsert con fusión en SQL)"""
+    keep = count > 0
+    if not keep.any():
+        return
+    selected = [key for key, flag in zip(keys, keep) if flag]
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(MERGE_BASELINES_SQL.format(table=AnomalyBaseline._meta.db_table), [
+            [key[0] for key in selected],
+            [key[1] for key in selected],
+            [int(key[2]) for key in selected],
+            count[keep].tolist(),
+            mean[keep].tolist(),
+            m2[keep].tolist(),
+            [now] * len(selected),
+        ])
+
+
+def _record_anomalies(ai_model, executed_by, anomaly_rows, keys_of_rows, days, values,
+                      z, std, confidences, group_index, base_count, base_mean):
+    """Una sesión 'anomaly_detection' con una FloweringPrediction por punto anómalo"""
+
+    session = PredictionSession.objects.create(
+        model=ai_model,
+        session_type='anomaly_detection',
+        start_date=min(days[index] for index in anomaly_rows),
+        end_date=max(days[index] for index in anomaly_rows),
+        executed_by=executed_by or ai_model.created_by,
+        status='running'
+    )
+    session.locations.set({keys_of_rows[index][0] for index in anomaly_rows})
+
+    today = timezone.localdate()
+    predictions = []
+    for index in anomaly_rows:
+        location_id, data_type, period = keys_of_rows[index]
+        group = group_index[index]
+        predictions.append(FloweringPrediction(
+            session=session,
+            location_id=location_id,
+            prediction_type='anomaly',
+            prediction_date=today,
+            target_date=days[index],
+            # Puntuación de anomalía en [0, 1]: masa normal dentro de ±|z|
+            flowering_probability=erf(abs(z[index]) / sqrt(2)),
+            confidence_score=float(confidences[index]),
+            notes=f'{data_type} z={z[index]:.2f}',
+            input_features={
+                'data_type': data_type,
+                'value': float(values[index]),
+                'period': int(period),
+                'baseline_count': int(base_count[group]),
+                'baseline_mean': round(float(base_mean[group]), 6),
+                'baseline_std': round(float(std[index]), 6),
+                'z_score': round(float(z[index]), 4),
+            },
+        ))
+    FloweringPrediction.objects.bulk_create(predictions, batch_size=BULK_BATCH_SIZE)
+    add_to_session(session.pk, confidences[anomaly_rows], len(anomaly_rows))
+    PredictionSession.objects.filter(pk=session.pk).update(
+        status='completed',
+        completed_at=timezone.now()
+    )
+    return session
+
+
+def score_points(point_ids, ai_model=None, executed_by=None):
+    """
+    Puntuar un lote de SatelliteDataPoint aún no puntuados.
+
+    1. Bloquea los puntos con anomaly_scored_at vacío (los ya puntuados o
+       bloqueados por otro proceso se omiten: reenviar un lote no los
+       vuelve a sumar a las líneas base). Los de calidad excluida se
+       marcan como puntuados sin entrar en las líneas base.
+    2. Calcula z = (valor - media) / desviación para todo el lote a la vez.
+    3. Añade los puntos no anómalos a las líneas base (las anomalías no
+       desplazan la referencia) y los marca como puntuados.
+    4. En un punto de guardado aparte inserta una FloweringPrediction de
+       tipo 'anomaly' por punto anómalo y los marca. Si no hay modelo de
+       anomalías activo, las líneas base se guardan igualmente y los puntos
+       anómalos quedan pendientes para la siguiente ejecución.
+    """
+
+    point_ids = list(point_ids)
+    with transaction.atomic():
+        # Los puntos de mala calidad no se puntúan: marcarlos para que no queden pendientes
+        SatelliteDataPoint.objects.filter(
+            pk__in=point_ids,
+            anomaly_scored_at__isnull=True,
+            quality_flag__in=EXCLUDED_QUALITY_FLAGS
+        ).update(anomaly_scored_at=timezone.now())
+        rows = list(
+            SatelliteDataPoint.objects.filter(
+                pk__in=point_ids,
+                anomaly_scored_at__isnull=True,
+                collection__data_type__in=ANOMALY_DATA_TYPES
+            ).exclude(
+                quality_flag__in=EXCLUDED_QUALITY_FLAGS
+            ).select_for_update(skip_locked=True, of=('self',)).order_by('id').values_list(
+                'id', 'collection__location_id', 'collection__data_type', 'timestamp', 'value'
+            )
+        )
+        if not rows:
+            return None
+
+        point_pks = np.array([row[0] for row in rows])
+        days = [timezone.localtime(row[3]).date() for row in rows]
+        keys_of_rows = [(row[1], row[2], period_of(day)) for row, day in zip(rows, days)]
+        keys = sorted(set(keys_of_rows))
+        group_of = {key: index for index, key in enumerate(keys)}
+        group_index = np.array([group_of[key] for key in keys_of_rows])
+        values = np.array([row[4] for row in rows], dtype=float)
+
+        # Líneas base actuales de los grupos presentes en el lote
+        n_groups = len(keys)
+        base_count = np.zeros(n_groups)
+        base_mean = np.zeros(n_groups)
+        base_m2 = np.zeros(n_groups)
+        baselines = AnomalyBaseline.objects.filter(
+            location_id__in={key[0] for key in keys},
+            data_type__in={key[1] for key in keys},
+            period__in={key[2] for key in keys}
+        ).values_list('location_id', 'data_type', 'period', 'count', 'mean', 'm2')
+        for location_id, data_type, period, count, mean, m2 in baselines:
+            index = group_of.get((location_id, data_type, period))
+            if index is not None:
+                base_count[index], base_mean[index], base_m2[index] = count, mean, m2
+
+        count = base_count[group_index]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(base_m2[group_index] / (count - 1))
+            z = (values - base_mean[group_index]) / std
+        scored = (count >= settings.ANOMALY_MIN_BASELINE) & (std > 0)
+        z = np.where(scored, z, np.nan)
+        anomalous = scored & (np.abs(np.nan_to_num(z)) >= settings.ANOMALY_Z_THRESHOLD)
+
+        confidences = count / (count + settings.ANOMALY_MIN_BASELINE)
+
+        now = timezone.now()
+        _merge_baselines(keys, *_batch_statistics(group_index, n_groups, values, ~anomalous))
+        SatelliteDataPoint.objects.filter(pk__in=point_pks[~anomalous].tolist()).update(anomaly_scored_at=now)
+
+        session = None
+        error = None
+        if anomalous.any():
+            try:
+                with transaction.atomic():
+                    session = _record_anomalies(
+                        ai_model or get_anomaly_model(), executed_by, np.flatnonzero(anomalous),
+                        keys_of_rows, days, values, z, std, confidences, group_index, base_count, base_mean
+                    )
+                    SatelliteDataPoint.objects.filter(
+                        pk__in=point_pks[anomalous].tolist()
+                    ).update(anomaly_scored_at=now)
+            except ValueError as e:
+                error = str(e)
+
+    result = {
+        'points': len(rows),
+        'scored': int(scored.sum()),
+        'anomalies': int(anomalous.sum()),
+        'session_id': session.pk if session else None,
+    }
+    if error:
+        result['error'] = error
+    return result
@@ -0,0 +1,301 @@
+"""
+Lectura de datasets de entrenamiento
+Acceso columnar mapeado en memoria (.npy, Parquet, Arrow IPC) e iteración por bloques
+"""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .features import FEATURE_NAMES
+
+
+# Filas por bloque en las pasadas en streaming
+DEFAULT_BATCH_ROWS = 65536
+
+# Formatos columnares leídos con pyarrow (dependencia opcional)
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+# Disposición .npy: un directorio con la matriz de características y las etiquetas
+NPY_FEATURES_FILE = 'X.npy'
+NPY_LABELS_FILE = 'y.npy'
+
+# Sufijo del directorio donde se convierte un Parquet/Arrow a .npy para entrenar
+NPY_CACHE_SUFFIX = '.npycache'
+
+
+def resolve_dataset_path(dataset):
+    """Ruta absoluta del dataset (relativa a TRAINING_DATA_PATH si no es absoluta)"""
+    if not dataset.file_path:
+        raise ValueError(f'El dataset {dataset.name} no tiene archivo asociado')
+    path = Path(dataset.file_path)
+    if not path.is_absolute():
+        path = Path(settings.TRAINING_DATA_PATH) / path
+    if not path.exists():
+        raise FileNotFoundError(str(path))
+    return path
+
+
+def dataset_columns(dataset):
+    """Columnas de características y de etiqueta declaradas en los metadatos"""
+    metadata = dataset.metadata or {}
+    return list(metadata.get('feature_columns') or FEATURE_NAMES), metadata.get('label_column', 'label')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError('Se necesita pyarrow para leer datasets Parquet/Arrow')
+
+
+def _open_npy(path, mmap_mode='r'):
+    """Matriz de características y etiquetas mapeadas en memoria (sin copiar)"""
+    X = np.load(path / NPY_FEATURES_FILE, mmap_mode=mmap_mode)
+    y = np.load(path / NPY_LABELS_FILE, mmap_mode=mmap_mode)
+    if X.ndim != 2 or len(X) != len(y):
+        raise ValueError(f'Dimensiones inconsistentes en {path}: X{X.shape}, y{y.shape}')
+    return X, y
+
+
+def _batch_to_arrays(batch, features, label):
+    """RecordBatch de Arrow a (X, y) en float64; los nulos pasan a NaN"""
+    X = np.column_stack([
+        batch.column(name).to_numpy(zero_copy_only=False).astype(float, copy=False)
+        for name in features
+    ])
+    y = batch.column(label).to_numpy(zero_copy_only=False).astype(float, copy=False)
+    return X, y
+
+
+def _iter_ipc_batches(reader, batch_rows):
+    """Bloques de un archivo Arrow IPC; slice() no copia los buffers mapeados"""
+    for index in range(reader.num_record_batches):
+        batch = reader.get_batch(index)
+        for offset in range(0, batch.num_rows, batch_rows):
+            yield batch.slice(offset, batch_rows)
+
+
+def _arrow_row_count(path):
+    """Número de filas leyendo solo los metadatos"""
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.suffix in PARQUET_EXTENSIONS:
+        return pq.ParquetFile(path, memory_map=True).metadata.num_rows
+    reader = pa.ipc.open_file(pa.memory_map(str(path), 'r'))
+    return sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+
+
+def _iter_arrow(path, features, label, batch_rows):
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.suffix in PARQUET_EXTENSIONS:
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(
+            batch_size=batch_rows, columns=features + [label]
+        )
+    else:
+        batches = _iter_ipc_batches(pa.ipc.open_file(pa.memory_map(str(path), 'r')), batch_rows)
+    for batch in batches:
+        yield _batch_to_arrays(batch, features, label)
+
+
+def iter_batches(dataset, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Recorrer el dataset en bloques (X, y) sin cargarlo entero.
+
+    En la disposición .npy los bloques son vistas del mapa de memoria; en
+    Parquet/Arrow solo se decodifica el bloque en curso.
+    """
+
+    path = resolve_dataset_path(dataset)
+    features, label = dataset_columns(dataset)
+
+    if path.is_dir():
+        X, y = _open_npy(path)
+        for start in range(0, len(X), batch_rows):
+            yield X[start:start + batch_rows], y[start:start + batch_rows]
+    elif path.suffix in PARQUET_EXTENSIONS + ARROW_EXTENSIONS:
+        yield from _iter_arrow(path, features, label, batch_rows)
+    else:
+        raise ValueError(f'Formato de dataset no soportado: {path.suffix or path.name}')
+
+
+def compute_statistics(dataset, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Estadísticas del dataset en una sola pasada en streaming.
+
+    Calidad = fracción de filas con todas las características presentes y
+    etiqueta binaria válida. Por columna se acumulan recuento, suma y suma
+    de cuadrados para obtener media y desviación sin guardar los datos.
+    """
+
+    features, _ = dataset_columns(dataset)
+    total = positive = negative = usable = 0
+    present = sums = squares = None
+
+    for X, y in iter_batches(dataset, batch_rows):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if present is None:
+            present = np.zeros(X.shape[1], dtype=np.int64)
+            sums = np.zeros(X.shape[1])
+            squares = np.zeros(X.shape[1])
+
+        missing = np.isnan(X)
+        values = np.where(missing, 0.0, X)
+        present += (~missing).sum(axis=0)
+        sums += values.sum(axis=0)
+        squares += np.square(values).sum(axis=0)
+
+        is_positive = y == 1
+        is_negative = y == 0
+        total += len(y)
+        positive += int(is_positive.sum())
+        negative += int(is_negative.sum())
+        usable += int(((is_positive | is_negative) & ~missing.any(axis=1)).sum())
+
+    column_stats = {}
+    if present is not None:
+        for index, name in enumerate(features[:len(present)]):
+            count = int(present[index])
+            mean = sums[index] / count if count else None
+            std = max(squares[index] / count - mean ** 2, 0.0) ** 0.5 if count else None
+            column_stats[name] = {
+                'present': count,
+                'missing': total - count,
+                'mean': None if mean is None else round(float(mean), 6),
+                'std': None if std is None else round(float(std), 6),
+            }
+
+    return {
+        'total_samples': total,
+        'positive_samples': positive,
+        'negative_samples': negative,
+        'quality_score': round(usable / total, 4) if total else 0.0,
+        'column_stats': column_stats,
+    }
+
+
+def update_dataset_statistics(dataset, batch_rows=DEFAULT_BATCH_ROWS):
+    """Recalcular y guardar las estadísticas y el tamaño en disco del dataset"""
+
+    stats = compute_statistics(dataset, batch_rows)
+    path = resolve_dataset_path(dataset)
+    files = path.rglob('*') if path.is_dir() else [path]
+    size = sum(file.stat().st_size for file in files if file.is_file())
+
+    dataset.total_samples = stats['total_samples']
+    dataset.positive_samples = stats['positive_samples']
+    dataset.negative_samples = stats['negative_samples']
+    dataset.quality_score = stats['quality_score']
+    dataset.file_size_mb = round(size / 1024 / 1024, 2)
+    dataset.metadata = dict(dataset.metadata or {}, column_stats=stats['column_stats'])
+    dataset.save(update_fields=[
+        'total_samples', 'positive_samples', 'negative_samples',
+        'quality_score', 'file_size_mb', 'metadata', 'updated_at'
+    ])
+    return stats
+
+
+def _convert_to_npy(dataset, path, batch_rows):
+    """Volcar un Parquet/Arrow a X.npy/y.npy por bloques (memoria acotada)"""
+
+    features, label = dataset_columns(dataset)
+    total = _arrow_row_count(path)
+
+    cache_dir = path.with_name(path.name + NPY_CACHE_SUFFIX)
+    partial_dir = cache_dir.with_name(cache_dir.name + '.partial')
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    X_out = np.lib.format.open_memmap(
+        partial_dir / NPY_FEATURES_FILE, mode='w+', dtype=np.float32, shape=(total, len(features))
+    )
+    y_out = np.lib.format.open_memmap(partial_dir / NPY_LABELS_FILE, mode='w+', dtype=np.float32, shape=(total,))
+
+    offset = 0
+    for X, y in _iter_arrow(path, features, label, batch_rows):
+        X_out[offset:offset + len(y)] = X
+        y_out[offset:offset + len(y)] = y
+        offset += len(y)
+    if offset != total:
+        raise ValueError(f'El dataset tiene {offset} filas y se esperaban {total}')
+    X_out.flush()
+    y_out.flush()
+    del X_out, y_out
+    partial_dir.rename(cache_dir)
+    return cache_dir
+
+
+def column_means(X, batch_rows=DEFAULT_BATCH_ROWS):
+    """Media de cada columna ignorando NaN, leyendo el mapa de memoria por bloques"""
+    counts = np.zeros(X.shape[1], dtype=np.int64)
+    sums = np.zeros(X.shape[1])
+    for start in range(0, len(X), batch_rows):
+        block = np.asarray(X[start:start + batch_rows], dtype=float)
+        missing = np.isnan(block)
+        counts += (~missing).sum(axis=0)
+        sums += np.where(missing, 0.0, block).sum(axis=0)
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def _temporary_memmap(dtype, shape):
+    """Mapa de memoria sobre un archivo temporal anónimo: desaparece al liberar el array"""
+    with tempfile.TemporaryFile() as backing:
+        return np.memmap(backing, dtype=dtype, mode='w+', shape=shape)
+
+
+def impute_to_memmap(X, means, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Copia de X con los NaN sustituidos por `means`, escrita por bloques en un
+    mapa de memoria temporal: la memoria residente queda acotada a un bloque.
+    """
+    dtype = X.dtype if np.issubdtype(X.dtype, np.floating) else np.float64
+    out = _temporary_memmap(dtype, X.shape)
+    for start in range(0, len(X), batch_rows):
+        block = np.asarray(X[start:start + batch_rows], dtype=float)
+        out[start:start + len(block)] = np.where(np.isnan(block), means, block)
+    return out
+
+
+def take_to_memmap(X, indices, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    X[indices] escrito por bloques en un mapa de memoria temporal, sin
+    materializar la selección completa en RAM. Con índices ordenados el
+    origen se lee secuencialmente.
+    """
+    out = _temporary_memmap(X.dtype, (len(indices),) + X.shape[1:])
+    for start in range(0, len(indices), batch_rows):
+        out[start:start + batch_rows] = X[indices[start:start + batch_rows]]
+    return out
+
+
+def training_arrays(dataset, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    (X, y) mapeados en memoria para entrenar.
+
+    Los Parquet/Arrow se convierten una vez a .npy float32 junto al archivo
+    original; después el sistema operativo pagina los datos bajo demanda.
+    El mapa es copy-on-write ('c'): scikit-learn exige buffers escribibles,
+    pero el archivo nunca se modifica y solo se copian las páginas tocadas.
+    """
+
+    path = resolve_dataset_path(dataset)
+    if path.is_dir():
+        return _open_npy(path, mmap_mode='c')
+    if path.suffix not in PARQUET_EXTENSIONS + ARROW_EXTENSIONS:
+        raise ValueError(f'Formato de dataset no soportado: {path.suffix or path.name}')
+
+    cache_dir = path.with_name(path.name + NPY_CACHE_SUFFIX)
+    if not cache_dir.exists() or cache_dir.stat().st_mtime < path.stat().st_mtime:
+        if cache_dir.exists():
+            for file in cache_dir.iterdir():
+                file.unlink()
+            cache_dir.rmdir()
+        _convert_to_npy(dataset, path, batch_rows)
+    return _open_npy(cache_dir, mmap_mode='c')
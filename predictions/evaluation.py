@@ -0,0 +1,184 @@
+"""
+Evaluación vectorizada de modelos
+Calcula todas las métricas de METRIC_TYPES sobre las predicciones validadas en una pasada
+"""
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AIModel, FloweringPrediction, ModelPerformanceMetric
+
+
+# Umbral de probabilidad para considerar una predicción como floración
+DEFAULT_THRESHOLD = 0.5
+
+# Etiquetas para predicciones sin región o sin especie
+NO_REGION = 'sin_region'
+NO_SPECIES = 'sin_especie'
+
+
+def _metrics_from_counts(tn, fp, fn, tp, squared_error, absolute_error):
+    """Métricas a partir de la matriz de confusión y sumas de error (arrays por grupo)"""
+
+    n = tn + fp + fn + tp
+    with np.errstate(invalid='ignore', divide='ignore'):
+        accuracy = (tp + tn) / n
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        denominator = np.sqrt((tp + fp) * (tp + fn) * (tn + fp) * (tn + fn))
+        mcc = np.where(denominator > 0, (tp * tn - fp * fn) / denominator, 0.0)
+        mse = squared_error / n
+        mae = absolute_error / n
+    return {
+        'accuracy': accuracy,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1,
+        'mse': mse,
+        'mae': mae,
+        'mcc': mcc,
+    }
+
+
+def _grouped(group_index, n_groups, outcome, squared_error, absolute_error):
+    """Matriz de confusión y sumas de error por grupo con un único bincount cada una"""
+    counts = np.bincount(group_index * 4 + outcome, minlength=n_groups * 4).reshape(n_groups, 4)
+    squared = np.bincount(group_index, weights=squared_error, minlength=n_groups)
+    absolute = np.bincount(group_index, weights=absolute_error, minlength=n_groups)
+    return counts, squared, absolute
+
+
+def compute_metrics(probabilities, actual, groups=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Métricas globales y desgloses por grupo.
+
+    `groups` es un dict {nombre_desglose: array de etiquetas}. Devuelve
+    (overall, confusion, breakdowns); breakdowns[nombre][etiqueta] contiene
+    las mismas métricas que overall calculadas para cada grupo, más su
+    matriz de confusión [[tn, fp], [fn, tp]].
+    """
+
+    probabilities = np.asarray(probabilities, dtype=float)
+    actual = np.asarray(actual, dtype=bool)
+    predicted = probabilities >= threshold
+    # Código de resultado: 0=TN, 1=FP, 2=FN, 3=TP
+    outcome = actual.astype(np.int64) * 2 + predicted.astype(np.int64)
+    squared_error = (probabilities - actual) ** 2
+    absolute_error = np.abs(probabilities - actual)
+
+    counts, squared, absolute = _grouped(
+        np.zeros(len(outcome), dtype=np.int64), 1, outcome, squared_error, absolute_error
+    )
+    tn, fp, fn, tp = counts[0]
+    overall = {
+        name: float(values)
+        for name, values in _metrics_from_counts(tn, fp, fn, tp, squared[0], absolute[0]).items()
+    }
+    overall_confusion = {'tn': int(tn), 'fp': int(fp), 'fn': int(fn), 'tp': int(tp)}
+
+    breakdowns = {}
+    for breakdown, labels in (groups or {}).items():
+        names, group_index = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        counts, squared, absolute = _grouped(group_index, len(names), outcome, squared_error, absolute_error)
+        metrics = _metrics_from_counts(
+            counts[:, 0], counts[:, 1], counts[:, 2], counts[:, 3], squared, absolute
+        )
+        breakdowns[breakdown] = {
+            str(name): dict(
+                {metric: round(float(values[index]), 6) for metric, values in metrics.items()},
+                confusion_matrix=counts[index].reshape(2, 2).tolist(),
+                size=int(counts[index].sum())
+            )
+            for index, name in enumerate(names)
+        }
+
+    return overall, overall_confusion, breakdowns
+
+
+def evaluate_model(ai_model, start_date=None, end_date=None, threshold=DEFAULT_THRESHOLD, version=None):
+    """
+    Evaluar un modelo contra sus predicciones validadas y guardar las métricas.
+
+    Solo entran las predicciones hechas con `version` (por defecto la versión
+    actual del modelo) para no mezclar artefactos distintos. Una consulta
+    trae probabilidad, resultado real, región y especie; el cálculo es
+    vectorizado y las métricas se insertan con bulk_create.
+    """
+
+    version = version or ai_model.version
+    predictions = FloweringPrediction.objects.filter(
+        session__model=ai_model,
+        session__model_version=version,
+        prediction_type__in=FloweringPrediction.VALIDATED_PREDICTION_TYPES,
+        actual_result__isnull=False
+    )
+    if start_date:
+        predictions = predictions.filter(target_date__gte=start_date)
+    if end_date:
+        predictions = predictions.filter(target_date__lte=end_date)
+
+    rows = list(predictions.values_list(
+        'flowering_probability', 'actual_result', 'location__region',
+        'plant_monitor__species__name', 'target_date'
+    ).iterator(chunk_size=10000))
+    if not rows:
+        raise ValueError(f'La versión {version} del modelo no tiene predicciones validadas en el rango indicado')
+
+    probabilities, actual, regions, species, target_dates = zip(*rows)
+    overall, confusion, breakdowns = compute_metrics(
+        probabilities,
+        actual,
+        groups={
+            'by_region': [region or NO_REGION for region in regions],
+            'by_species': [name or NO_SPECIES for name in species],
+        },
+        threshold=threshold
+    )
+
+    evaluation_date = timezone.now()
+    dataset_size = len(rows)
+    first_date, last_date = min(target_dates), max(target_dates)
+    description = (
+        f'Predicciones validadas de la versión {version} con fecha objetivo entre {first_date} y {last_date}'
+    )
+
+    # La matriz de confusión no es un escalar: su fila guarda el número de
+    # predicciones evaluadas como valor y la matriz completa en details
+    scalars = dict(overall, confusion_matrix=float(dataset_size))
+    metrics = []
+    for metric_type, value in scalars.items():
+        details = {
+            'threshold': threshold,
+            'version': version,
+            'date_range': [first_date.isoformat(), last_date.isoformat()],
+            'by_region': {name: values[metric_type] for name, values in breakdowns['by_region'].items()},
+            'by_species': {name: values[metric_type] for name, values in breakdowns['by_species'].items()},
+        }
+        if metric_type == 'confusion_matrix':
+            details.update(confusion, matrix=[[confusion['tn'], confusion['fp']], [confusion['fn'], confusion['tp']]])
+        metrics.append(ModelPerformanceMetric(
+            model=ai_model,
+            metric_type=metric_type,
+            value=value,
+            evaluation_date=evaluation_date,
+            dataset_size=dataset_size,
+            dataset_description=description,
+            details=details,
+        ))
+
+    with transaction.atomic():
+        ModelPerformanceMetric.objects.bulk_create(metrics)
+        if version == ai_model.version:
+            # Sin tocar updated_at: forma parte de la clave de caché de las predicciones
+            ai_model.accuracy = overall['accuracy']
+            AIModel.objects.filter(pk=ai_model.pk).update(accuracy=ai_model.accuracy)
+
+    return {
+        'version': version,
+        'dataset_size': dataset_size,
+        'metrics': overall,
+        'confusion_matrix': confusion,
+        'breakdowns': breakdowns,
+    }
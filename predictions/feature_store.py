@@ -0,0 +1,154 @@
+"""
+Almacén de características materializadas
+Lectura en bloque de vectores (ubicación, fecha) como matriz NumPy y refresco incremental
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .features import FEATURE_NAMES, FEATURE_SCHEMA_VERSION, MAX_WINDOW_DAYS, build_feature_matrix
+from .models import FeatureVector
+
+
+# Ubicaciones recalculadas por bloque (acota la memoria de las matrices intermedias)
+REFRESH_LOCATION_CHUNK = 500
+
+# Filas insertadas por sentencia
+STORE_BATCH_SIZE = 2000
+
+
+def store_features(keys, X):
+    """Insertar o actualizar vectores calculados (upsert por ubicación, fecha y versión)"""
+
+    vectors = [
+        FeatureVector(
+            location_id=location_id,
+            date=day,
+            schema_version=FEATURE_SCHEMA_VERSION,
+            stale=False,
+            **{name: (None if np.isnan(value) else float(value)) for name, value in zip(FEATURE_NAMES, row)}
+        )
+        for (location_id, day), row in zip(keys, X)
+    ]
+    FeatureVector.objects.bulk_create(
+        vectors,
+        batch_size=STORE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['location', 'date', 'schema_version'],
+        update_fields=FEATURE_NAMES + ['stale', 'computed_at'],
+    )
+    return len(vectors)
+
+
+def compute_and_store(location_ids, dates):
+    """Recalcular y materializar los vectores de las ubicaciones y fechas dadas"""
+
+    location_ids = list(location_ids)
+    stored = 0
+    for start in range(0, len(location_ids), REFRESH_LOCATION_CHUNK):
+        chunk = location_ids[start:start + REFRESH_LOCATION_CHUNK]
+        keys, X = build_feature_matrix(chunk, dates)
+        with transaction.atomic():
+            stored += store_features(keys, X)
+    return stored
+
+
+def read_feature_matrix(location_ids, dates):
+    """
+    Matriz de características leída del almacén en una sola consulta.
+
+    Devuelve (keys, X, found): `found` marca las filas presentes y
+    actualizadas; el resto queda a NaN.
+    """
+
+    location_ids = list(location_ids)
+    dates = sorted(set(dates))
+    keys = [(location_id, day) for location_id in location_ids for day in dates]
+    X = np.full((len(keys), len(FEATURE_NAMES)), np.nan)
+    found = np.zeros(len(keys), dtype=bool)
+    if not keys:
+        return keys, X, found
+
+    position = {key: index for index, key in enumerate(keys)}
+    rows = FeatureVector.objects.filter(
+        location_id__in=location_ids,
+        date__gte=dates[0],
+        date__lte=dates[-1],
+        schema_version=FEATURE_SCHEMA_VERSION,
+        stale=False
+    ).values_list('location_id', 'date', *FEATURE_NAMES)
+
+    indices = []
+    values = []
+    for row in rows.iterator(chunk_size=STORE_BATCH_SIZE):
+        index = position.get((row[0], row[1]))
+        if index is not None:
+            indices.append(index)
+            values.append(row[2:])
+    if indices:
+        X[indices] = np.array(values, dtype=float)
+        found[indices] = True
+    return keys, X, found
+
+
+def get_feature_matrix(location_ids, dates):
+    """
+    Igual que build_feature_matrix pero servido desde el almacén.
+
+    Solo se recalculan (y se guardan) las ubicaciones con vectores ausentes
+    o desactualizados, para las fechas solicitadas.
+    """
+
+    keys, X, found = read_feature_matrix(location_ids, dates)
+    if found.all():
+        return keys, X
+
+    missing_locations = sorted({keys[index][0] for index in np.flatnonzero(~found)})
+    missing_dates = sorted({keys[index][1] for index in np.flatnonzero(~found)})
+    compute_and_store(missing_locations, missing_dates)
+
+    keys, X, _ = read_feature_matrix(location_ids, dates)
+    return keys, X
+
+
+def mark_stale(location_ids, start_date, end_date=None):
+    """
+    Marcar como desactualizados los vectores afectados por un cambio en las fuentes.
+
+    Un dato del día D influye en las ventanas que terminan entre D y
+    D + MAX_WINDOW_DAYS - 1.
+    """
+
+    end_date = end_date or start_date
+    return FeatureVector.objects.filter(
+        location_id__in=list(location_ids),
+        date__gte=start_date,
+        date__lte=end_date + timedelta(days=MAX_WINDOW_DAYS - 1),
+        stale=False
+    ).update(stale=True)
+
+
+def refresh_stale(limit=None):
+    """Recalcular los vectores marcados como desactualizados; devuelve cuántos se refrescaron"""
+
+    stale = FeatureVector.objects.filter(
+        schema_version=FEATURE_SCHEMA_VERSION, stale=True
+    ).order_by('location_id', 'date').values_list('location_id', 'date')
+    if limit:
+        stale = stale[:limit]
+
+    by_location = {}
+    for location_id, day in stale.iterator(chunk_size=STORE_BATCH_SIZE):
+        by_location.setdefault(location_id, set()).add(day)
+
+    # Agrupar ubicaciones con el mismo conjunto de fechas para calcularlas juntas
+    groups = {}
+    for location_id, days in by_location.items():
+        groups.setdefault(frozenset(days), []).append(location_id)
+
+    refreshed = 0
+    for days, location_ids in groups.items():
+        refreshed += compute_and_store(location_ids, sorted(days))
+    return refreshed
@@ -0,0 +1,206 @@
+"""
+Construcción de características para los modelos de predicción
+Ensambla la matriz (ubicación, fecha) x características con consultas en bloque
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from plants.models import Location
+from satellite_data.models import SatelliteDataPoint, WeatherData
+
+
+# Versión del esquema de características; incrementar si cambia FEATURE_NAMES
+FEATURE_SCHEMA_VERSION = 1
+
+FEATURE_NAMES = [
+    'ndvi_mean',
+    'evi_mean',
+    'temperature_avg_mean',
+    'temperature_min_mean',
+    'temperature_max_mean',
+    'humidity_mean',
+    'precipitation_sum',
+    'growing_degree_days',
+    'doy_sin',
+    'doy_cos',
+    'latitude',
+]
+
+# Ventanas (en días, terminando en la fecha objetivo inclusive)
+SATELLITE_WINDOW_DAYS = 16
+TEMPERATURE_WINDOW_DAYS = 14
+PRECIPITATION_WINDOW_DAYS = 30
+
+# Temperatura base para grados-día de crecimiento (°C)
+GDD_BASE_TEMPERATURE = 10.0
+
+# Calidades de punto satelital que se descartan
+EXCLUDED_QUALITY_FLAGS = ('bad',)
+
+MAX_WINDOW_DAYS = max(SATELLITE_WINDOW_DAYS, TEMPERATURE_WINDOW_DAYS, PRECIPITATION_WINDOW_DAYS)
+
+
+def date_range(start_date, end_date):
+    """Lista de fechas diarias entre start_date y end_date (inclusive)"""
+    days = (end_date - start_date).days
+    return [start_date + timedelta(days=offset) for offset in range(days + 1)]
+
+
+def _column(rows, position):
+    return np.array([np.nan if row[position] is None else row[position] for row in rows], dtype=float)
+
+
+def _rolling(values, window, targets, reducer='mean'):
+    """
+    Media o suma móvil ignorando NaN para cada fila de `values`.
+
+    Devuelve las columnas `targets`, usando en cada una los `window` días
+    anteriores (inclusive). Sin observaciones el resultado es NaN.
+    """
+
+    present = ~np.isnan(values)
+    zero_row = np.zeros((values.shape[0], 1))
+    sums = np.concatenate([zero_row, np.cumsum(np.where(present, values, 0.0), axis=1)], axis=1)
+    counts = np.concatenate([zero_row, np.cumsum(present, axis=1)], axis=1)
+
+    end = targets + 1
+    start = np.maximum(end - window, 0)
+    window_sums = sums[:, end] - sums[:, start]
+    window_counts = counts[:, end] - counts[:, start]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if reducer == 'sum':
+            result = np.where(window_counts > 0, window_sums, np.nan)
+        else:
+            result = window_sums / window_counts
+    return result
+
+
+def build_feature_matrix(location_ids, dates):
+    """
+    Matriz de características para cada par (ubicación, fecha).
+
+    Hace tres consultas en total (ubicaciones, clima, satélite) para todo el
+    conjunto y calcula las ventanas móviles de forma vectorizada.
+
+    Devuelve (keys, X): keys es la lista [(location_id, date), ...] en orden
+    ubicación-fecha y X un array float (len(keys), len(FEATURE_NAMES)) con
+    NaN donde no hay datos.
+    """
+
+    location_ids = list(location_ids)
+    dates = sorted(set(dates))
+    if not location_ids or not dates:
+        return [], np.empty((0, len(FEATURE_NAMES)))
+
+    grid_start = dates[0] - timedelta(days=MAX_WINDOW_DAYS - 1)
+    grid_days = (dates[-1] - grid_start).days + 1
+    n_locations = len(location_ids)
+    row_of = {location_id: index for index, location_id in enumerate(location_ids)}
+    target_columns = np.array([(day - grid_start).days for day in dates])
+
+    latitudes = dict(
+        Location.objects.filter(id__in=location_ids).values_list('id', 'latitude')
+    )
+
+    # Clima diario -> matrices ubicación x día
+    weather_rows = list(
+        WeatherData.objects.filter(
+            location_id__in=location_ids,
+            date__gte=grid_start,
+            date__lte=dates[-1]
+        ).values_list(
+            'location_id', 'date', 'temperature_min', 'temperature_max',
+            'temperature_avg', 'humidity', 'precipitation'
+        )
+    )
+    grids = {
+        name: np.full((n_locations, grid_days), np.nan)
+        for name in ('temperature_min', 'temperature_max', 'temperature_avg', 'humidity', 'precipitation')
+    }
+    if weather_rows:
+        rows_index = np.array([row_of[row[0]] for row in weather_rows])
+        days_index = np.array([(row[1] - grid_start).days for row in weather_rows])
+        for position, name in enumerate(grids, start=2):
+            grids[name][rows_index, days_index] = _column(weather_rows, position)
+
+    # Temperatura media: usar (min + max) / 2 cuando no hay promedio registrado
+    temperature_avg = np.where(
+        np.isnan(grids['temperature_avg']),
+        (grids['temperature_min'] + grids['temperature_max']) / 2.0,
+        grids['temperature_avg']
+    )
+    daily_gdd = np.maximum(temperature_avg - GDD_BASE_TEMPERATURE, 0.0)
+
+    # Índices satelitales: promedio diario por ubicación
+    satellite_rows = list(
+        SatelliteDataPoint.objects.filter(
+            collection__location_id__in=location_ids,
+            collection__data_type__in=('ndvi', 'evi'),
+            timestamp__date__gte=grid_start,
+            timestamp__date__lte=dates[-1]
+        ).exclude(
+            quality_flag__in=EXCLUDED_QUALITY_FLAGS
+        ).values_list('collection__location_id', 'collection__data_type', 'timestamp', 'value')
+    )
+    satellite = {}
+    for data_type in ('ndvi', 'evi'):
+        selected = [row for row in satellite_rows if row[1] == data_type]
+        sums = np.zeros((n_locations, grid_days))
+        counts = np.zeros((n_locations, grid_days))
+        if selected:
+            rows_index = np.array([row_of[row[0]] for row in selected])
+            days_index = np.array([(timezone.localtime(row[2]).date() - grid_start).days for row in selected])
+            np.add.at(sums, (rows_index, days_index), _column(selected, 3))
+            np.add.at(counts, (rows_index, days_index), 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            satellite[data_type] = np.where(counts > 0, sums / counts, np.nan)
+
+    targets = target_columns
+    count = len(dates)
+    columns = {
+        'ndvi_mean': _rolling(satellite['ndvi'], SATELLITE_WINDOW_DAYS, targets),
+        'evi_mean': _rolling(satellite['evi'], SATELLITE_WINDOW_DAYS, targets),
+        'temperature_avg_mean': _rolling(temperature_avg, TEMPERATURE_WINDOW_DAYS, targets),
+        'temperature_min_mean': _rolling(grids['temperature_min'], TEMPERATURE_WINDOW_DAYS, targets),
+        'temperature_max_mean': _rolling(grids['temperature_max'], TEMPERATURE_WINDOW_DAYS, targets),
+        'humidity_mean': _rolling(grids['humidity'], TEMPERATURE_WINDOW_DAYS, targets),
+        'precipitation_sum': _rolling(grids['precipitation'], PRECIPITATION_WINDOW_DAYS, targets, 'sum'),
+        'growing_degree_days': _rolling(daily_gdd, PRECIPITATION_WINDOW_DAYS, targets, 'sum'),
+    }
+
+    day_of_year = np.array([day.timetuple().tm_yday for day in dates], dtype=float)
+    angle = 2.0 * np.pi * day_of_year / 365.25
+    columns['doy_sin'] = np.broadcast_to(np.sin(angle), (n_locations, count))
+    columns['doy_cos'] = np.broadcast_to(np.cos(angle), (n_locations, count))
+    location_latitudes = np.array([
+        float(latitudes[location_id]) if latitudes.get(location_id) is not None else np.nan
+        for location_id in location_ids
+    ])
+    columns['latitude'] = np.broadcast_to(location_latitudes[:, None], (n_locations, count))
+
+    X = np.stack([columns[name].reshape(-1) for name in FEATURE_NAMES], axis=1)
+    keys = [(location_id, day) for location_id in location_ids for day in dates]
+    return keys, X
+
+
+def impute_missing(X):
+    """Sustituir NaN por la media de cada columna (0 si la columna está vacía)"""
+    if not X.size:
+        return X
+    missing = np.isnan(X)
+    counts = (~missing).sum(axis=0)
+    sums = np.where(missing, 0.0, X).sum(axis=0)
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    return np.where(missing, means, X)
+
+
+def features_to_dict(row):
+    """Vector de características como dict serializable a JSON"""
+    return {
+        name: (None if np.isnan(value) else round(float(value), 6))
+        for name, value in zip(FEATURE_NAMES, row)
+    }
@@ -0,0 +1,227 @@
+"""
+Motor de inferencia en lote
+Puntúa la matriz de características completa con el modelo activo en una sola llamada
+"""
+
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from plants.models import Location, PlantMonitor
+from .aggregates import add_to_session
+from .features import (
+    FEATURE_SCHEMA_VERSION, date_range, features_to_dict, impute_missing
+)
+from .feature_store import get_feature_matrix
+from .models import AIModel, FloweringPrediction, PredictionSession
+from .registry import model_registry
+
+
+# Filas insertadas por sentencia en bulk_create
+BULK_BATCH_SIZE = 2000
+
+# Límites de una ejecución en lote
+MAX_BATCH_DAYS = 366
+MAX_BATCH_ROWS = 2_000_000
+
+# Tipo de predicción generado por cada tipo de sesión en lote
+BATCH_PREDICTION_TYPES = {
+    'flowering_detection': 'detection',
+    'flowering_prediction': 'forecast',
+}
+
+# Decimales usados al calcular la huella del vector de características
+FEATURE_HASH_DECIMALS = 6
+
+
+def get_active_model(model_id=None):
+    """Modelo activo indicado o, si no se indica, el activo más reciente"""
+    queryset = AIModel.objects.filter(status='active')
+    if model_id:
+        return queryset.get(pk=model_id)
+    ai_model = queryset.order_by('-updated_at').first()
+    if ai_model is None:
+        raise AIModel.DoesNotExist('No hay ningún modelo activo')
+    return ai_model
+
+
+def score_matrix(estimator, X):
+    """
+    Probabilidad de floración para cada fila de X en una sola llamada.
+
+    Usa predict_proba (clase positiva), decision_function con sigmoide o
+    predict, en ese orden de preferencia.
+    """
+
+    if not len(X):
+        return np.empty(0)
+    if hasattr(estimator, 'predict_proba'):
+        probabilities = estimator.predict_proba(X)
+        classes = list(getattr(estimator, 'classes_', []))
+        column = classes.index(1) if 1 in classes else probabilities.shape[1] - 1
+        scores = probabilities[:, column]
+    elif hasattr(estimator, 'decision_function'):
+        scores = 1.0 / (1.0 + np.exp(-np.asarray(estimator.decision_function(X), dtype=float)))
+    else:
+        scores = estimator.predict(X)
+    return np.clip(np.asarray(scores, dtype=float).reshape(-1), 0.0, 1.0)
+
+
+def run_batch_prediction(ai_model, start_date, end_date, executed_by, location_ids=None,
+                         plant_monitor_ids=None, session_type='flowering_prediction',
+                         estimator=None):
+    """
+    Predicciones para todas las ubicaciones/plantas y fechas objetivo.
+
+    1. Lee la matriz de características del almacén (calculando las que falten).
+    2. Puntúa toda la matriz con una única llamada vectorizada al modelo.
+    3. Inserta las FloweringPrediction con bulk_create por bloques de
+       BULK_BATCH_SIZE bajo una sola sesión.
+    """
+
+    if session_type not in BATCH_PREDICTION_TYPES:
+        raise ValueError(f'Tipo de sesión no soportado en lote: {session_type}')
+    if end_date < start_date:
+        raise ValueError('end_date debe ser posterior a start_date')
+    dates = date_range(start_date, end_date)
+    if len(dates) > MAX_BATCH_DAYS:
+        raise ValueError(f'El rango máximo es de {MAX_BATCH_DAYS} días')
+
+    # Filas de salida: (location_id, plant_monitor_id)
+    if plant_monitor_ids:
+        targets = list(
+            PlantMonitor.objects.filter(id__in=plant_monitor_ids).values_list('location_id', 'id')
+        )
+        location_ids = sorted({location_id for location_id, _ in targets})
+    else:
+        location_ids = list(
+            Location.objects.filter(id__in=location_ids or []).values_list('id', flat=True)
+        )
+        targets = [(location_id, None) for location_id in location_ids]
+    # Plantas de una misma ubicación seguidas: comparten los dicts de características
+    targets.sort()
+
+    if not targets:
+        raise ValueError('No se encontraron ubicaciones ni plantas para predecir')
+    if len(targets) * len(dates) > MAX_BATCH_ROWS:
+        raise ValueError(f'El lote supera el máximo de {MAX_BATCH_ROWS} predicciones')
+
+    if estimator is None:
+        estimator = model_registry.get(ai_model)
+
+    _, X = get_feature_matrix(location_ids, dates)
+    scores = score_matrix(estimator, impute_missing(X))
+    confidences = np.maximum(scores, 1.0 - scores)
+    complete = ~np.isnan(X).any(axis=1)
+
+    # Posición de cada ubicación dentro de la matriz (orden ubicación-fecha)
+    n_dates = len(dates)
+    block_of = {location_id: index * n_dates for index, location_id in enumerate(location_ids)}
+    today = timezone.localdate()
+    prediction_type = BATCH_PREDICTION_TYPES[session_type]
+
+    with transaction.atomic():
+        session = PredictionSession.objects.create(
+            model=ai_model,
+            session_type=session_type,
+            start_date=start_date,
+            end_date=end_date,
+            executed_by=executed_by,
+            status='running'
+        )
+        session.locations.set(location_ids)
+        if plant_monitor_ids:
+            session.plant_monitors.set([monitor_id for _, monitor_id in targets])
+
+        # Se construye e inserta por bloques para acotar la memoria en lotes grandes
+        predictions = []
+        row_features = {}
+        current_location = None
+        for location_id, monitor_id in targets:
+            if location_id != current_location:
+                current_location, row_features = location_id, {}
+            block = block_of[location_id]
+            for offset, target_date in enumerate(dates):
+                row = block + offset
+                if row not in row_features:
+                    row_features[row] = dict(
+                        features_to_dict(X[row]), schema_version=FEATURE_SCHEMA_VERSION
+                    )
+                predictions.append(FloweringPrediction(
+                    session=session,
+                    location_id=location_id,
+                    plant_monitor_id=monitor_id,
+                    prediction_type=prediction_type,
+                    prediction_date=today,
+                    target_date=target_date,
+                    flowering_probability=float(scores[row]),
+                    confidence_score=float(confidences[row]),
+                    input_features=row_features[row],
+                ))
+                if len(predictions) >= BULK_BATCH_SIZE:
+                    FloweringPrediction.objects.bulk_create(predictions)
+                    predictions = []
+        if predictions:
+            FloweringPrediction.objects.bulk_create(predictions)
+
+        rows = np.array([block_of[location_id] for location_id, _ in targets])[:, None] + np.arange(n_dates)
+        rows = rows.reshape(-1)
+        # Exitosas: predicciones calculadas con todas las características disponibles
+        add_to_session(session.pk, confidences[rows], complete[rows].sum())
+        PredictionSession.objects.filter(pk=session.pk).update(
+            status='completed',
+            completed_at=timezone.now()
+        )
+        session.refresh_from_db()
+
+    return session
+
+
+def feature_hash(row):
+    """Huella estable de un vector de características (NaN incluidos)"""
+    values = np.round(np.asarray(row, dtype=np.float64), FEATURE_HASH_DECIMALS)
+    digest = hashlib.sha1(values.tobytes())
+    digest.update(str(FEATURE_SCHEMA_VERSION).encode())
+    return digest.hexdigest()
+
+
+def prediction_cache_key(ai_model, row):
+    """
+    Clave direccionada por contenido: (modelo, versión, huella de características).
+
+    Incluye la marca updated_at del modelo, de modo que cualquier cambio
+    del modelo (reentrenamiento, nuevo artefacto) invalida sus entradas.
+    """
+    revision = int(ai_model.updated_at.timestamp()) if ai_model.updated_at else 0
+    return f'prediction:{ai_model.pk}:{ai_model.version}:{revision}:{feature_hash(row)}'
+
+
+def predict_single(ai_model, location_id, target_date):
+    """
+    Predicción de una ubicación y fecha servida desde caché cuando es posible.
+
+    El vector se lee del almacén de características; si sus valores
+    cambian, cambia la huella y la entrada anterior deja de usarse.
+    Devuelve (resultado, cached).
+    """
+
+    _, X = get_feature_matrix([location_id], [target_date])
+    row = X[0]
+    key = prediction_cache_key(ai_model, row)
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+
+    score = float(score_matrix(model_registry.get(ai_model), impute_missing(X))[0])
+    result = {
+        'flowering_probability': score,
+        'confidence_score': max(score, 1.0 - score),
+        'complete_features': bool(not np.isnan(row).any()),
+        'input_features': features_to_dict(row),
+    }
+    cache.set(key, result, settings.PREDICTION_CACHE_TIMEOUT)
+    return result, False
@@ -0,0 +1,39 @@
+"""
+Refresca el almacén de características (vectores desactualizados o un rango de fechas)
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from plants.models import Location
+from predictions.feature_store import compute_and_store, refresh_stale
+from predictions.features import date_range
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los vectores de características desactualizados y, opcionalmente, precalcula los últimos días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=0,
+            help='Precalcular los últimos N días para todas las ubicaciones activas'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Máximo de vectores desactualizados a refrescar'
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_stale(limit=options['limit'])
+        self.stdout.write(f'Vectores desactualizados refrescados: {refreshed}')
+
+        if options['days'] > 0:
+            today = timezone.localdate()
+            dates = date_range(today - timedelta(days=options['days'] - 1), today)
+            location_ids = Location.objects.filter(is_active=True).values_list('id', flat=True)
+            stored = compute_and_store(location_ids, dates)
+            self.stdout.write(f'Vectores precalculados: {stored}')
+
+        self.stdout.write(self.style.SUCCESS('Almacén de características actualizado'))
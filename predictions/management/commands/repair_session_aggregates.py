@@ -0,0 +1,21 @@
+"""
+Recalcula los agregados de las sesiones de predicción desde sus predicciones
+"""
+
+from django.core.management.base import BaseCommand
+
+from predictions.aggregates import repair_session_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recalcula total, exitosas y confianza de las sesiones de predicción en una pasada agrupada'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'session_ids', nargs='*', type=int,
+            help='Sesiones a reparar (por defecto, todas)'
+        )
+
+    def handle(self, *args, **options):
+        repaired = repair_session_aggregates(options['session_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Sesiones reparadas: {repaired}'))
@@ -0,0 +1,48 @@
+"""
+Puntúa los puntos satelitales pendientes de detección de anomalías
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from predictions.anomalies import ANOMALY_DATA_TYPES, score_points
+from satellite_data.models import SatelliteDataPoint
+
+
+class Command(BaseCommand):
+    help = 'Puntúa en lotes los SatelliteDataPoint aún no puntuados contra las líneas base por ubicación'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=None,
+            help='Limitar a los puntos creados en las últimas N horas (por defecto, todos los pendientes)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Puntos por lote')
+
+    def handle(self, *args, **options):
+        pending = SatelliteDataPoint.objects.filter(
+            anomaly_scored_at__isnull=True,
+            collection__data_type__in=ANOMALY_DATA_TYPES
+        )
+        if options['hours']:
+            pending = pending.filter(created_at__gt=timezone.now() - timedelta(hours=options['hours']))
+        point_ids = list(pending.order_by('id').values_list('id', flat=True))
+
+        scored = anomalies = 0
+        errors = set()
+        batch_size = options['batch_size']
+        for start in range(0, len(point_ids), batch_size):
+            result = score_points(point_ids[start:start + batch_size])
+            if result:
+                scored += result['scored']
+                anomalies += result['anomalies']
+                if 'error' in result:
+                    errors.add(result['error'])
+
+        for error in sorted(errors):
+            self.stderr.write(self.style.WARNING(f'{error}: los puntos anómalos quedan pendientes'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Puntos procesados: {len(point_ids)}, puntuados: {scored}, anomalías: {anomalies}'
+        ))
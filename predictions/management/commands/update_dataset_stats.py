@@ -0,0 +1,33 @@
+"""
+Recalcula las estadísticas de los datasets de entrenamiento leyendo sus archivos en streaming
+"""
+
+from django.core.management.base import BaseCommand
+
+from predictions.datasets import DEFAULT_BATCH_ROWS, update_dataset_statistics
+from predictions.models import TrainingDataset
+
+
+class Command(BaseCommand):
+    help = 'Calcula total de muestras, positivas, negativas y calidad de los datasets sin cargarlos en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_ids', nargs='*', type=int, help='Datasets a procesar (por defecto, todos)')
+        parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help='Filas por bloque')
+
+    def handle(self, *args, **options):
+        datasets = TrainingDataset.objects.all()
+        if options['dataset_ids']:
+            datasets = datasets.filter(pk__in=options['dataset_ids'])
+
+        for dataset in datasets:
+            try:
+                stats = update_dataset_statistics(dataset, options['batch_rows'])
+            except (OSError, ValueError) as e:
+                self.stderr.write(f'{dataset.name}: {e}')
+                continue
+            self.stdout.write(
+                f"{dataset.name}: {stats['total_samples']} muestras "
+                f"({stats['positive_samples']} positivas, {stats['negative_samples']} negativas), "
+                f"calidad {stats['quality_score']}"
+            )
@@ -0,0 +1,45 @@
+"""
+Valida automáticamente las predicciones contra los eventos de floración observados
+"""
+
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from predictions.validation import auto_validate
+
+
+class Command(BaseCommand):
+    help = 'Empareja las predicciones vencidas con eventos de floración cercanos y rellena actual_result'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--radius', type=float, default=None, help='Radio de búsqueda en metros')
+        parser.add_argument('--window', type=int, default=None, help='Ventana temporal en días (±)')
+        parser.add_argument('--min-confidence', type=float, default=None, help='Confianza mínima del evento')
+        parser.add_argument(
+            '--since', default=None,
+            help='Revisar lo registrado desde YYYY-MM-DD (hora local; por defecto, desde la última ejecución)'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since_date = parse_date(options['since'])
+            except ValueError:
+                since_date = None
+            if since_date is None:
+                raise CommandError('--since debe tener formato YYYY-MM-DD')
+            since = timezone.make_aware(datetime.combine(since_date, time.min))
+        run = auto_validate(
+            radius_m=options['radius'],
+            window_days=options['window'],
+            min_confidence=options['min_confidence'],
+            since=since,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Predicciones validadas: {run.validated_count} ({run.positive_count} con floración) '
+            f'hasta {run.until_date}'
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0002_location_coordinates_alter_location_latitude_and_more'),
+        ('predictions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureVector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('schema_version', models.PositiveSmallIntegerField(verbose_name='Versión del esquema')),
+                ('ndvi_mean', models.FloatField(blank=True, null=True, verbose_name='NDVI medio')),
+                ('evi_mean', models.FloatField(blank=True, null=True, verbose_name='EVI medio')),
+                ('temperature_avg_mean', models.FloatField(blank=True, null=True, verbose_name='Temp. promedio media (°C)')),
+                ('temperature_min_mean', models.FloatField(blank=True, null=True, verbose_name='Temp. mínima media (°C)')),
+                ('temperature_max_mean', models.FloatField(blank=True, null=True, verbose_name='Temp. máxima media (°C)')),
+                ('humidity_mean', models.FloatField(blank=True, null=True, verbose_name='Humedad media (%)')),
+                ('precipitation_sum', models.FloatField(blank=True, null=True, verbose_name='Precipitación acumulada (mm)')),
+                ('growing_degree_days', models.FloatField(blank=True, null=True, verbose_name='Grados-día de crecimiento')),
+                ('doy_sin', models.FloatField(blank=True, null=True, verbose_name='Día del año (seno)')),
+                ('doy_cos', models.FloatField(blank=True, null=True, verbose_name='Día del año (coseno)')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Latitud')),
+                ('stale', models.BooleanField(default=False, help_text='Las fuentes cambiaron desde el último cálculo', verbose_name='Desactualizado')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='Calculado en')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='plants.location', verbose_name='Ubicación')),
+            ],
+            options={
+                'verbose_name': 'Vector de características',
+                'verbose_name_plural': 'Vectores de características',
+                'ordering': ['location', 'date'],
+                'indexes': [models.Index(condition=models.Q(('stale', True)), fields=['schema_version'], name='featurevector_stale_idx')],
+                'unique_together': {('location', 'date', 'schema_version')},
+            },
+        ),
+    ]
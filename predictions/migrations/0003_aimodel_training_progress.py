@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:21
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0002_featurevector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aimodel',
+            name='training_cancel_requested',
+            field=models.BooleanField(default=False, verbose_name='Cancelación solicitada'),
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='training_message',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Etapa entrenamiento'),
+        ),
+        migrations.AddField(
+            model_name='aimodel',
+            name='training_progress',
+            field=models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(100)], verbose_name='Progreso entrenamiento (%)'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0002_location_coordinates_alter_location_latitude_and_more'),
+        ('predictions', '0003_aimodel_training_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_at', models.DateTimeField(auto_now_add=True, verbose_name='Ejecutada en')),
+                ('since_date', models.DateField(blank=True, null=True, verbose_name='Desde (exclusivo)')),
+                ('until_date', models.DateField(verbose_name='Hasta (inclusivo)')),
+                ('radius_m', models.FloatField(verbose_name='Radio (m)')),
+                ('window_days', models.PositiveSmallIntegerField(verbose_name='Ventana (días)')),
+                ('validated_count', models.PositiveIntegerField(default=0, verbose_name='Predicciones validadas')),
+                ('positive_count', models.PositiveIntegerField(default=0, verbose_name='Validadas con floración')),
+            ],
+            options={
+                'verbose_name': 'Ejecución de validación',
+                'verbose_name_plural': 'Ejecuciones de validación',
+                'ordering': ['-run_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='floweringprediction',
+            index=models.Index(condition=models.Q(('actual_result__isnull', True)), fields=['target_date'], name='prediction_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0004_validationrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionsession',
+            name='confidence_sum',
+            field=models.FloatField(default=0, verbose_name='Suma de confianzas'),
+        ),
+        migrations.AddField(
+            model_name='predictionsession',
+            name='confidence_sum_squares',
+            field=models.FloatField(default=0, verbose_name='Suma de cuadrados de confianzas'),
+        ),
+    ]
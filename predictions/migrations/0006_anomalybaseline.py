@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plants', '0002_location_coordinates_alter_location_latitude_and_more'),
+        ('predictions', '0005_predictionsession_confidence_sums'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(max_length=50, verbose_name='Tipo de datos')),
+                ('period', models.PositiveSmallIntegerField(help_text='Periodo de 16 días del año (0-22)', verbose_name='Periodo')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Observaciones')),
+                ('mean', models.FloatField(default=0, verbose_name='Media')),
+                ('m2', models.FloatField(default=0, verbose_name='Suma de cuadrados de desviaciones')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='plants.location', verbose_name='Ubicación')),
+            ],
+            options={
+                'verbose_name': 'Línea base de anomalías',
+                'verbose_name_plural': 'Líneas base de anomalías',
+                'ordering': ['location', 'data_type', 'period'],
+                'unique_together': {('location', 'data_type', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+def backfill_versions(apps, schema_editor):
+    """Sesiones previas: se asume la versión actual de su modelo; las filas
+    'confusion_matrix' antiguas guardaban el MCC y pasan a 'mcc'"""
+    AIModel = apps.get_model('predictions', 'AIModel')
+    PredictionSession = apps.get_model('predictions', 'PredictionSession')
+    ModelPerformanceMetric = apps.get_model('predictions', 'ModelPerformanceMetric')
+    for model_id, version in AIModel.objects.values_list('id', 'version'):
+        PredictionSession.objects.filter(model_id=model_id, model_version='').update(model_version=version)
+    ModelPerformanceMetric.objects.filter(
+        metric_type='confusion_matrix', details__value='matthews_corrcoef'
+    ).update(metric_type='mcc')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0006_anomalybaseline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionsession',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Versión del modelo'),
+        ),
+        migrations.AlterField(
+            model_name='modelperformancemetric',
+            name='metric_type',
+            field=models.CharField(choices=[('accuracy', 'Precisión'), ('precision', 'Precisión (P)'), ('recall', 'Recall (R)'), ('f1_score', 'F1 Score'), ('mse', 'Error Cuadrático Medio'), ('mae', 'Error Absoluto Medio'), ('mcc', 'Coeficiente de Matthews'), ('confusion_matrix', 'Matriz de Confusión')], max_length=50, verbose_name='Tipo métrica'),
+        ),
+        migrations.RunPython(backfill_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0007_session_model_version_mcc'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='validationrun',
+            name='watermark',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Marca de agua'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:10
+
+from django.db import migrations
+
+
+def clear_anomaly_validations(apps, schema_editor):
+    """Las anomalías validadas automáticamente contra eventos de floración vuelven a quedar sin validar"""
+    FloweringPrediction = apps.get_model('predictions', 'FloweringPrediction')
+    FloweringPrediction.objects.filter(
+        prediction_type='anomaly', validation_notes__startswith='Validación automática'
+    ).update(actual_result=None, validation_date=None, validation_notes='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0008_validationrun_watermark'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_anomaly_validations, migrations.RunPython.noop),
+    ]
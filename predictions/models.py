@@ -66,6 +66,13 @@ class AIModel(models.Model):
     )
     training_start_date = models.DateTimeField(null=True, blank=True, verbose_name="Inicio entrenamiento")
     training_end_date = models.DateTimeField(null=True, blank=True, verbose_name="Fin entrenamiento")
+    training_progress = models.PositiveSmallIntegerField(
+        default=0,
+        validators=[MaxValueValidator(100)],
+        verbose_name="Progreso entrenamiento (%)"
+    )
+    training_message = models.CharField(max_length=255, blank=True, verbose_name="Etapa entrenamiento")
+    training_cancel_requested = models.BooleanField(default=False, verbose_name="Cancelación solicitada")
     
     # Usuario responsable
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Creado por")
@@ -94,6 +101,7 @@ class PredictionSession(models.Model):
     ]
     
     model = models.ForeignKey(AIModel, on_delete=models.CASCADE, verbose_name="Modelo")
+    model_version = models.CharField(max_length=20, blank=True, verbose_name="Versión del modelo")
     session_type = models.CharField(max_length=50, choices=SESSION_TYPES, verbose_name="Tipo de sesión")
     
     # Configuración de la sesión
@@ -124,6 +132,10 @@ class PredictionSession(models.Model):
         verbose_name="Confianza promedio"
     )
     
+    # Acumulados para mantener los agregados de forma incremental
+    confidence_sum = models.FloatField(default=0, verbose_name="Suma de confianzas")
+    confidence_sum_squares = models.FloatField(default=0, verbose_name="Suma de cuadrados de confianzas")
+    
     # Estado de la sesión
     status = models.CharField(
         max_length=20,
@@ -152,6 +164,21 @@ class PredictionSession(models.Model):
     
     def __str__(self):
         return f"{self.session_type} - {self.model.name} ({self.created_at.date()})"
+    
+    def save(self, *args, **kwargs):
+        # La versión queda fijada al crear la sesión para evaluar cada artefacto por separado
+        if not self.model_version:
+            self.model_version = self.model.version
+        super().save(*args, **kwargs)
+    
+    @property
+    def confidence_std(self):
+        """Desviación típica de la confianza a partir de los acumulados"""
+        if not self.total_predictions:
+            return None
+        mean = self.confidence_sum / self.total_predictions
+        variance = self.confidence_sum_squares / self.total_predictions - mean ** 2
+        return max(variance, 0.0) ** 0.5
 
 
 class FloweringPrediction(models.Model):
@@ -163,6 +190,9 @@ class FloweringPrediction(models.Model):
         ('anomaly', 'Detección de anomalía'),
     ]
     
+    # Tipos que se contrastan con la floración observada; las anomalías no predicen floración
+    VALIDATED_PREDICTION_TYPES = ('detection', 'forecast')
+    
     session = models.ForeignKey(
         PredictionSession, 
         on_delete=models.CASCADE, 
@@ -226,6 +256,13 @@ class FloweringPrediction(models.Model):
         verbose_name = "Predicción de floración"
         verbose_name_plural = "Predicciones de floración"
         ordering = ['-prediction_date', '-confidence_score']
+        indexes = [
+            models.Index(
+                fields=['target_date'],
+                condition=models.Q(actual_result__isnull=True),
+                name='prediction_pending_idx'
+            ),
+        ]
     
     def __str__(self):
         plant_name = self.plant_monitor.name if self.plant_monitor else "General"
@@ -242,6 +279,7 @@ class ModelPerformanceMetric(models.Model):
         ('f1_score', 'F1 Score'),
         ('mse', 'Error Cuadrático Medio'),
         ('mae', 'Error Absoluto Medio'),
+        ('mcc', 'Coeficiente de Matthews'),
         ('confusion_matrix', 'Matriz de Confusión'),
     ]
     
@@ -330,3 +368,112 @@ class TrainingDataset(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.total_samples} muestras)"
+
+
+class FeatureVector(models.Model):
+    """Vector de características materializado por (ubicación, fecha)"""
+    
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, verbose_name="Ubicación")
+    date = models.DateField(verbose_name="Fecha")
+    schema_version = models.PositiveSmallIntegerField(verbose_name="Versión del esquema")
+    
+    # Índices satelitales (media móvil)
+    ndvi_mean = models.FloatField(null=True, blank=True, verbose_name="NDVI medio")
+    evi_mean = models.FloatField(null=True, blank=True, verbose_name="EVI medio")
+    
+    # Agregados meteorológicos
+    temperature_avg_mean = models.FloatField(null=True, blank=True, verbose_name="Temp. promedio media (°C)")
+    temperature_min_mean = models.FloatField(null=True, blank=True, verbose_name="Temp. mínima media (°C)")
+    temperature_max_mean = models.FloatField(null=True, blank=True, verbose_name="Temp. máxima media (°C)")
+    humidity_mean = models.FloatField(null=True, blank=True, verbose_name="Humedad media (%)")
+    precipitation_sum = models.FloatField(null=True, blank=True, verbose_name="Precipitación acumulada (mm)")
+    growing_degree_days = models.FloatField(null=True, blank=True, verbose_name="Grados-día de crecimiento")
+    
+    # Estacionalidad y posición
+    doy_sin = models.FloatField(null=True, blank=True, verbose_name="Día del año (seno)")
+    doy_cos = models.FloatField(null=True, blank=True, verbose_name="Día del año (coseno)")
+    latitude = models.FloatField(null=True, blank=True, verbose_name="Latitud")
+    
+    # Estado de la materialización
+    stale = models.BooleanField(
+        default=False,
+        help_text="Las fuentes cambiaron desde el último cálculo",
+        verbose_name="Desactualizado"
+    )
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="Calculado en")
+    
+    class Meta:
+        verbose_name = "Vector de características"
+        verbose_name_plural = "Vectores de características"
+        ordering = ['location', 'date']
+        unique_together = ['location', 'date', 'schema_version']
+        indexes = [
+            models.Index(
+                fields=['schema_version'],
+                condition=models.Q(stale=True),
+                name='featurevector_stale_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.location.name} - {self.date} (v{self.schema_version})"
+
+
+class ValidationRun(models.Model):
+    """Ejecuciones de la validación automática de predicciones"""
+    
+    run_at = models.DateTimeField(auto_now_add=True, verbose_name="Ejecutada en")
+    
+    # Inicio de la ejecución: la siguiente revisa lo creado o modificado después
+    watermark = models.DateTimeField(null=True, blank=True, verbose_name="Marca de agua")
+    
+    # Fechas objetivo recién vencidas en esta ejecución (since, until]
+    since_date = models.DateField(null=True, blank=True, verbose_name="Desde (exclusivo)")
+    until_date = models.DateField(verbose_name="Hasta (inclusivo)")
+    
+    # Parámetros del emparejamiento
+    radius_m = models.FloatField(verbose_name="Radio (m)")
+    window_days = models.PositiveSmallIntegerField(verbose_name="Ventana (días)")
+    
+    # Resultados
+    validated_count = models.PositiveIntegerField(default=0, verbose_name="Predicciones validadas")
+    positive_count = models.PositiveIntegerField(default=0, verbose_name="Validadas con floración")
+    
+    class Meta:
+        verbose_name = "Ejecución de validación"
+        verbose_name_plural = "Ejecuciones de validación"
+        ordering = ['-run_at']
+    
+    def __str__(self):
+        return f"Validación {self.run_at:%Y-%m-%d %H:%M} ({self.validated_count})"
+
+
+class AnomalyBaseline(models.Model):
+    """Línea base estacional de un índice satelital por ubicación"""
+    
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, verbose_name="Ubicación")
+    data_type = models.CharField(max_length=50, verbose_name="Tipo de datos")
+    period = models.PositiveSmallIntegerField(
+        help_text="Periodo de 16 días del año (0-22)",
+        verbose_name="Periodo"
+    )
+    
+    # Estadísticos acumulados (Welford): recuento, media y suma de cuadrados de desviaciones
+    count = models.PositiveIntegerField(default=0, verbose_name="Observaciones")
+    mean = models.FloatField(default=0, verbose_name="Media")
+    m2 = models.FloatField(default=0, verbose_name="Suma de cuadrados de desviaciones")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Línea base de anomalías"
+        verbose_name_plural = "Líneas base de anomalías"
+        ordering = ['location', 'data_type', 'period']
+        unique_together = ['location', 'data_type', 'period']
+    
+    def __str__(self):
+        return f"{self.location.name} - {self.data_type} P{self.period} (n={self.count})"
+    
+    @property
+    def std(self):
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else None
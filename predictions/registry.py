@@ -0,0 +1,178 @@
+"""
+Registro de artefactos de modelos de IA
+Carga cada modelo una sola vez por proceso y lo mantiene en una caché LRU acotada
+"""
+
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+from django.conf import settings
+
+from .models import AIModel
+
+logger = logging.getLogger(__name__)
+
+
+# Formatos serializados con joblib; admiten mmap si se guardaron sin compresión
+JOBLIB_EXTENSIONS = ('.joblib', '.pkl', '.pickle')
+
+
+def resolve_model_path(ai_model):
+    """Ruta absoluta del artefacto (relativa a AI_MODELS_PATH si no es absoluta)"""
+    if not ai_model.model_file_path:
+        raise ValueError(f'El modelo {ai_model.name} no tiene archivo asociado')
+    path = Path(ai_model.model_file_path)
+    if not path.is_absolute():
+        path = Path(settings.AI_MODELS_PATH) / path
+    return path
+
+
+def load_artifact(path):
+    """
+    Deserializar un artefacto de modelo.
+
+    Los arrays grandes de los volcados joblib sin comprimir se mapean en
+    memoria (mmap_mode='r'), de modo que varios procesos comparten las
+    páginas del sistema operativo en lugar de copiar el bosque completo.
+    """
+
+    import joblib
+
+    if path.suffix not in JOBLIB_EXTENSIONS:
+        raise ValueError(f'Formato de modelo no soportado: {path.suffix}')
+    return joblib.load(path, mmap_mode='r')
+
+
+class ModelRegistry:
+    """
+    Caché LRU de estimadores indexada por (id de modelo, archivo del artefacto).
+
+    Cada entrenamiento escribe un archivo nuevo, así que un worker que lee
+    el AIModel de la base de datos detecta el cambio aunque la señal
+    post_save se haya emitido en otro proceso.
+    """
+
+    def __init__(self, max_items=None, max_bytes=None):
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._load_locks = {}
+
+    @property
+    def max_items(self):
+        return self._max_items or settings.AI_MODEL_CACHE_MAX_ITEMS
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes or settings.AI_MODEL_CACHE_MAX_MB * 1024 * 1024
+
+    @staticmethod
+    def key_for(ai_model):
+        return (ai_model.pk, ai_model.model_file_path)
+
+    def get(self, ai_model):
+        """Estimador del modelo, cargándolo solo si no está en caché"""
+
+        key = self.key_for(ai_model)
+        path = resolve_model_path(ai_model)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry['estimator']
+            load_lock = self._load_locks.setdefault(key, Lock())
+
+        # Un solo hilo carga cada artefacto; el resto espera y reutiliza
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    return entry['estimator']
+
+            estimator = load_artifact(path)
+            size = path.stat().st_size
+            logger.info('Modelo %s v%s cargado desde %s (%.1f MB)',
+                        ai_model.name, ai_model.version, path, size / 1024 / 1024)
+
+            with self._lock:
+                self._evict_model(ai_model.pk)
+                self._entries[key] = {'estimator': estimator, 'version': ai_model.version, 'size': size}
+                self._shrink()
+                self._load_locks.pop(key, None)
+        return estimator
+
+    def _evict_model(self, model_id):
+        for key in [key for key in self._entries if key[0] == model_id]:
+            del self._entries[key]
+
+    def _shrink(self):
+        total = sum(entry['size'] for entry in self._entries.values())
+        while self._entries and (len(self._entries) > self.max_items or total > self.max_bytes):
+            if len(self._entries) == 1:
+                # Conservar siempre el último modelo aunque supere el límite
+                break
+            _, entry = self._entries.popitem(last=False)
+            total -= entry['size']
+
+    def invalidate(self, model_id):
+        """Descartar todas las versiones en caché de un modelo"""
+        with self._lock:
+            self._evict_model(model_id)
+
+    def invalidate_if_changed(self, ai_model):
+        """Descartar el modelo si ya no está activo o cambió de artefacto"""
+        with self._lock:
+            stale = ai_model.status != 'active' or any(
+                key[0] == ai_model.pk and key != self.key_for(ai_model) for key in self._entries
+            )
+            if stale:
+                self._evict_model(ai_model.pk)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def preload_active(self):
+        """Cargar los modelos activos al arrancar el proceso"""
+        loaded = 0
+        for ai_model in AIModel.objects.filter(status='active').exclude(model_file_path=''):
+            try:
+                self.get(ai_model)
+                loaded += 1
+            except (OSError, ValueError) as e:
+                logger.warning('No se pudo precargar el modelo %s: %s', ai_model.name, e)
+        return loaded
+
+    def is_loaded(self, model_id, file_path):
+        with self._lock:
+            return (model_id, file_path) in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': [
+                    {'model_id': key[0], 'version': entry['version'], 'file': key[1], 'size_mb': round(entry['size'] / 1024 / 1024, 1)}
+                    for key, entry in self._entries.items()
+                ],
+                'total_mb': round(sum(entry['size'] for entry in self._entries.values()) / 1024 / 1024, 1),
+            }
+
+
+model_registry = ModelRegistry()
+
+
+def preload_models():
+    """Precarga de modelos activos al arrancar un worker (wsgi/asgi)"""
+    if not settings.AI_MODEL_PRELOAD:
+        return
+    try:
+        count = model_registry.preload_active()
+        logger.info('%d modelos activos precargados', count)
+    except Exception as e:
+        # La base de datos puede no estar disponible durante el arranque
+        logger.warning('Precarga de modelos omitida: %s', e)
@@ -21,10 +21,15 @@ class PredictionSessionSerializer(serializers.ModelSerializer):
     
     model_name = serializers.CharField(source='model.name', read_only=True)
     executed_by_username = serializers.CharField(source='executed_by.username', read_only=True)
+    confidence_std = serializers.FloatField(read_only=True)
     
     class Meta:
         model = PredictionSession
         fields = '__all__'
+        read_only_fields = [
+            'total_predictions', 'successful_predictions', 'average_confidence',
+            'confidence_sum', 'confidence_sum_squares', 'model_version'
+        ]
 
 
 class FloweringPredictionSerializer(serializers.ModelSerializer):
@@ -0,0 +1,49 @@
+"""
+Señales de la aplicación Predictions
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from plants.statistics import invalidate_statistics
+from satellite_data.models import SatelliteDataCollection, SatelliteDataPoint, WeatherData
+from .feature_store import mark_stale
+from .models import AIModel
+from .registry import model_registry
+
+
+@receiver(post_save, sender=AIModel)
+def refresh_model_registry(sender, instance, **kwargs):
+    """Descartar el artefacto en caché si el modelo cambió de estado o versión"""
+    model_registry.invalidate_if_changed(instance)
+
+
+@receiver(post_delete, sender=AIModel)
+def evict_deleted_model(sender, instance, **kwargs):
+    model_registry.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=AIModel)
+@receiver(post_delete, sender=AIModel)
+def invalidate_cached_statistics(sender, **kwargs):
+    """Los modelos de IA entran en los recuentos de la página de inicio"""
+    invalidate_statistics()
+
+
+@receiver(post_save, sender=WeatherData)
+@receiver(post_delete, sender=WeatherData)
+def invalidate_weather_features(sender, instance, **kwargs):
+    """Marcar como desactualizados los vectores que usan este día de clima"""
+    mark_stale([instance.location_id], instance.date)
+
+
+@receiver(post_save, sender=SatelliteDataPoint)
+@receiver(post_delete, sender=SatelliteDataPoint)
+def invalidate_satellite_features(sender, instance, **kwargs):
+    """Marcar como desactualizados los vectores que usan este punto NDVI/EVI"""
+    location_id = SatelliteDataCollection.objects.filter(
+        pk=instance.collection_id, data_type__in=('ndvi', 'evi')
+    ).values_list('location_id', flat=True).first()
+    if location_id is not None:
+        mark_stale([location_id], timezone.localtime(instance.timestamp).date())
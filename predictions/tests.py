@@ -1,3 +1,427 @@
-from django.test import TestCase
+"""
+Tests de la aplicación Predictions
+"""
 
-# Create your tests here.
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from plants.models import FloweringEvent, Location, PlantMonitor, PlantSpecies
+from satellite_data.models import SatelliteDataCollection, SatelliteDataPoint, SatelliteDataSource
+from .anomalies import _batch_statistics, score_points
+from .datasets import NPY_FEATURES_FILE, NPY_LABELS_FILE, column_means, impute_to_memmap, take_to_memmap
+from .evaluation import compute_metrics, evaluate_model
+from .inference import run_batch_prediction
+from .models import (
+    AIModel, AnomalyBaseline, FloweringPrediction, ModelPerformanceMetric, PredictionSession, TrainingDataset, ValidationRun
+)
+from .registry import ModelRegistry
+from .training import artifact_file_name, load_dataset_split, save_artifact, training_outcomes
+from .validation import auto_validate
+from .views import _parse_date
+
+
+def _aware(year, month, day, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+class PredictionFixtures:
+    """Datos mínimos compartidos por los tests con base de datos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tester')
+        cls.species = PlantSpecies.objects.create(
+            name='Almendro', scientific_name='Prunus dulcis', plant_type='tree',
+            typical_flowering_months='Febrero-Marzo'
+        )
+        cls.location = Location.objects.create(
+            name='Parcela', coordinates=Point(-3.7, 40.4, srid=4326), country='España'
+        )
+        cls.monitor = PlantMonitor.objects.create(
+            species=cls.species, location=cls.location, identifier='ALM_001', name='Almendro 1',
+            monitoring_start_date=date(2024, 1, 1), created_by=cls.user
+        )
+        cls.ai_model = AIModel.objects.create(
+            name='rf', model_type='random_forest', version='1.0', description='', status='active',
+            created_by=cls.user
+        )
+        cls.session = PredictionSession.objects.create(
+            model=cls.ai_model, session_type='flowering_prediction', start_date=date(2024, 1, 1),
+            end_date=date(2024, 12, 31), executed_by=cls.user
+        )
+
+    @classmethod
+    def event(cls, when, stage, method='visual', confidence=0.8, **extra):
+        return FloweringEvent.objects.create(
+            plant_monitor=cls.monitor, detection_date=when, flowering_stage=stage,
+            detection_method=method, confidence_score=confidence, **extra
+        )
+
+    @classmethod
+    def prediction(cls, target_date, probability=0.9, actual_result=None, prediction_type='forecast', **extra):
+        return FloweringPrediction.objects.create(
+            session=cls.session, location=cls.location, prediction_type=prediction_type,
+            prediction_date=target_date, target_date=target_date,
+            flowering_probability=probability, confidence_score=probability,
+            actual_result=actual_result, **extra
+        )
+
+
+class ParseDateTests(SimpleTestCase):
+
+    def test_valid_date(self):
+        self.assertEqual(_parse_date('2024-02-29'), date(2024, 2, 29))
+
+    def test_missing_malformed_and_impossible_dates(self):
+        for value in (None, '', 'mañana', '2024-02-30', '2023-13-01'):
+            with self.subTest(value=value):
+                self.assertIsNone(_parse_date(value))
+
+
+class ConstantEstimator:
+    """Estimador mínimo: la misma probabilidad para cada fila"""
+
+    classes_ = [0, 1]
+
+    def predict_proba(self, X):
+        return np.tile([0.3, 0.7], (len(X), 1))
+
+
+class BatchPredictionTests(PredictionFixtures, TestCase):
+
+    @mock.patch('predictions.inference.BULK_BATCH_SIZE', 3)
+    def test_inserts_in_bounded_chunks(self):
+        with mock.patch.object(
+            FloweringPrediction.objects, 'bulk_create', wraps=FloweringPrediction.objects.bulk_create
+        ) as bulk_create:
+            session = run_batch_prediction(
+                self.ai_model, date(2024, 3, 1), date(2024, 3, 7), self.user,
+                location_ids=[self.location.pk], estimator=ConstantEstimator()
+            )
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [3, 3, 1])
+        predictions = FloweringPrediction.objects.filter(session=session)
+        self.assertEqual(predictions.count(), 7)
+        self.assertEqual(set(predictions.values_list('flowering_probability', flat=True)), {0.7})
+
+
+class ArtifactFileNameTests(SimpleTestCase):
+
+    def test_user_editable_fields_do_not_reach_the_path(self):
+        ai_model = AIModel(pk=7, name='../../etc/passwd', version='../1.0')
+        file_name = artifact_file_name(ai_model)
+        self.assertRegex(file_name, r'^model_7_v10_[0-9a-f]{12}\.joblib$')
+        self.assertNotIn('/', file_name)
+
+    def test_every_fit_gets_its_own_file(self):
+        ai_model = AIModel(pk=7, version='1.0')
+        self.assertNotEqual(artifact_file_name(ai_model), artifact_file_name(ai_model))
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name)
+
+    def test_new_artifact_is_loaded_without_a_signal(self):
+        save_artifact({'trees': np.zeros(4)}, self.path, 'model_7_v1_a.joblib')
+        save_artifact({'trees': np.ones(4)}, self.path, 'model_7_v1_b.joblib')
+        registry = ModelRegistry()
+        ai_model = AIModel(pk=7, name='rf', version='1', status='active', model_file_path='model_7_v1_a.joblib')
+
+        with override_settings(AI_MODELS_PATH=self.directory.name):
+            self.assertEqual(registry.get(ai_model)['trees'].sum(), 0)
+            # Reentrenado en otro proceso: misma versión, otro archivo
+            ai_model.model_file_path = 'model_7_v1_b.joblib'
+            self.assertEqual(registry.get(ai_model)['trees'].sum(), 4)
+
+        self.assertFalse(registry.is_loaded(7, 'model_7_v1_a.joblib'))
+        self.assertTrue(registry.is_loaded(7, 'model_7_v1_b.joblib'))
+        self.assertEqual(sorted(p.name for p in self.path.iterdir()), ['model_7_v1_a.joblib', 'model_7_v1_b.joblib'])
+
+
+class TrainingOutcomesTests(PredictionFixtures, TestCase):
+
+    def test_labels_come_from_observations_not_model_output(self):
+        self.event(_aware(2024, 3, 1), 'peak')
+        self.event(_aware(2024, 3, 1), 'bud')
+        self.event(_aware(2024, 3, 5), 'end')
+        # Las detecciones del propio modelo no son etiquetas
+        self.event(_aware(2024, 3, 9), 'peak', method='ai_model')
+        # Resultado real de una predicción validada: solo cuenta si no hay observación ese día
+        self.prediction(date(2024, 3, 5), actual_result=True)
+        self.prediction(date(2024, 3, 7), actual_result=False)
+        # Sin validar: no es una etiqueta
+        self.prediction(date(2024, 3, 8))
+
+        outcomes = training_outcomes()
+        self.assertEqual(outcomes, {
+            (self.location.pk, date(2024, 3, 1)): True,
+            (self.location.pk, date(2024, 3, 5)): False,
+            (self.location.pk, date(2024, 3, 7)): False,
+        })
+
+
+class ComputeMetricsTests(SimpleTestCase):
+    # 0=TN 1=FP 2=FN 3=TP -> tn=1, fp=1, fn=1, tp=2
+    PROBABILITIES = [0.9, 0.8, 0.2, 0.6, 0.1]
+    ACTUAL = [True, True, True, False, False]
+
+    def test_overall_metrics_against_hand_computed_values(self):
+        overall, confusion, _ = compute_metrics(self.PROBABILITIES, self.ACTUAL)
+        self.assertEqual(confusion, {'tn': 1, 'fp': 1, 'fn': 1, 'tp': 2})
+        self.assertAlmostEqual(overall['accuracy'], 3 / 5)
+        self.assertAlmostEqual(overall['precision'], 2 / 3)
+        self.assertAlmostEqual(overall['recall'], 2 / 3)
+        self.assertAlmostEqual(overall['f1_score'], 2 / 3)
+        self.assertAlmostEqual(overall['mse'], (0.01 + 0.04 + 0.64 + 0.36 + 0.01) / 5)
+        self.assertAlmostEqual(overall['mae'], (0.1 + 0.2 + 0.8 + 0.6 + 0.1) / 5)
+        self.assertAlmostEqual(overall['mcc'], (2 * 1 - 1 * 1) / 6)
+        self.assertNotIn('confusion_matrix', overall)
+
+    def test_breakdowns_carry_their_own_matrix(self):
+        _, _, breakdowns = compute_metrics(
+            self.PROBABILITIES, self.ACTUAL, groups={'by_region': ['a', 'a', 'b', 'b', 'b']}
+        )
+        region_a, region_b = breakdowns['by_region']['a'], breakdowns['by_region']['b']
+        self.assertEqual(region_a['confusion_matrix'], [[0, 0], [0, 2]])
+        self.assertEqual(region_b['confusion_matrix'], [[1, 1], [1, 0]])
+        self.assertEqual((region_a['size'], region_b['size']), (2, 3))
+        self.assertEqual(region_a['accuracy'], 1.0)
+
+    def test_threshold_moves_the_decision(self):
+        overall, confusion, _ = compute_metrics(self.PROBABILITIES, self.ACTUAL, threshold=0.85)
+        self.assertEqual(confusion, {'tn': 2, 'fp': 0, 'fn': 2, 'tp': 1})
+        self.assertAlmostEqual(overall['precision'], 1.0)
+
+
+class EvaluateModelTests(PredictionFixtures, TestCase):
+
+    def test_only_predictions_of_the_requested_version_are_pooled(self):
+        self.prediction(date(2024, 3, 1), probability=0.9, actual_result=True)
+        AIModel.objects.filter(pk=self.ai_model.pk).update(version='2.0')
+        self.ai_model.refresh_from_db()
+        new_session = PredictionSession.objects.create(
+            model=self.ai_model, session_type='flowering_prediction', start_date=date(2024, 1, 1),
+            end_date=date(2024, 12, 31), executed_by=self.user
+        )
+        self.assertEqual(new_session.model_version, '2.0')
+        FloweringPrediction.objects.create(
+            session=new_session, location=self.location, prediction_type='forecast',
+            prediction_date=date(2024, 3, 2), target_date=date(2024, 3, 2),
+            flowering_probability=0.9, confidence_score=0.9, actual_result=False
+        )
+
+        current = evaluate_model(self.ai_model)
+        self.assertEqual((current['version'], current['dataset_size']), ('2.0', 1))
+        self.assertEqual(current['confusion_matrix'], {'tn': 0, 'fp': 1, 'fn': 0, 'tp': 0})
+        previous = evaluate_model(self.ai_model, version='1.0')
+        self.assertEqual(previous['confusion_matrix'], {'tn': 0, 'fp': 0, 'fn': 0, 'tp': 1})
+
+    def test_confusion_matrix_row_stores_the_matrix(self):
+        self.prediction(date(2024, 3, 1), probability=0.9, actual_result=True)
+        self.prediction(date(2024, 3, 2), probability=0.2, actual_result=True)
+        evaluate_model(self.ai_model)
+        row = ModelPerformanceMetric.objects.get(model=self.ai_model, metric_type='confusion_matrix')
+        self.assertEqual(row.details['matrix'], [[0, 0], [1, 1]])
+        self.assertEqual(row.value, 2)
+        self.assertTrue(ModelPerformanceMetric.objects.filter(model=self.ai_model, metric_type='mcc').exists())
+
+    def test_evaluation_keeps_the_prediction_cache_key(self):
+        self.prediction(date(2024, 3, 1), probability=0.9, actual_result=True)
+        updated_at = AIModel.objects.get(pk=self.ai_model.pk).updated_at
+        evaluate_model(self.ai_model)
+        ai_model = AIModel.objects.get(pk=self.ai_model.pk)
+        self.assertEqual((ai_model.accuracy, ai_model.updated_at), (1.0, updated_at))
+
+    def test_anomaly_rows_are_left_out(self):
+        self.prediction(date(2024, 3, 1), probability=0.9, actual_result=True)
+        self.prediction(date(2024, 3, 2), probability=0.9, actual_result=False, prediction_type='anomaly')
+        result = evaluate_model(self.ai_model)
+        self.assertEqual(result['dataset_size'], 1)
+        self.assertEqual(result['confusion_matrix'], {'tn': 0, 'fp': 0, 'fn': 0, 'tp': 1})
+
+
+class AutoValidateTests(PredictionFixtures, TestCase):
+
+    def test_days_are_local_not_utc(self):
+        # 00:30 en Madrid es aún el día anterior en UTC
+        prediction = self.prediction(date(2024, 3, 10), actual_result=None)
+        self.event(_aware(2024, 3, 11, hour=0) + timedelta(minutes=30), 'peak')
+        auto_validate(window_days=0)
+        prediction.refresh_from_db()
+        self.assertIsNone(prediction.actual_result)
+
+        self.event(_aware(2024, 3, 10, hour=0) + timedelta(minutes=30), 'peak')
+        auto_validate(window_days=0)
+        prediction.refresh_from_db()
+        self.assertTrue(prediction.actual_result)
+
+    def test_late_observation_validates_an_already_checked_target_date(self):
+        prediction = self.prediction(date(2024, 3, 10), actual_result=None)
+        first = auto_validate(window_days=1)
+        self.assertEqual(first.validated_count, 0)
+        self.assertIsNotNone(first.watermark)
+
+        self.event(_aware(2024, 3, 11), 'early')
+        second = auto_validate(window_days=1)
+        self.assertEqual(second.validated_count, 1)
+        prediction.refresh_from_db()
+        self.assertTrue(prediction.actual_result)
+
+    def test_late_prediction_is_picked_up(self):
+        self.event(_aware(2024, 3, 10), 'bud')
+        auto_validate(window_days=1)
+        late = self.prediction(date(2024, 3, 10), actual_result=None)
+        auto_validate(window_days=1)
+        late.refresh_from_db()
+        self.assertIs(late.actual_result, False)
+        self.assertEqual(ValidationRun.objects.count(), 2)
+
+    def test_anomalies_are_not_validated_against_flowering(self):
+        self.event(_aware(2024, 3, 10), 'peak')
+        anomaly = self.prediction(date(2024, 3, 10), prediction_type='anomaly')
+        self.assertEqual(auto_validate(window_days=1).validated_count, 0)
+        anomaly.refresh_from_db()
+        self.assertIsNone(anomaly.actual_result)
+
+
+class DatasetSplitTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        path = Path(self.directory.name)
+        # Archivo ordenado: las primeras filas son todas negativas
+        self.X = np.arange(100, dtype=np.float32).reshape(50, 2)
+        self.X[::7, 1] = np.nan
+        np.save(path / NPY_FEATURES_FILE, self.X)
+        np.save(path / NPY_LABELS_FILE, (np.arange(50) >= 40).astype(np.float32))
+        self.path = str(path)
+
+    def test_chunked_imputation_matches_in_memory_means(self):
+        means = column_means(self.X, batch_rows=7)
+        np.testing.assert_allclose(means, np.nanmean(self.X, axis=0))
+        imputed = impute_to_memmap(self.X, means, batch_rows=7)
+        self.assertIsInstance(imputed, np.memmap)
+        self.assertFalse(np.isnan(imputed).any())
+        np.testing.assert_allclose(imputed[7, 1], means[1], rtol=1e-6)
+        np.testing.assert_array_equal(imputed[1], self.X[1])
+
+    def test_unshuffled_dataset_uses_a_permuted_split(self):
+        dataset = TrainingDataset(name='ordenado', file_path=self.path, metadata={})
+        X_train, X_test, y_train, y_test = load_dataset_split(dataset, test_size=0.2)
+        self.assertEqual((len(y_train), len(y_test)), (40, 10))
+        # La prueba no es el bloque final (todo positivos) y no se repiten filas
+        self.assertLess(y_test.sum(), 10)
+        rows = np.concatenate([X_train[:, 0], X_test[:, 0]])
+        self.assertEqual(len(np.unique(rows)), 50)
+        # Copiadas a disco, no a RAM
+        self.assertIsInstance(X_train, np.memmap)
+        self.assertIsInstance(y_test, np.memmap)
+
+    def test_take_to_memmap_matches_fancy_indexing(self):
+        indices = np.array([1, 4, 5, 9, 20, 33, 49])
+        taken = take_to_memmap(self.X, indices, batch_rows=3)
+        np.testing.assert_array_equal(taken, self.X[indices])
+
+    def test_shuffled_dataset_keeps_contiguous_views(self):
+        dataset = TrainingDataset(name='barajado', file_path=self.path, metadata={'shuffled': True})
+        X_train, X_test, _, _ = load_dataset_split(dataset, test_size=0.2)
+        self.assertIsInstance(X_train, np.memmap)
+        self.assertEqual(X_test[0, 0], self.X[40, 0])
+
+
+class BatchStatisticsTests(SimpleTestCase):
+
+    def test_per_group_welford_statistics(self):
+        values = np.array([1.0, 2.0, 4.0, 10.0, 20.0, 99.0])
+        group_index = np.array([0, 0, 0, 1, 1, 1])
+        include = np.array([True, True, True, True, True, False])
+        count, mean, m2 = _batch_statistics(group_index, 3, values, include)
+        np.testing.assert_array_equal(count, [3, 2, 0])
+        np.testing.assert_allclose(mean, [7 / 3, 15.0, 0.0])
+        np.testing.assert_allclose(m2, [np.var([1, 2, 4]) * 3, np.var([10, 20]) * 2, 0.0])
+
+
+@override_settings(ANOMALY_MIN_BASELINE=3, ANOMALY_Z_THRESHOLD=3.0)
+class ScorePointsTests(PredictionFixtures, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        source = SatelliteDataSource.objects.create(
+            name='MODIS', description='', api_endpoint='https://example.org'
+        )
+        cls.collection = SatelliteDataCollection.objects.create(
+            location=cls.location, data_source=source, data_type='ndvi',
+            collection_date=date(2024, 3, 1), start_date=date(2024, 3, 1), end_date=date(2024, 3, 31)
+        )
+
+    def points(self, values, first_day=5):
+        # 5-20 de marzo: todos en el mismo periodo de 16 días
+        return [
+            SatelliteDataPoint.objects.create(
+                collection=self.collection, timestamp=_aware(2024, 3, first_day + offset), value=value
+            ).pk
+            for offset, value in enumerate(values)
+        ]
+
+    def baseline(self):
+        return AnomalyBaseline.objects.get(location=self.location, data_type='ndvi')
+
+    def test_batches_merge_into_the_same_statistics_as_one_pass(self):
+        first = [0.50, 0.52, 0.48]
+        second = [0.51, 0.49]
+        score_points(self.points(first))
+        score_points(self.points(second, first_day=12))
+        baseline = self.baseline()
+        everything = np.array(first + second)
+        self.assertEqual(baseline.count, 5)
+        self.assertAlmostEqual(baseline.mean, everything.mean())
+        self.assertAlmostEqual(baseline.m2, ((everything - everything.mean()) ** 2).sum())
+
+    def test_rescoring_the_same_points_does_not_double_count(self):
+        point_ids = self.points([0.50, 0.52, 0.48])
+        self.assertEqual(score_points(point_ids)['points'], 3)
+        self.assertIsNone(score_points(point_ids))
+        self.assertEqual(self.baseline().count, 3)
+
+    def test_missing_anomaly_model_keeps_baselines_and_leaves_anomalies_pending(self):
+        score_points(self.points([0.50, 0.52, 0.48, 0.51]))
+        normal, outlier = self.points([0.50, 5.0], first_day=12)
+        result = score_points([normal, outlier])
+        self.assertEqual(result['anomalies'], 1)
+        self.assertIn('error', result)
+        self.assertEqual(self.baseline().count, 5)
+        self.assertIsNone(SatelliteDataPoint.objects.get(pk=outlier).anomaly_scored_at)
+        self.assertIsNotNone(SatelliteDataPoint.objects.get(pk=normal).anomaly_scored_at)
+
+        AIModel.objects.create(
+            name='iforest', model_type='isolation_forest', version='1', description='', status='active',
+            created_by=self.user
+        )
+        result = score_points([outlier])
+        self.assertIsNotNone(result['session_id'])
+        self.assertEqual(FloweringPrediction.objects.filter(prediction_type='anomaly').count(), 1)
+
+    def test_bad_quality_points_are_marked_without_touching_baselines(self):
+        good = self.points([0.50, 0.52, 0.48])
+        bad = SatelliteDataPoint.objects.create(
+            collection=self.collection, timestamp=_aware(2024, 3, 9), value=9.0, quality_flag='bad'
+        )
+        score_points(good + [bad.pk])
+        bad.refresh_from_db()
+        self.assertIsNotNone(bad.anomaly_scored_at)
+        self.assertEqual(self.baseline().count, 3)
+        self.assertIsNone(score_points([bad.pk]))
@@ -0,0 +1,386 @@
+"""
+Entrenamiento de modelos en segundo plano
+Ejecuta los entrenamientos en un pool de procesos y publica el progreso en AIModel
+"""
+
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.text import slugify
+
+from plants.models import FloweringEvent
+from .datasets import column_means, impute_to_memmap, take_to_memmap, training_arrays
+from .feature_store import get_feature_matrix
+from .features import FEATURE_NAMES, impute_missing
+from .models import AIModel, FloweringPrediction, TrainingDataset
+from .validation import EXCLUDED_METHODS, FLOWERING_STAGES
+
+logger = logging.getLogger(__name__)
+
+
+# Tipos de modelo que sabe entrenar el pool (scikit-learn)
+TRAINABLE_MODEL_TYPES = ('random_forest', 'ensemble', 'isolation_forest')
+
+# Mínimo de muestras validadas para entrenar
+MIN_TRAINING_SAMPLES = 20
+
+# Clave del advisory lock de PostgreSQL que serializa el arranque de entrenamientos
+TRAINING_LOCK_ID = 4201
+
+# Árboles añadidos por paso en Random Forest (permite progreso y cancelación)
+FOREST_STEP_TREES = 25
+
+
+class TrainingCancelled(Exception):
+    """El entrenamiento se canceló a petición del usuario"""
+
+
+class TrainingLimitReached(Exception):
+    """Se alcanzó el máximo de entrenamientos simultáneos"""
+
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _init_worker():
+    """Inicializar Django en cada proceso hijo (contexto spawn)"""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'florawatch.settings')
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.AI_TRAINING_MAX_CONCURRENT,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def artifact_file_name(ai_model):
+    """
+    Nombre del artefacto derivado de la pk; name y version son editables y no entran en la ruta.
+
+    Cada ajuste recibe un sufijo único: reescribir el archivo en su sitio
+    rompería los mapeos mmap de los workers que aún sirven el anterior.
+    """
+    return f"model_{ai_model.pk}_v{slugify(ai_model.version) or '0'}_{uuid.uuid4().hex[:12]}.joblib"
+
+
+def save_artifact(estimator, models_path, file_name):
+    """Volcar el estimador a un temporal y publicarlo con os.replace (nunca queda a medias)"""
+
+    import joblib
+
+    temporary = models_path / f'.{file_name}.tmp'
+    try:
+        # Sin compresión para poder mapear los arrays en memoria al cargar
+        joblib.dump(estimator, temporary)
+        os.replace(temporary, models_path / file_name)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def _mark_failed(model_id, message):
+    AIModel.objects.filter(pk=model_id, status='training').update(
+        status='error',
+        training_end_date=timezone.now(),
+        training_message=message[:255],
+        updated_at=timezone.now()
+    )
+
+
+def _training_finished(model_id, future):
+    """
+    Callback en el proceso web: si el proceso hijo murió antes de publicar
+    su estado (error al inicializar Django, pool roto...), no dejar el
+    modelo en 'training'.
+    """
+    try:
+        error = future.exception()
+    except Exception as e:  # CancelledError
+        error = e
+    if error is not None:
+        logger.error('El entrenamiento del modelo %s terminó con error: %s', model_id, error)
+        try:
+            _mark_failed(model_id, f'Error: {error}')
+        finally:
+            # Los callbacks se ejecutan en un hilo del pool con su propia conexión
+            connection.close()
+
+
+def running_trainings():
+    """Entrenamientos en curso con progreso reciente (en cualquier proceso)"""
+    recent = timezone.now() - timedelta(minutes=settings.AI_TRAINING_STALE_MINUTES)
+    return AIModel.objects.filter(
+        status='training',
+        training_start_date__isnull=False,
+        training_end_date__isnull=True,
+        updated_at__gte=recent
+    )
+
+
+def start_training(ai_model, dataset=None):
+    """
+    Encolar el entrenamiento de un modelo; no bloquea la petición.
+
+    Sin dataset se entrena con las predicciones validadas; con un
+    TrainingDataset se lee su archivo mapeado en memoria.
+    """
+
+    if ai_model.model_type not in TRAINABLE_MODEL_TYPES:
+        raise ValueError(f'Tipo de modelo no entrenable en segundo plano: {ai_model.model_type}')
+
+    with transaction.atomic():
+        # Serializar las comprobaciones de capacidad entre procesos y workers
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [TRAINING_LOCK_ID])
+        running = running_trainings()
+        if running.filter(pk=ai_model.pk).exists():
+            raise ValueError('El modelo ya se está entrenando')
+        if running.count() >= settings.AI_TRAINING_MAX_CONCURRENT:
+            raise TrainingLimitReached(
+                f'Máximo de {settings.AI_TRAINING_MAX_CONCURRENT} entrenamientos simultáneos'
+            )
+        AIModel.objects.filter(pk=ai_model.pk).update(
+            status='training',
+            training_start_date=timezone.now(),
+            training_end_date=None,
+            training_progress=0,
+            training_message='En cola',
+            training_cancel_requested=False,
+            updated_at=timezone.now()
+        )
+
+    global _executor
+    try:
+        future = get_executor().submit(run_training, ai_model.pk, dataset.pk if dataset else None)
+    except Exception as e:
+        # Pool roto o cerrado: descartarlo para que el siguiente intento cree uno nuevo
+        with _executor_lock:
+            _executor = None
+        _mark_failed(ai_model.pk, f'Error al encolar: {e}')
+        raise ValueError(f'No se pudo encolar el entrenamiento: {e}')
+    future.add_done_callback(lambda done: _training_finished(ai_model.pk, done))
+
+
+def request_cancel(ai_model):
+    """Solicitar la cancelación; el proceso la detecta en el siguiente paso"""
+    return running_trainings().filter(pk=ai_model.pk).update(
+        training_cancel_requested=True,
+        training_message='Cancelación solicitada',
+        updated_at=timezone.now()
+    )
+
+
+def _report(model_id, progress, message):
+    """Publicar progreso y comprobar cancelación (dos consultas de una fila)"""
+    AIModel.objects.filter(pk=model_id).update(
+        training_progress=progress,
+        training_message=message,
+        updated_at=timezone.now()
+    )
+    if AIModel.objects.filter(pk=model_id, training_cancel_requested=True).exists():
+        raise TrainingCancelled()
+
+
+def training_outcomes():
+    """
+    Etiquetas {(ubicación, día): floración} para entrenar.
+
+    La fuente principal son las observaciones de floración (sin las
+    detecciones del propio modelo); las predicciones validadas solo aportan
+    su resultado real en los días sin observación en la ubicación. Ningún
+    valor procede de lo que el modelo predijo.
+    """
+
+    outcomes = {}
+    events = FloweringEvent.objects.exclude(
+        detection_method__in=EXCLUDED_METHODS
+    ).annotate(
+        day=TruncDate('detection_date')
+    ).values_list('plant_monitor__location_id', 'day', 'flowering_stage').order_by()
+    for location_id, day, stage in events.iterator(chunk_size=5000):
+        key = (location_id, day)
+        outcomes[key] = outcomes.get(key, False) or stage in FLOWERING_STAGES
+
+    validated = FloweringPrediction.objects.filter(
+        prediction_type__in=FloweringPrediction.VALIDATED_PREDICTION_TYPES,
+        actual_result__isnull=False
+    ).values_list('location_id', 'target_date', 'actual_result').order_by()
+    for location_id, day, actual_result in validated.iterator(chunk_size=5000):
+        outcomes.setdefault((location_id, day), bool(actual_result))
+    return outcomes
+
+
+def load_training_data():
+    """
+    (X, y) con las características del almacén para cada etiqueta observada.
+
+    Los vectores se leen (o se calculan y guardan) por ubicación solo para
+    sus días etiquetados, sin usar input_features de predicciones previas.
+    """
+
+    dates_by_location = {}
+    for (location_id, day), label in training_outcomes().items():
+        dates_by_location.setdefault(location_id, {})[day] = label
+
+    blocks = []
+    labels = []
+    for location_id, labelled in dates_by_location.items():
+        keys, X = get_feature_matrix([location_id], labelled)
+        blocks.append(X)
+        labels.extend(int(labelled[day]) for _, day in keys)
+    X = np.vstack(blocks) if blocks else np.empty((0, len(FEATURE_NAMES)))
+    return impute_missing(X), np.array(labels, dtype=int)
+
+
+def load_dataset_split(dataset, test_size=0.2, random_state=42):
+    """
+    Partición entrenamiento/prueba de un TrainingDataset.
+
+    Si los metadatos declaran el archivo barajado ({"shuffled": true}) se
+    usan cortes contiguos del mapa de memoria, sin copiar. Si no, las filas
+    se reparten con una permutación aleatoria, ya que un archivo ordenado
+    por fecha o ubicación daría un conjunto de prueba sesgado; cada parte
+    se copia por bloques a un mapa de memoria temporal (índices ordenados
+    para leer el archivo secuencialmente). Los NaN se dejan para los
+    estimadores que los admiten.
+    """
+    X, y = training_arrays(dataset)
+    split = int(len(y) * (1 - test_size))
+    if (dataset.metadata or {}).get('shuffled'):
+        return X[:split], X[split:], y[:split], y[split:]
+    permutation = np.random.default_rng(random_state).permutation(len(y))
+    train_index, test_index = np.sort(permutation[:split]), np.sort(permutation[split:])
+    return (
+        take_to_memmap(X, train_index), take_to_memmap(X, test_index),
+        take_to_memmap(y, train_index), take_to_memmap(y, test_index),
+    )
+
+
+def _build_estimator(ai_model):
+    from sklearn.ensemble import HistGradientBoostingClassifier, IsolationForest, RandomForestClassifier
+
+    params = dict(ai_model.hyperparameters or {})
+    if ai_model.model_type == 'random_forest':
+        params.setdefault('n_estimators', 200)
+        params.setdefault('n_jobs', -1)
+        return RandomForestClassifier(**params)
+    if ai_model.model_type == 'ensemble':
+        return HistGradientBoostingClassifier(**params)
+    return IsolationForest(**params)
+
+
+def _fit(ai_model, estimator, X, y):
+    """Ajustar el estimador informando del progreso entre 20% y 80%"""
+    if ai_model.model_type == 'random_forest':
+        total = estimator.n_estimators
+        estimator.set_params(warm_start=True)
+        trees = 0
+        while trees < total:
+            trees = min(trees + FOREST_STEP_TREES, total)
+            estimator.set_params(n_estimators=trees)
+            estimator.fit(X, y)
+            _report(ai_model.pk, 20 + int(60 * trees / total), f'Entrenando ({trees}/{total} árboles)')
+        estimator.set_params(warm_start=False)
+    elif ai_model.model_type == 'isolation_forest':
+        estimator.fit(X)
+    else:
+        estimator.fit(X, y)
+    return estimator
+
+
+def run_training(model_id, dataset_id=None):
+    """Cuerpo del entrenamiento (se ejecuta en un proceso del pool)"""
+
+    from sklearn.model_selection import train_test_split
+
+    ai_model = AIModel.objects.get(pk=model_id)
+    try:
+        _report(model_id, 5, 'Cargando datos de entrenamiento')
+        if dataset_id:
+            X_train, X_test, y_train, y_test = load_dataset_split(TrainingDataset.objects.get(pk=dataset_id))
+            if ai_model.model_type == 'isolation_forest':
+                # IsolationForest no admite NaN: imputar por bloques con las medias de entrenamiento
+                means = column_means(X_train)
+                X_train = impute_to_memmap(X_train, means)
+                X_test = impute_to_memmap(X_test, means)
+            training_size = len(y_train) + len(y_test)
+        else:
+            X, y = load_training_data()
+            training_size = len(y)
+            if training_size >= MIN_TRAINING_SAMPLES:
+                stratify = y if len(np.unique(y)) > 1 else None
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X, y, test_size=0.2, random_state=42, stratify=stratify
+                )
+        if training_size < MIN_TRAINING_SAMPLES:
+            raise ValueError(f'Se necesitan al menos {MIN_TRAINING_SAMPLES} muestras de entrenamiento')
+        _report(model_id, 20, 'Entrenando')
+        estimator = _fit(ai_model, _build_estimator(ai_model), X_train, y_train)
+
+        _report(model_id, 85, 'Evaluando')
+        accuracy = None
+        if ai_model.model_type != 'isolation_forest':
+            accuracy = float((estimator.predict(X_test) == y_test).mean())
+
+        _report(model_id, 95, 'Guardando artefacto')
+        models_path = Path(settings.AI_MODELS_PATH)
+        models_path.mkdir(parents=True, exist_ok=True)
+        file_name = artifact_file_name(ai_model)
+        save_artifact(estimator, models_path, file_name)
+
+        model = AIModel.objects.get(pk=model_id)
+        previous_file = model.model_file_path
+        model.status = 'active'
+        model.accuracy = accuracy
+        model.model_file_path = file_name
+        model.training_data_size = training_size
+        model.training_end_date = timezone.now()
+        model.training_progress = 100
+        model.training_message = 'Completado'
+        # save() invalida el registro de este proceso; los demás ven la nueva
+        # ruta en model_file_path y cargan el artefacto nuevo en su siguiente uso
+        model.save()
+        # Borrar solo artefactos generados aquí; los workers que aún tienen el
+        # anterior mapeado conservan el inodo hasta soltarlo
+        if previous_file != file_name and previous_file.startswith(f'model_{model_id}_') and '/' not in previous_file:
+            (models_path / previous_file).unlink(missing_ok=True)
+        return True
+
+    except TrainingCancelled:
+        AIModel.objects.filter(pk=model_id).update(
+            status='inactive',
+            training_end_date=timezone.now(),
+            training_message='Entrenamiento cancelado',
+            updated_at=timezone.now()
+        )
+        return False
+
+    except Exception as e:
+        logger.exception('Error entrenando el modelo %s', model_id)
+        AIModel.objects.filter(pk=model_id).update(
+            status='error',
+            training_end_date=timezone.now(),
+            training_message=f'Error: {str(e)}'[:255],
+            updated_at=timezone.now()
+        )
+        return False
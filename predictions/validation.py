@@ -0,0 +1,157 @@
+"""
+Validación automática de predicciones
+Empareja predicciones con eventos de floración observados cercanos en espacio y tiempo
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from plants.models import FloweringEvent, Location, PlantMonitor
+from .models import FloweringPrediction, ValidationRun
+
+
+# Etapas que cuentan como floración observada
+FLOWERING_STAGES = ('early', 'peak', 'late')
+
+# Métodos excluidos: validar con detecciones del propio modelo sería circular
+EXCLUDED_METHODS = ('ai_model',)
+
+METERS_PER_DEGREE = 111320.0
+
+
+# Filtro espacial compartido: caja en grados (índice GiST) y distancia geodésica exacta
+NEAR_SQL = """
+    el.coordinates && ST_Expand(
+        l.coordinates,
+        %(radius)s / (%(meters_per_degree)s * GREATEST(cos(radians(ST_Y(l.coordinates))), 0.01))
+    )
+    AND ST_DWithin(el.coordinates::geography, l.coordinates::geography, %(radius)s)
+"""
+
+# Los días se cuentan en la zona horaria del proyecto: la ventana de una fecha
+# objetivo va de la medianoche local de (fecha - ventana) a la de (fecha + ventana + 1)
+VALIDATE_SQL = """
+    WITH touched AS (
+        -- Fechas objetivo recién vencidas y predicciones creadas desde la última ejecución
+        SELECT fp.id
+        FROM {prediction} fp
+        WHERE fp.actual_result IS NULL
+          AND fp.prediction_type = ANY(%(types)s)
+          AND fp.target_date <= %(until)s
+          AND (%(since)s::timestamptz IS NULL
+               OR fp.created_at >= %(since)s::timestamptz
+               OR fp.target_date > %(last_until)s::date)
+        UNION
+        -- Predicciones vencidas con observaciones cercanas registradas o corregidas después
+        SELECT fp.id
+        FROM {event} e
+        JOIN {monitor} pm ON pm.id = e.plant_monitor_id
+        JOIN {location} el ON el.id = pm.location_id
+        JOIN {prediction} fp
+          ON fp.target_date BETWEEN (e.detection_date AT TIME ZONE %(tz)s)::date - %(window)s::integer
+                                AND (e.detection_date AT TIME ZONE %(tz)s)::date + %(window)s::integer
+        JOIN {location} l ON l.id = fp.location_id
+        WHERE (e.created_at >= %(since)s::timestamptz OR e.updated_at >= %(since)s::timestamptz)
+          AND fp.actual_result IS NULL
+          AND fp.prediction_type = ANY(%(types)s)
+          AND fp.target_date <= %(until)s
+          AND {near}
+    )
+    UPDATE {prediction} AS p
+    SET actual_result = m.flowering,
+        validation_date = %(today)s,
+        validation_notes = 'Validación automática: ' || m.observations || ' observaciones'
+    FROM (
+        SELECT fp.id,
+               bool_or(e.flowering_stage = ANY(%(stages)s)) AS flowering,
+               count(*) AS observations
+        FROM {prediction} fp
+        JOIN touched t ON t.id = fp.id
+        JOIN {location} l ON l.id = fp.location_id
+        LEFT JOIN {monitor} target ON target.id = fp.plant_monitor_id
+        JOIN {event} e
+          ON e.detection_date >= ((fp.target_date - %(window)s::integer)::timestamp AT TIME ZONE %(tz)s)
+         AND e.detection_date < ((fp.target_date + %(window)s::integer + 1)::timestamp AT TIME ZONE %(tz)s)
+        JOIN {monitor} pm ON pm.id = e.plant_monitor_id
+        JOIN {location} el ON el.id = pm.location_id
+        WHERE NOT e.detection_method = ANY(%(excluded)s)
+          AND e.confidence_score >= %(min_confidence)s
+          AND (fp.plant_monitor_id IS NULL OR pm.species_id = target.species_id)
+          AND {near}
+        GROUP BY fp.id
+    ) AS m
+    WHERE p.id = m.id
+    RETURNING p.actual_result
+"""
+
+
+def auto_validate(radius_m=None, window_days=None, min_confidence=None, since=None):
+    """
+    Validar en una sola sentencia las predicciones de floración (detección
+    o pronóstico) cuya fecha objetivo ya pasó.
+
+    Una predicción se valida cuando hay observaciones de la misma especie
+    (o de cualquiera, si la predicción es por ubicación) a menos de
+    `radius_m` y ±`window_days` días locales: resultado positivo si alguna
+    es una etapa de floración, negativo si solo hay capullos o fin de
+    floración. Las predicciones sin observaciones quedan sin validar.
+
+    Cada ejecución guarda como marca el instante en que empezó; la siguiente
+    revisa las fechas objetivo recién vencidas, las predicciones creadas
+    después de la marca y las vencidas con observaciones cercanas creadas o
+    modificadas después de ella, así que los datos tardíos no se pierden.
+    `since` (datetime) sustituye a la marca de la última ejecución.
+    """
+
+    radius_m = settings.AUTO_VALIDATION_RADIUS_M if radius_m is None else radius_m
+    window_days = settings.AUTO_VALIDATION_WINDOW_DAYS if window_days is None else window_days
+    min_confidence = settings.AUTO_VALIDATION_MIN_CONFIDENCE if min_confidence is None else min_confidence
+
+    started_at = timezone.now()
+    today = timezone.localdate(started_at)
+    until = today - timedelta(days=window_days + 1)
+    if since is not None:
+        last_until = timezone.localdate(since)
+    else:
+        last_run = ValidationRun.objects.order_by('-run_at').first()
+        since = last_run and (last_run.watermark or last_run.run_at)
+        last_until = last_run and last_run.until_date
+
+    sql = VALIDATE_SQL.format(
+        prediction=FloweringPrediction._meta.db_table,
+        location=Location._meta.db_table,
+        monitor=PlantMonitor._meta.db_table,
+        event=FloweringEvent._meta.db_table,
+        near=NEAR_SQL.strip(),
+    )
+    params = {
+        'today': today,
+        'types': list(FloweringPrediction.VALIDATED_PREDICTION_TYPES),
+        'tz': settings.TIME_ZONE,
+        'stages': list(FLOWERING_STAGES),
+        'excluded': list(EXCLUDED_METHODS),
+        'window': window_days,
+        'until': until,
+        'since': since,
+        'last_until': last_until,
+        'min_confidence': min_confidence,
+        'radius': float(radius_m),
+        'meters_per_degree': METERS_PER_DEGREE,
+    }
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            results = [row[0] for row in cursor.fetchall()]
+        return ValidationRun.objects.create(
+            watermark=started_at,
+            since_date=last_until,
+            until_date=until,
+            radius_m=radius_m,
+            window_days=window_days,
+            validated_count=len(results),
+            positive_count=sum(1 for result in results if result),
+        )
@@ -2,14 +2,30 @@
 Views para la aplicación Predictions
 """
 
-from rest_framework import viewsets
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from plants.models import Location
+from plants.phenology import window_for, window_position
 from .models import AIModel, PredictionSession, FloweringPrediction, ModelPerformanceMetric, TrainingDataset
 from .serializers import (
     AIModelSerializer, PredictionSessionSerializer, FloweringPredictionSerializer,
     ModelPerformanceMetricSerializer, TrainingDatasetSerializer
 )
+from .evaluation import DEFAULT_THRESHOLD, evaluate_model
+from .inference import get_active_model, predict_single, run_batch_prediction
+from .registry import model_registry
+from .training import TrainingLimitReached, request_cancel, start_training
+
+
+def _parse_date(value):
+    """Fecha YYYY-MM-DD o None si falta, está mal formada o no existe (p. ej. 2024-02-30)"""
+    try:
+        return parse_date(str(value)) if value else None
+    except ValueError:
+        return None
 
 
 class AIModelViewSet(viewsets.ModelViewSet):
@@ -20,7 +36,7 @@ class AIModelViewSet(viewsets.ModelViewSet):
 
 class PredictionSessionViewSet(viewsets.ModelViewSet):
     """ViewSet para sesiones de predicción"""
-    queryset = PredictionSession.objects.all()
+    queryset = PredictionSession.objects.select_related('model', 'executed_by')
     serializer_class = PredictionSessionSerializer
 
 
@@ -43,10 +59,73 @@ class TrainingDatasetViewSet(viewsets.ModelViewSet):
 
 
 class FloweringPredictionView(APIView):
-    """Vista para predicciones de floración"""
+    """
+    Vista para predicciones de floración
+
+    POST {location_id, target_date?, model_id?, species_id?}
+    Las respuestas se cachean por (modelo, versión, huella de características):
+    repetir la consulta no vuelve a ejecutar el modelo. Con species_id se
+    añade la ventana fenológica aprendida para la latitud de la ubicación.
+    """
     
     def post(self, request):
-        return Response({"message": "Predicción de floración - En desarrollo"})
+        try:
+            location_id = int(request.data.get('location_id'))
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'Se requiere location_id numérico'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            species_id = int(request.data.get('species_id') or 0)
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'species_id debe ser numérico'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        target_date = request.data.get('target_date')
+        target_date = _parse_date(target_date) if target_date else timezone.localdate()
+        
+        if target_date is None:
+            return Response({
+                'error': 'target_date debe tener formato YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        latitude = Location.objects.filter(pk=location_id).values_list('latitude', flat=True).first()
+        if latitude is None:
+            return Response({
+                'error': 'Ubicación no encontrada'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            ai_model = get_active_model(request.data.get('model_id'))
+        except (AIModel.DoesNotExist, ValueError):
+            return Response({
+                'error': 'Modelo activo no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            result, cached = predict_single(ai_model, location_id, target_date)
+        except (ValueError, TypeError) as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except FileNotFoundError as e:
+            return Response({
+                'error': f'Archivo del modelo no disponible: {str(e)}'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        phenology_prior = None
+        if species_id:
+            window = window_for(species_id, float(latitude))
+            if window is not None:
+                phenology_prior = dict(window, **window_position(window, target_date))
+        
+        return Response(dict(
+            result,
+            location_id=location_id,
+            target_date=target_date,
+            model={'id': ai_model.pk, 'name': ai_model.name, 'version': ai_model.version},
+            cached=cached,
+            phenology_prior=phenology_prior,
+        ))
 
 
 class CurrentFloweringDetectionView(APIView):
@@ -57,28 +136,190 @@ class CurrentFloweringDetectionView(APIView):
 
 
 class TrainModelView(APIView):
-    """Vista para entrenar modelos"""
+    """
+    Vista para entrenar modelos
+
+    POST {model_id, action: 'start' | 'cancel', dataset_id?}
+    El entrenamiento se ejecuta en un pool de procesos; el progreso se consulta
+    en model-status/<model_id>/.
+    """
     
     def post(self, request):
-        return Response({"message": "Entrenamiento de modelo - En desarrollo"})
+        action = request.data.get('action', 'start')
+        
+        try:
+            ai_model = AIModel.objects.get(pk=request.data.get('model_id'))
+        except (AIModel.DoesNotExist, ValueError, TypeError):
+            return Response({
+                'error': 'Modelo no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if action == 'cancel':
+            if not request_cancel(ai_model):
+                return Response({
+                    'error': 'El modelo no tiene un entrenamiento en curso'
+                }, status=status.HTTP_409_CONFLICT)
+            return Response({
+                'model_id': ai_model.pk,
+                'message': 'Cancelación solicitada'
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        if action != 'start':
+            return Response({
+                'error': "action debe ser 'start' o 'cancel'"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        dataset = None
+        if request.data.get('dataset_id'):
+            dataset = TrainingDataset.objects.filter(pk=request.data['dataset_id']).first()
+            if dataset is None:
+                return Response({
+                    'error': 'Dataset no encontrado'
+                }, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            start_training(ai_model, dataset)
+        except TrainingLimitReached as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'model_id': ai_model.pk,
+            'message': 'Entrenamiento en cola',
+            'status_url': f'/api/predictions/model-status/{ai_model.pk}/'
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class ModelStatusView(APIView):
-    """Vista para estado del modelo"""
+    """
+    Vista para estado del modelo
+
+    Lectura de una sola fila pensada para consultarse con frecuencia
+    mientras dura un entrenamiento.
+    """
     
     def get(self, request, model_id):
-        return Response({"message": "Estado del modelo - En desarrollo"})
+        model_status = AIModel.objects.filter(pk=model_id).values(
+            'id', 'name', 'version', 'status', 'accuracy',
+            'training_progress', 'training_message', 'training_cancel_requested',
+            'training_start_date', 'training_end_date', 'training_data_size', 'updated_at',
+            'model_file_path'
+        ).first()
+        
+        if model_status is None:
+            return Response({
+                'error': 'Modelo no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        model_status['loaded_in_worker'] = model_registry.is_loaded(model_id, model_status.pop('model_file_path'))
+        return Response(model_status)
 
 
 class BatchPredictionView(APIView):
-    """Vista para predicciones en lote"""
+    """
+    Vista para predicciones en lote
+
+    POST {model_id?, location_ids | plant_monitor_ids, start_date, end_date, session_type?}
+    Genera una predicción por (ubicación o planta, fecha objetivo) en una sola sesión.
+    """
     
     def post(self, request):
-        return Response({"message": "Predicciones en lote - En desarrollo"})
+        start_date = _parse_date(request.data.get('start_date'))
+        end_date = _parse_date(request.data.get('end_date'))
+        location_ids = request.data.get('location_ids') or []
+        plant_monitor_ids = request.data.get('plant_monitor_ids') or []
+        
+        if not start_date or not end_date:
+            return Response({
+                'error': 'Se requieren start_date y end_date (YYYY-MM-DD)'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not location_ids and not plant_monitor_ids:
+            return Response({
+                'error': 'Se requieren location_ids o plant_monitor_ids'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            ai_model = get_active_model(request.data.get('model_id'))
+        except (AIModel.DoesNotExist, ValueError):
+            return Response({
+                'error': 'Modelo activo no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        executed_by = request.user if request.user.is_authenticated else ai_model.created_by
+        
+        try:
+            session = run_batch_prediction(
+                ai_model,
+                start_date,
+                end_date,
+                executed_by,
+                location_ids=location_ids,
+                plant_monitor_ids=plant_monitor_ids,
+                session_type=request.data.get('session_type', 'flowering_prediction'),
+            )
+        except (ValueError, TypeError) as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except FileNotFoundError as e:
+            return Response({
+                'error': f'Archivo del modelo no disponible: {str(e)}'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        return Response({
+            'session': PredictionSessionSerializer(session).data,
+        }, status=status.HTTP_201_CREATED)
 
 
 class EvaluateModelView(APIView):
-    """Vista para evaluar modelo"""
+    """
+    Vista para evaluar modelo
+
+    POST {start_date?, end_date?, threshold?, version?}
+    Calcula todas las métricas sobre las predicciones validadas de una
+    versión del modelo (por defecto la actual) y las guarda como
+    ModelPerformanceMetric.
+    """
     
     def post(self, request, model_id):
-        return Response({"message": "Evaluación de modelo - En desarrollo"})
+        try:
+            ai_model = AIModel.objects.get(pk=model_id)
+        except AIModel.DoesNotExist:
+            return Response({
+                'error': 'Modelo no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        start_date = _parse_date(request.data.get('start_date'))
+        end_date = _parse_date(request.data.get('end_date'))
+        if (request.data.get('start_date') and start_date is None) or (request.data.get('end_date') and end_date is None):
+            return Response({
+                'error': 'start_date y end_date deben tener formato YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            threshold = float(request.data.get('threshold', DEFAULT_THRESHOLD))
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'threshold debe ser numérico'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < threshold < 1:
+            return Response({
+                'error': 'threshold debe estar entre 0 y 1'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = evaluate_model(
+                ai_model, start_date, end_date, threshold=threshold,
+                version=request.data.get('version')
+            )
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(dict(result, model_id=ai_model.pk), status=status.HTTP_201_CREATED)
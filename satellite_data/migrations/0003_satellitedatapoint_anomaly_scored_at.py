@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+def mark_existing_scored(apps, schema_editor):
+    """Los puntos previos ya se sumaron a las líneas base al ingerirse"""
+    SatelliteDataPoint = apps.get_model('satellite_data', 'SatelliteDataPoint')
+    SatelliteDataPoint.objects.update(anomaly_scored_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('satellite_data', '0002_satellitedatapoint_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='satellitedatapoint',
+            name='anomaly_scored_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Puntuado (anomalías)'),
+        ),
+        migrations.AddIndex(
+            model_name='satellitedatapoint',
+            index=models.Index(condition=models.Q(('anomaly_scored_at__isnull', True)), fields=['id'], name='satellite_point_unscored'),
+        ),
+        migrations.RunPython(mark_existing_scored, migrations.RunPython.noop),
+    ]
@@ -167,11 +167,21 @@ class SatelliteDataPoint(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Detección de anomalías: cada punto entra una sola vez en las líneas base
+    anomaly_scored_at = models.DateTimeField(null=True, blank=True, verbose_name="Puntuado (anomalías)")
+    
     class Meta:
         verbose_name = "Punto de datos satelital"
         verbose_name_plural = "Puntos de datos satelitales"
         ordering = ['-timestamp']
         unique_together = ['collection', 'timestamp']
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='satellite_point_unscored',
+                condition=models.Q(anomaly_scored_at__isnull=True)
+            ),
+        ]
     
     def __str__(self):
         return f"{self.collection.data_type}: {self.value} ({self.timestamp.date()})"
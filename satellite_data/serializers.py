@@ -35,6 +35,18 @@ class SatelliteDataPointSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class SatelliteDataPointBulkSerializer(serializers.ModelSerializer):
+    """Serializer de ingesta en lote (la colección se resuelve con una sola consulta en la vista)"""
+    
+    collection = serializers.IntegerField(min_value=1)
+    
+    class Meta:
+        model = SatelliteDataPoint
+        fields = ['collection', 'timestamp', 'value', 'quality_flag', 'metadata']
+        # Los duplicados (colección, fecha) se actualizan en lugar de rechazarse
+        validators = []
+
+
 class WeatherDataSerializer(serializers.ModelSerializer):
     """Serializer para datos meteorológicos"""
     
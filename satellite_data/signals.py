@@ -0,0 +1,16 @@
+"""
+Señales de la aplicación Satellite Data
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from plants.statistics import invalidate_statistics
+from .models import SatelliteDataSource
+
+
+@receiver(post_save, sender=SatelliteDataSource)
+@receiver(post_delete, sender=SatelliteDataSource)
+def invalidate_cached_statistics(sender, **kwargs):
+    """Las fuentes satelitales entran en los recuentos de la página de inicio"""
+    invalidate_statistics()
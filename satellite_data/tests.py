@@ -1,3 +1,48 @@
-from django.test import TestCase
+"""
+Tests de la aplicación Satellite Data
+"""
 
-# Create your tests here.
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.test import SimpleTestCase
+
+from api_views import WEATHER_FIELDS, _daily_forecast_from_openweathermap, _weather_from_openweathermap
+
+
+def _owm_item(moment, temp, rain=None, wind_speed=2.0):
+    item = {
+        'dt': int(moment.timestamp()),
+        'main': {'temp': temp, 'temp_min': temp - 1, 'temp_max': temp + 1, 'humidity': 50, 'pressure': 1010},
+        'wind': {'speed': wind_speed, 'deg': 90},
+    }
+    if rain is not None:
+        item['rain'] = {'3h': rain}
+    return item
+
+
+class WeatherNormalizationTests(SimpleTestCase):
+
+    def test_current_weather_uses_weather_data_fields(self):
+        record = _weather_from_openweathermap(_owm_item(datetime(2024, 5, 1, 10, tzinfo=dt_timezone.utc), 20))
+        self.assertEqual(tuple(record), WEATHER_FIELDS)
+        self.assertEqual(record['temperature_avg'], 20)
+        self.assertEqual(record['wind_speed'], 7.2)  # m/s -> km/h
+        self.assertEqual(record['precipitation'], 0)
+
+    def test_forecast_is_aggregated_per_day(self):
+        items = [
+            _owm_item(datetime(2024, 5, 1, 9, tzinfo=dt_timezone.utc), 10, rain=1.5),
+            _owm_item(datetime(2024, 5, 1, 12, tzinfo=dt_timezone.utc), 20, rain=2.5),
+            _owm_item(datetime(2024, 5, 2, 12, tzinfo=dt_timezone.utc), 30),
+        ]
+        daily = _daily_forecast_from_openweathermap({'list': items}, days=5)
+        self.assertEqual([record['date'] for record in daily], [date(2024, 5, 1), date(2024, 5, 2)])
+        self.assertEqual(daily[0]['temperature_min'], 9)
+        self.assertEqual(daily[0]['temperature_max'], 21)
+        self.assertEqual(daily[0]['temperature_avg'], 15)
+        self.assertEqual(daily[0]['precipitation'], 4.0)
+        self.assertEqual(tuple(daily[1]), WEATHER_FIELDS)
+
+    def test_forecast_is_truncated_to_requested_days(self):
+        items = [_owm_item(datetime(2024, 5, day, 12, tzinfo=dt_timezone.utc), 20) for day in range(1, 6)]
+        self.assertEqual(len(_daily_forecast_from_openweathermap({'list': items}, days=2)), 2)
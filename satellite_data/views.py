@@ -2,13 +2,18 @@
 Views para la aplicación Satellite Data
 """
 
-from rest_framework import viewsets
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from predictions.anomalies import score_points
+from predictions.feature_store import mark_stale
+from predictions.inference import BULK_BATCH_SIZE
 from .models import SatelliteDataSource, SatelliteDataCollection, SatelliteDataPoint, WeatherData
 from .serializers import (
     SatelliteDataSourceSerializer, SatelliteDataCollectionSerializer,
-    SatelliteDataPointSerializer, WeatherDataSerializer
+    SatelliteDataPointSerializer, SatelliteDataPointBulkSerializer, WeatherDataSerializer
 )
 
 
@@ -58,7 +63,62 @@ class LatestSatelliteDataView(APIView):
 
 
 class BatchProcessSatelliteDataView(APIView):
-    """Vista para procesamiento en lote"""
+    """
+    Vista para procesamiento en lote
+
+    POST {points: [{collection, timestamp, value, quality_flag?, metadata?}, ...]}
+    Inserta (o actualiza) los puntos en bloque, marca las características
+    afectadas como desactualizadas y puntúa el lote contra las líneas base
+    de anomalías.
+    """
     
     def post(self, request):
-        return Response({"message": "Procesamiento en lote - En desarrollo"})
+        serializer = SatelliteDataPointBulkSerializer(data=request.data.get('points') or [], many=True)
+        if not serializer.is_valid():
+            return Response({
+                'error': 'Puntos inválidos',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.validated_data:
+            return Response({
+                'error': 'Se requiere una lista de points'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        collections = SatelliteDataCollection.objects.in_bulk(
+            {data['collection'] for data in serializer.validated_data}
+        )
+        missing = {data['collection'] for data in serializer.validated_data} - set(collections)
+        if missing:
+            return Response({
+                'error': f'Colecciones no encontradas: {sorted(missing)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            points = SatelliteDataPoint.objects.bulk_create(
+                [
+                    SatelliteDataPoint(**dict(data, collection=collections[data['collection']]))
+                    for data in serializer.validated_data
+                ],
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['collection', 'timestamp'],
+                update_fields=['value', 'quality_flag', 'metadata'],
+            )
+            
+            # bulk_create no emite señales: invalidar el almacén de características aquí
+            days_by_location = {}
+            for point in points:
+                if point.collection.data_type in ('ndvi', 'evi'):
+                    days_by_location.setdefault(point.collection.location_id, []).append(
+                        timezone.localtime(point.timestamp).date()
+                    )
+            for location_id, days in days_by_location.items():
+                mark_stale([location_id], min(days), max(days))
+        
+        # Solo se suman a las líneas base los puntos aún no puntuados: reenviar un lote no duplica
+        anomalies = score_points([point.pk for point in points])
+        
+        return Response({
+            'ingested': len(points),
+            'anomalies': anomalies,
+        }, status=status.HTTP_201_CREATED)